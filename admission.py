@@ -0,0 +1,214 @@
+"""
+Admission Control
+Token-bucket rate limits per session and per client IP, and a global limit
+on in-flight Gemini/model calls with a priority queue in front of it.
+Requests over a limit are not rejected - they are answered from the
+knowledge base in degraded mode.
+
+Limits apply per worker process.
+"""
+
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from metrics import metrics
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# Sustained rate (requests/second) and burst size for each client
+SESSION_RATE = _env_float('LIFELINK_SESSION_RATE', 0.5)
+SESSION_BURST = _env_float('LIFELINK_SESSION_BURST', 5)
+IP_RATE = _env_float('LIFELINK_IP_RATE', 5)   # shelters and campuses share IPs
+IP_BURST = _env_float('LIFELINK_IP_BURST', 30)
+
+# Concurrent Gemini/model calls; further requests queue by priority
+MAX_EXPENSIVE_IN_FLIGHT = int(_env_float('LIFELINK_MAX_INFLIGHT', 8))
+
+# How long a request may queue for a slot before it is shed to the knowledge base
+MAX_QUEUE_WAIT = {'critical': 15.0, 'high': 5.0, 'normal': 1.0}
+
+# Queue position bonus in seconds: a critical message is served before any
+# normal one that arrived less than 30s earlier. With the default waits above
+# a normal request is shed long before that, so it is never starved: it gets a
+# knowledge-base answer instead. Only callers that pass a longer max_wait
+# (batch jobs, benchmarks) see old normal requests age past newer urgent ones.
+PRIORITY_HEAD_START = {'critical': 30.0, 'high': 10.0, 'normal': 0.0}
+
+# Clients tracked per limiter (least recently seen are forgotten first)
+MAX_TRACKED_CLIENTS = 100000
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def take(self, tokens=1):
+        """Take tokens if available. Returns True if allowed."""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+
+class RateLimiter:
+    def __init__(self, rate, capacity, max_clients=MAX_TRACKED_CLIENTS, clock=time.monotonic):
+        """One token bucket per client key, forgetting the least recently seen"""
+        self.rate = rate
+        self.capacity = capacity
+        self.max_clients = max_clients
+        self.clock = clock
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def allow(self, key):
+        """Returns True if the client is within its rate"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity, self.clock)
+                if len(self.buckets) > self.max_clients:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            return bucket.take()
+
+
+class PriorityGate:
+    def __init__(self, limit, max_queue=None, clock=time.monotonic):
+        """
+        Cap on concurrent expensive calls with a priority queue in front
+        Waiters are served by arrival time minus their priority's head
+        start (PRIORITY_HEAD_START), so urgent messages jump ahead. A normal
+        waiter ages past newer urgent ones only if its max_wait outlasts
+        their head start; with MAX_QUEUE_WAIT it is shed first instead.
+        Args:
+            limit: Concurrent slots
+            max_queue: Waiters allowed before non-critical requests are shed
+        """
+        self.limit = limit
+        self.max_queue = max_queue if max_queue is not None else limit * 8
+        self.clock = clock
+        self.in_flight = 0
+        self.queued = 0
+        self.cond = threading.Condition()
+        self.waiting = []  # heap of [rank, seq, state]
+        self.seq = 0
+
+    @contextmanager
+    def slot(self, priority='normal', max_wait=None):
+        """
+        Yields True once a slot is granted (released on exit), or False if
+        none came free within max_wait seconds (default MAX_QUEUE_WAIT)
+        """
+        granted = self.acquire(priority, max_wait)
+        try:
+            yield granted
+        finally:
+            if granted:
+                self.release()
+
+    def acquire(self, priority='normal', max_wait=None):
+        """
+        Take a slot for work that outlives the caller's block (release() it
+        when done). Returns False if none came free within max_wait seconds.
+        """
+        if max_wait is None:
+            max_wait = MAX_QUEUE_WAIT[priority]
+        start = self.clock()
+        with self.cond:
+            if self.in_flight < self.limit and not self.queued:
+                self.in_flight += 1
+                metrics.observe('queue_wait', 0.0, priority=priority)
+                return True
+            if max_wait <= 0 or (self.queued >= self.max_queue and priority != 'critical'):
+                return False
+
+            ticket = [start - PRIORITY_HEAD_START[priority], self.seq, 'waiting']
+            self.seq += 1
+            heapq.heappush(self.waiting, ticket)
+            self.queued += 1
+            deadline = start + max_wait
+            while ticket[2] == 'waiting':
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    ticket[2] = 'cancelled'  # dropped from the heap lazily
+                    self.queued -= 1
+                    metrics.increment('queue_timeout', priority=priority)
+                    return False
+                self.cond.wait(remaining)
+
+        metrics.observe('queue_wait', self.clock() - start, priority=priority)
+        return True
+
+    def release(self):
+        """Give back a slot taken with acquire()"""
+        with self.cond:
+            # Hand the slot straight to the best waiter
+            while self.waiting:
+                ticket = heapq.heappop(self.waiting)
+                if ticket[2] == 'waiting':
+                    ticket[2] = 'granted'
+                    self.queued -= 1
+                    self.cond.notify_all()
+                    return
+            self.in_flight -= 1
+
+
+class AdmissionController:
+    def __init__(self, session_rate=SESSION_RATE, session_burst=SESSION_BURST,
+                 ip_rate=IP_RATE, ip_burst=IP_BURST):
+        self.sessions = RateLimiter(session_rate, session_burst)
+        self.ips = RateLimiter(ip_rate, ip_burst)
+
+    def check(self, session_id, ip):
+        """
+        Decide whether a request may use Gemini or the local model
+        Returns:
+            str: None if admitted, otherwise the shedding reason
+        """
+        # Both buckets are charged so a client can't dodge the IP limit with new sessions
+        session_ok = self.sessions.allow(session_id)
+        ip_ok = self.ips.allow(ip)
+        if not ip_ok:
+            return 'ip_rate'
+        if not session_ok:
+            return 'session_rate'
+        return None
+
+    def check_batch(self, session_ids, ip):
+        """
+        Admission for a batch from a relay gateway: every message is charged
+        to the IP and its session as if sent to /chat on its own, so batching
+        doesn't raise the IP's limit
+        Returns:
+            list: Shedding reason (or None) per session id, in order
+        """
+        return [self.check(session_id, ip) for session_id in session_ids]
+
+
+# Shared by the whole process
+admission = AdmissionController()
+expensive_calls = PriorityGate(MAX_EXPENSIVE_IN_FLIGHT)
+metrics.gauge('expensive_in_flight', lambda: expensive_calls.in_flight)
+metrics.gauge('expensive_queued', lambda: expensive_calls.queued)
@@ -0,0 +1,144 @@
+"""
+Answer Racing
+Starts Gemini and the local model at the same time under a response SLO
+and returns the most preferred answer ready by the deadline, falling back
+to the knowledge base. Sources still running at the deadline finish in
+the background (a late Gemini answer is still saved for learning).
+
+Enabled by setting LIFELINK_RACE_SLO (seconds); otherwise sources are
+tried one after another.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from admission import MAX_EXPENSIVE_IN_FLIGHT
+from metrics import metrics
+from profiler import profiler
+
+
+def _env_slo():
+    try:
+        return float(os.environ['LIFELINK_RACE_SLO'])
+    except (KeyError, ValueError):
+        return None
+
+
+# Response deadline in seconds for the race (None: racing disabled)
+RACE_SLO_SECONDS = _env_slo()
+
+# Answers returned at the deadline arrive a few ms after it
+SLO_GRACE_SECONDS = 0.02
+
+# Each in-flight request races at most two sources
+_executor = ThreadPoolExecutor(max_workers=MAX_EXPENSIVE_IN_FLIGHT * 2, thread_name_prefix='answer-race')
+
+_attainment_lock = threading.Lock()
+_attainment = {'met': 0, 'total': 0}
+
+
+def slo_attainment():
+    """Share of raced responses returned within their SLO (None before the first race)"""
+    with _attainment_lock:
+        return round(_attainment['met'] / _attainment['total'], 4) if _attainment['total'] else None
+
+
+metrics.gauge('race_slo_attainment', slo_attainment)
+
+
+def _result(future):
+    """A finished candidate's answer, or None if it failed or had nothing good"""
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Answer source failed: {e}")
+        return None
+
+
+def race(candidates, fallback, slo_seconds, on_complete=None, executor=None):
+    """
+    Race answer sources against a deadline
+    Args:
+        candidates: (source, fn) pairs, most preferred first; fn returns an
+            answer or None if it has nothing good
+        fallback: (source, fn) giving an instant answer (the knowledge base)
+        slo_seconds: Deadline for the response
+        on_complete: Called once every candidate has finished, including
+            those that finish after the response (e.g. to release a slot)
+        executor: Runs the candidates (default: the shared pool)
+    Returns:
+        tuple: (answer, winning source)
+    """
+    start = time.perf_counter()
+    deadline = start + slo_seconds
+    # Each source runs in a copy of this context, so Gemini calls are still
+    # attributed to the request's route (and profiled with it)
+    futures = [(source, (executor or _executor).submit(contextvars.copy_context().run, profiler.traced(fn)))
+               for source, fn in candidates]
+
+    remaining = [len(futures)]
+    remaining_lock = threading.Lock()
+
+    def finished(_):
+        with remaining_lock:
+            remaining[0] -= 1
+            done = remaining[0] == 0
+        if done and on_complete:
+            on_complete()
+
+    answers = {}  # source -> answer (None if it failed), once finished
+
+    def ready(source, future):
+        if source not in answers and future.done():
+            answers[source] = _result(future)
+        return source in answers
+
+    winner = None
+    while True:
+        # Take the most preferred good answer, unless a better source is still running
+        pending = False
+        for source, future in futures:
+            if not ready(source, future):
+                pending = True
+                break
+            if answers[source]:
+                winner = (answers[source], source)
+                break
+        if winner or not pending:
+            break
+        timeout = deadline - time.perf_counter()
+        if timeout <= 0:
+            # Deadline: the best answer that is ready
+            for source, future in futures:
+                if ready(source, future) and answers[source]:
+                    winner = (answers[source], source)
+                    break
+            metrics.increment('race_deadline_hit')
+            break
+        wait([future for _, future in futures if not future.done()], timeout=timeout,
+             return_when=FIRST_COMPLETED)
+
+    if winner is None:
+        source, fn = fallback
+        winner = (fn(), source)
+
+    # Sources still running finish in the background
+    for source, future in futures:
+        if not future.done():
+            future.add_done_callback(lambda f, source=source: metrics.increment(
+                'race_late_finish', source=source, useful='yes' if _result(f) else 'no'))
+        future.add_done_callback(finished)
+    if not futures and on_complete:
+        on_complete()
+
+    elapsed = time.perf_counter() - start
+    met = elapsed <= slo_seconds + SLO_GRACE_SECONDS
+    with _attainment_lock:
+        _attainment['total'] += 1
+        _attainment['met'] += int(met)
+    metrics.increment('race_winner', source=winner[1])
+    metrics.increment('race_slo', met='yes' if met else 'no')
+    metrics.observe('race_latency', elapsed)
+    return winner
@@ -3,28 +3,88 @@ Flask Web Application for Disaster Response Chatbot
 Provides a web interface for victims to chat with AI
 """
 
-from flask import Flask, render_template, request, jsonify, session, send_from_directory
+from flask import (Flask, Response, render_template, request, jsonify, session, send_from_directory,
+                   stream_with_context)
 from flask_cors import CORS
 from chatbot import DisasterChatbot
-from weather_service import WeatherAlertService
+from weather_service import MAX_BULK_LOCATIONS, WeatherAlertService
+from weather_subscriptions import SubscriptionLimitError, WeatherSubscriptions
+from usage_stats import TOP_K
+from static_assets import AssetRegistry, REVALIDATE_CACHE
+from widget_configs import PUBLISH_BURST, PUBLISH_RATE, ConfigLimitError, WidgetConfigStore
+from admission import RateLimiter, admission
+from urgency import priority_for, urgency_score
+from metrics import metrics
+from profiler import MAX_CAPTURE_SECONDS, folded, profiler
+from llm_usage import usage as llm_usage
+from warmup import Warmup
+from chat_batch import MAX_BATCH_ITEMS, MAX_BATCH_NEW_SESSIONS, BatchItem, answer_batch
+from compact_responses import (CATALOG_HEADER, COMPACT_MEDIA_TYPE, StaticAnswers, compact_result,
+                               encode_compact, gzip_response, wants_compact)
+from werkzeug.middleware.proxy_fix import ProxyFix
+import json
+import time
 import os
 from datetime import datetime
+from functools import wraps
+import hmac
 import secrets
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
-CORS(app)
+# Preflights are cached for a day - each one is a round trip on a slow link
+CORS(app, max_age=86400)
+
+# Behind nginx, take the client IP from X-Forwarded-For (used for rate limits)
+TRUST_PROXY = bool(os.environ.get('LIFELINK_TRUST_PROXY'))
+if TRUST_PROXY:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
 
 # Disable template caching for development
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
+# Hashed, precompressed static assets (built by static_assets.py)
+assets = AssetRegistry()
+app.jinja_env.globals['asset_url'] = assets.url
+
+# Per-site widget configs (published from the configurator), and the
+# per-IP limit on publishing them
+widget_configs = WidgetConfigStore()
+widget_publishers = RateLimiter(PUBLISH_RATE, PUBLISH_BURST)
+
+# Routes that set their own cache headers
+STATIC_ENDPOINTS = {'static_asset', 'widget_js', 'negotiated_image', 'get_widget_config', 'answer_catalog'}
+
+# Routes whose response sizes are recorded (response_bytes in /admin/metrics)
+CHAT_ENDPOINTS = {'chat', 'chat_batch'}
+
+# Routes never profiled: static files, long-lived streams and the capture itself
+UNPROFILED_ENDPOINTS = STATIC_ENDPOINTS | {'weather_subscribe', 'admin_profile'}
+
+@app.before_request
+def start_profiling():
+    """Sample this request's stacks if the profiler picks it (see profiler.py)"""
+    if request.endpoint not in UNPROFILED_ENDPOINTS:
+        profiler.start_request(request.endpoint)
+
+@app.teardown_request
+def stop_profiling(exc):
+    profiler.end_request()
+
 @app.after_request
 def add_header(response):
-    """Add headers to prevent caching"""
+    """Add headers to prevent caching of dynamic routes, and gzip JSON"""
+    if request.endpoint in STATIC_ENDPOINTS:
+        return response
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '-1'
+    response = gzip_response(response, request.headers.get('Accept-Encoding', ''))
+    if request.endpoint in CHAT_ENDPOINTS:
+        metrics.observe_value('response_bytes', response.content_length or 0, endpoint=request.endpoint,
+                              format='compact' if response.mimetype == COMPACT_MEDIA_TYPE else 'json',
+                              encoding=response.headers.get('Content-Encoding', 'identity'))
     return response
 
 # Initialize chatbot
@@ -32,14 +92,88 @@ print("Initializing chatbot...")
 chatbot = DisasterChatbot()
 print("Chatbot ready!")
 
+# Fixed answers compact clients cache by id (GET /answers)
+static_answers = StaticAnswers.build(chatbot)
+
+# Optionally pre-generate answers for common questions in the background
+warmup = Warmup(chatbot)
+if os.environ.get('LIFELINK_WARMUP'):
+    warmup.start()
+
 # Initialize weather service
 print("Initializing weather service...")
 weather_service = WeatherAlertService()
+weather_subscriptions = WeatherSubscriptions(weather_service)
+metrics.gauge('location_canonical_hit_rate', weather_service.gazetteer.hit_rate)
+metrics.gauge('weather_subscribers', weather_subscriptions.subscriber_count)
+metrics.gauge('weather_pollers', weather_subscriptions.poller_count)
+
+# Comment lines keep idle weather subscriptions open through proxies
+SSE_HEARTBEAT_SECONDS = 15
 print("Weather service ready!")
 
 # Store user sessions
 user_sessions = {}
 
+def session_context_bytes():
+    """Memory held by conversation context across sessions"""
+    sizes = [bot.context.memory_bytes() for bot in list(user_sessions.values())]
+    return {
+        'sessions': len(sizes),
+        'total': sum(sizes),
+        'mean': round(sum(sizes) / len(sizes)) if sizes else 0,
+        'max': max(sizes, default=0)
+    }
+
+metrics.gauge('session_context_bytes', session_context_bytes)
+
+# Admin endpoints need this token in the X-Admin-Token header. Without one
+# configured they only answer direct requests from this machine: anything
+# relayed by a proxy (nginx on the same host included) is refused
+ADMIN_TOKEN = os.environ.get('LIFELINK_ADMIN_TOKEN')
+LOOPBACK_ADDRESSES = {'127.0.0.1', '::1'}
+PROXY_HEADERS = ('X-Forwarded-For', 'X-Real-IP', 'Forwarded')
+# Peers already warned about for relaying without LIFELINK_TRUST_PROXY
+untrusted_proxies = set()
+
+def client_ip():
+    """
+    Client address rate limits are keyed on
+    Without LIFELINK_TRUST_PROXY, X-Real-IP is still believed from a proxy on
+    this machine (the shipped nginx config sets it). A proxy anywhere else
+    would make every client share its address, so that is logged once
+    """
+    address = request.remote_addr
+    if TRUST_PROXY:
+        return address
+    real_ip = request.headers.get('X-Real-IP', '').strip()
+    if real_ip and address in LOOPBACK_ADDRESSES:
+        return real_ip
+    if address not in untrusted_proxies and any(header in request.headers for header in PROXY_HEADERS):
+        untrusted_proxies.add(address)
+        metrics.increment('untrusted_proxy')
+        print(f"⚠ Requests from {address} come through a proxy, so all its clients share one rate limit. "
+              f"Set LIFELINK_TRUST_PROXY=1 if it is yours.")
+    return address
+
+def admin_required(view):
+    """Restrict a route to administrators"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN:
+            token = request.headers.get('X-Admin-Token', '')
+            allowed = hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+        else:
+            allowed = (request.remote_addr in LOOPBACK_ADDRESSES
+                       and not any(header in request.headers for header in PROXY_HEADERS))
+        if not allowed:
+            return jsonify({
+                'success': False,
+                'error': 'Forbidden'
+            }), 403
+        return view(*args, **kwargs)
+    return wrapper
+
 @app.route('/')
 def home():
     """Render the main chat interface"""
@@ -55,7 +189,81 @@ def configurator():
 @app.route('/widget.js')
 def widget_js():
     """Serve the widget JavaScript file"""
-    return send_from_directory('.', 'widget.js', mimetype='application/javascript')
+    # Partner sites embed this fixed URL, so it is revalidated rather than immutable
+    return assets.serve('widget.js')
+
+@app.route('/assets/<version>/<path:name>')
+def static_asset(version, name):
+    """Serve a content-hashed static asset (cached forever by browsers and CDNs)"""
+    return assets.serve(name, version)
+
+@app.route('/images/<path:filename>')
+def negotiated_image(filename):
+    """Serve the smallest variant of an image (format from Accept, ?w= for display width)"""
+    return assets.serve_image(f"images/{filename}", request.args.get('w', type=int))
+
+@app.route('/widget-config/<config_id>', methods=['GET'])
+def get_widget_config(config_id):
+    """Published config for an embedded widget (cacheable, revalidated by ETag)"""
+    entry = widget_configs.get(config_id)
+    if entry is None:
+        response = jsonify({
+            'success': False,
+            'error': 'Unknown widget config'
+        })
+        response.status_code = 404
+        # Short-lived so a config published later is picked up
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        return response
+    
+    if request.if_none_match.contains(entry['version']):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({
+            'success': True,
+            'config_id': config_id,
+            'version': entry['version'],
+            'config': entry['config']
+        })
+    response.set_etag(entry['version'])
+    response.headers['Cache-Control'] = REVALIDATE_CACHE
+    return response
+
+@app.route('/widget-config', methods=['POST'])
+def publish_widget_config():
+    """Publish a widget config from the configurator"""
+    if not widget_publishers.allow(client_ip()):
+        metrics.increment('widget_publish_limited')
+        return jsonify({
+            'success': False,
+            'error': 'Too many publishes; try again later'
+        }), 429
+    try:
+        data = request.get_json() or {}
+        result = widget_configs.publish(
+            data.get('config'),
+            config_id=data.get('config_id'),
+            edit_token=data.get('edit_token')
+        )
+        return jsonify({
+            'success': True,
+            **result
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except PermissionError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 403
+    except ConfigLimitError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -71,6 +279,16 @@ def chat():
                 'error': 'Empty message'
             }), 400
         
+        # Clients over their rate are answered from the knowledge base
+        start = time.perf_counter()
+        shed_reason = admission.check(session_id, client_ip())
+        
+        # Life-threatening messages queue ahead for Gemini/model capacity
+        # and are not held to the per-session rate
+        priority = priority_for(urgency_score(user_message))
+        if priority == 'critical' and shed_reason == 'session_rate':
+            shed_reason = None
+        
         # Get or create session
         if session_id not in user_sessions:
             user_sessions[session_id] = DisasterChatbot()
@@ -78,13 +296,25 @@ def chat():
         user_chatbot = user_sessions[session_id]
         
         # Generate response
-        response = user_chatbot.chat(user_message)
+        response = user_chatbot.chat(user_message, shed_reason, priority)
+        degraded_reason = user_chatbot.degraded_reason
         
-        return jsonify({
+        mode = 'degraded' if degraded_reason else 'normal'
+        metrics.increment('chat_requests', mode=mode, priority=priority)
+        metrics.observe('chat_latency', time.perf_counter() - start, mode=mode, priority=priority)
+        
+        result = {
             'success': True,
             'response': response,
+            'degraded': degraded_reason is not None,
+            'degraded_reason': degraded_reason,
+            'priority': priority,
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        if wants_compact(request, data):
+            compact = compact_result(result, static_answers, request.headers.get(CATALOG_HEADER))
+            return Response(encode_compact(compact), mimetype=COMPACT_MEDIA_TYPE)
+        return jsonify(result)
     
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
@@ -93,6 +323,97 @@ def chat():
             'error': str(e)
         }), 500
 
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Handle many messages at once (SMS and relay gateways)
+    Body: {"messages": [{"session_id": ..., "message": ...}, ...]}
+    Results come back in the same order
+    """
+    try:
+        data = request.get_json()
+        entries = data.get('messages') if isinstance(data, dict) else None
+        if not isinstance(entries, list) or not entries:
+            return jsonify({
+                'success': False,
+                'error': 'Expected a non-empty "messages" list'
+            }), 400
+        if len(entries) > MAX_BATCH_ITEMS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_ITEMS} messages per batch'
+            }), 413
+        
+        start = time.perf_counter()
+        results = [None] * len(entries)
+        valid = []
+        new_sessions = set()
+        for index, entry in enumerate(entries):
+            message = str(entry.get('message') or '').strip() if isinstance(entry, dict) else ''
+            if not message:
+                results[index] = {'success': False, 'error': 'Empty message'}
+                continue
+            session_id = str(entry.get('session_id') or 'default')
+            if session_id not in user_sessions and session_id not in new_sessions:
+                if len(new_sessions) >= MAX_BATCH_NEW_SESSIONS:
+                    metrics.increment('chat_batch_sessions_refused')
+                    results[index] = {'success': False, 'error': 'Too many new sessions in one batch'}
+                    continue
+                new_sessions.add(session_id)
+            valid.append((index, session_id, message))
+        
+        # Each message is charged to the gateway's IP and its session, as on /chat
+        shed_reasons = admission.check_batch([session_id for _, session_id, _ in valid], client_ip())
+        items = []
+        for (index, session_id, message), shed_reason in zip(valid, shed_reasons):
+            priority = priority_for(urgency_score(message))
+            if priority == 'critical' and shed_reason == 'session_rate':
+                shed_reason = None
+            if session_id not in user_sessions:
+                user_sessions[session_id] = DisasterChatbot()
+            items.append((index, BatchItem(session_id, message, user_sessions[session_id], priority, shed_reason)))
+        
+        answer_batch([item for _, item in items])
+        
+        for index, item in items:
+            mode = 'degraded' if item.degraded_reason else 'normal'
+            metrics.increment('chat_requests', mode=mode, priority=item.priority)
+            results[index] = {
+                'success': True,
+                'session_id': item.session_id,
+                'response': item.response,
+                'degraded': item.degraded_reason is not None,
+                'degraded_reason': item.degraded_reason,
+                'priority': item.priority
+            }
+        metrics.observe('chat_batch_latency', time.perf_counter() - start)
+        
+        if wants_compact(request, data):
+            client_catalog = request.headers.get(CATALOG_HEADER)
+            compact = {'ok': 1, 'r': [compact_result(result, static_answers, client_catalog) for result in results]}
+            return Response(encode_compact(compact), mimetype=COMPACT_MEDIA_TYPE)
+        return jsonify({
+            'success': True,
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        print(f"Error in batch chat endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/answers', methods=['GET'])
+def answer_catalog():
+    """Static answers by id, for clients using compact /chat responses"""
+    response = jsonify(static_answers.catalog())
+    response.set_etag(static_answers.version, weak=True)
+    response.headers['Cache-Control'] = REVALIDATE_CACHE
+    response = response.make_conditional(request)
+    return gzip_response(response, request.headers.get('Accept-Encoding', ''))
+
 @app.route('/emergency-contacts', methods=['GET'])
 def emergency_contacts():
     """Get emergency contact information"""
@@ -150,6 +471,78 @@ def health():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/admin/learned-stats', methods=['GET'])
+@admin_required
+def learned_stats():
+    """Usage statistics for learned responses (kept up to date as they are used)"""
+    try:
+        top = min(max(request.args.get('top', 10, type=int), 0), TOP_K)
+        return jsonify({
+            'success': True,
+            'stats': chatbot.learned_store.usage_stats(top)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/admin/metrics', methods=['GET'])
+@admin_required
+def admin_metrics():
+    """Request, shedding and latency metrics for this worker"""
+    return jsonify({
+        'success': True,
+        'metrics': metrics.snapshot()
+    })
+
+@app.route('/admin/llm-usage', methods=['GET'])
+@admin_required
+def llm_usage_report():
+    """Gemini token spend, cost and latency per call site, costliest first"""
+    return jsonify({
+        'success': True,
+        'usage': llm_usage.report()
+    })
+
+@app.route('/admin/warmup', methods=['GET'])
+@admin_required
+def warmup_status():
+    """Warm-up progress and the cold-start latency it absorbed"""
+    return jsonify({
+        'success': True,
+        'warmup': warmup.report()
+    })
+
+@app.route('/admin/profile', methods=['GET'])
+@admin_required
+def admin_profile():
+    """
+    Folded-stack profile for flamegraph tools (flamegraph.pl, speedscope)
+    ?seconds=N profiles every request for N seconds (default 10);
+    ?seconds=0 returns what LIFELINK_PROFILE_SAMPLE_RATE sampled so far
+    (&reset=1 clears it)
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        seconds = -1
+    if not 0 <= seconds <= MAX_CAPTURE_SECONDS:
+        return jsonify({
+            'success': False,
+            'error': f'seconds must be between 0 and {MAX_CAPTURE_SECONDS}'
+        }), 400
+    
+    if seconds:
+        profile = profiler.capture(seconds)
+    else:
+        profile = profiler.snapshot(reset=request.args.get('reset') == '1')
+    response = Response(folded(profile), mimetype='text/plain')
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="lifelink-{datetime.now().strftime("%Y%m%d-%H%M%S")}.folded"'
+    response.headers['X-Profile-Samples'] = str(sum(profile.values()))
+    return response
+
 @app.route('/weather-alert', methods=['POST'])
 def weather_alert():
     """Get weather alert with AI recommendations"""
@@ -206,6 +599,106 @@ def weather():
             'error': str(e)
         }), 500
 
+def _weather_result(location, alert):
+    """One location's alert as /weather/bulk and /weather/subscribe send it"""
+    if not alert['success']:
+        return {
+            'success': False,
+            'location': location,
+            'error': alert.get('error', 'Failed to fetch weather')
+        }
+    return {
+        'success': True,
+        'location': location,
+        'alert': alert['message'],
+        'weather': alert['weather'],
+        'recommendations': alert['recommendations']
+    }
+
+@app.route('/weather/subscribe', methods=['GET'])
+def weather_subscribe():
+    """
+    Subscribe to weather alerts for a location (Server-Sent Events)
+    Each "weather" event carries a /weather-alert shaped payload, sent when
+    the subscription starts and whenever the location's weather changes
+    """
+    location = request.args.get('location', 'New York').strip() or 'New York'
+    try:
+        subscription = weather_subscriptions.subscribe(location)
+    except SubscriptionLimitError as e:
+        # The widget asks /weather-alert once instead
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    
+    def generate():
+        try:
+            while True:
+                event = subscription.next_event(timeout=SSE_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                result = _weather_result(location, event.alert)
+                yield f"id: {event.version}\nevent: weather\ndata: {json.dumps(result)}\n\n"
+        finally:
+            weather_subscriptions.unsubscribe(subscription)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx hold events back
+    return response
+
+@app.route('/weather/bulk', methods=['POST'])
+def weather_bulk():
+    """
+    Weather alerts for many locations at once
+    Body: {"locations": ["Miami", ...], "stream": false}
+    Results come back in the same order, or with "stream": true as NDJSON
+    lines (each with its "index") as soon as each location is ready
+    """
+    try:
+        data = request.get_json()
+        locations = data.get('locations') if isinstance(data, dict) else None
+        if (not isinstance(locations, list) or not locations
+                or not all(isinstance(location, str) and location.strip() for location in locations)):
+            return jsonify({
+                'success': False,
+                'error': 'Expected a non-empty "locations" list of names'
+            }), 400
+        if len(locations) > MAX_BULK_LOCATIONS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BULK_LOCATIONS} locations per request'
+            }), 413
+        
+        locations = [location.strip() for location in locations]
+        start = time.perf_counter()
+        metrics.observe_value('weather_bulk_locations', len(locations))
+        
+        if data.get('stream'):
+            def generate():
+                for index, alert in weather_service.iter_weather_alerts(locations):
+                    result = dict(_weather_result(locations[index], alert), index=index)
+                    yield json.dumps(result) + '\n'
+                metrics.observe('weather_bulk_latency', time.perf_counter() - start, mode='stream')
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        alerts = weather_service.get_weather_alerts(locations)
+        metrics.observe('weather_bulk_latency', time.perf_counter() - start, mode='payload')
+        return jsonify({
+            'success': True,
+            'results': [_weather_result(location, alert) for location, alert in zip(locations, alerts)],
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        print(f"Error in bulk weather endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f"\n{'='*60}")
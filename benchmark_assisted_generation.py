@@ -0,0 +1,79 @@
+"""
+Benchmark assisted (draft model) decoding for the local seq2seq model
+Reports the speedup over plain decoding and checks that greedy assisted
+decoding produces the same answers as greedy decoding without a draft
+"""
+
+import os
+import time
+import torch
+from chatbot import DisasterChatbot, MODEL_GENERATION_KWARGS, ASSISTED_GENERATION_KWARGS
+
+PROMPTS = [
+    "How do I keep my family safe after an earthquake?",
+    "Water is coming into my house from the river",
+    "What supplies do I need before a hurricane arrives?",
+    "There is smoke coming from the forest near my town",
+    "How do I stay warm if the power goes out in a blizzard?",
+    "My neighbour is elderly and alone during the heat wave",
+    "Is it safe to drive through a flooded road?",
+    "What should we do when the tornado siren sounds?",
+]
+
+
+def timed_generate(bot, prompt, **kwargs):
+    inputs = bot.tokenizer(
+        f"Disaster emergency: {prompt}",
+        return_tensors="pt",
+        max_length=256,
+        truncation=True
+    ).to(bot.device)
+    start = time.perf_counter()
+    with torch.no_grad():
+        outputs = bot.model.generate(**inputs, **kwargs)
+    elapsed = time.perf_counter() - start
+    return bot.tokenizer.decode(outputs[0], skip_special_tokens=True), elapsed
+
+
+def benchmark_assisted_generation():
+    print("=" * 70)
+    print("ASSISTED DECODING BENCHMARK")
+    print("=" * 70)
+    
+    draft_path = os.getenv('LIFELINK_DRAFT_MODEL', './disaster_chatbot_draft_model')
+    bot = DisasterChatbot(draft_model_path=draft_path)
+    if bot.draft_model is None:
+        print(f"❌ Draft model not found at {draft_path}. Train it with: python train_model.py --draft")
+        return
+    
+    greedy_kwargs = dict(ASSISTED_GENERATION_KWARGS)
+    totals = {'default': 0.0, 'greedy': 0.0, 'assisted': 0.0}
+    matches = 0
+    
+    # Warm up both models once so the first prompt is not penalised
+    timed_generate(bot, PROMPTS[0], **greedy_kwargs)
+    timed_generate(bot, PROMPTS[0], assistant_model=bot.draft_model, **greedy_kwargs)
+    
+    for prompt in PROMPTS:
+        _, default_time = timed_generate(bot, prompt, **MODEL_GENERATION_KWARGS)
+        greedy, greedy_time = timed_generate(bot, prompt, **greedy_kwargs)
+        assisted, assisted_time = timed_generate(bot, prompt, assistant_model=bot.draft_model, **greedy_kwargs)
+        
+        totals['default'] += default_time
+        totals['greedy'] += greedy_time
+        totals['assisted'] += assisted_time
+        same = greedy == assisted
+        matches += same
+        print(f"{'✓' if same else '✗'} {greedy_time:6.2f}s -> {assisted_time:6.2f}s  {prompt[:50]}")
+    
+    print("\n" + "-" * 70)
+    print(f"Default decoding (beam search + sampling): {totals['default']:.2f}s")
+    print(f"Greedy decoding:                            {totals['greedy']:.2f}s")
+    print(f"Assisted greedy decoding:                   {totals['assisted']:.2f}s")
+    print(f"Speedup vs greedy:  {totals['greedy'] / totals['assisted']:.2f}x")
+    print(f"Speedup vs default: {totals['default'] / totals['assisted']:.2f}x")
+    print(f"Identical outputs:  {matches}/{len(PROMPTS)}")
+
+
+if __name__ == "__main__":
+    benchmark_assisted_generation()
@@ -0,0 +1,149 @@
+"""
+Benchmark: relay-gateway throughput, single-message /chat versus /chat/batch
+Serves the app over HTTP with Gemini replaced by the local stub server
+(llm_stub_server.py) and relays the same SMS traffic both ways.
+
+Usage:
+    python benchmark_chat_batch.py [--messages 400] [--sessions 100] [--batch-size 100]
+                                   [--concurrency 8] [--stub-latency-ms 300]
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure before the app is imported: Gemini is the stub, and the gateway's
+# single IP must not be rate limited in either mode
+os.environ['LIFELINK_LLM_BACKEND'] = 'stub'
+os.environ.setdefault('LIFELINK_IP_RATE', '100000')
+os.environ.setdefault('LIFELINK_IP_BURST', '100000')
+os.environ.setdefault('LIFELINK_SESSION_RATE', '100000')
+os.environ.setdefault('LIFELINK_SESSION_BURST', '100000')
+
+import requests
+from werkzeug.serving import make_server
+from llm_stub_server import start_stub_server
+
+# A relief-line mix: knowledge base questions, greetings and open questions for Gemini
+CHEAP = ["Flood safety tips", "What should I do during an earthquake?", "Hello there",
+         "Fire emergency help", "What to avoid during a hurricane?", "Thanks"]
+OPEN = ["How do I keep my {} calm in a {}?", "Why is my {} shivering after the {}?",
+        "Where can my {} get insulin after the {} closed pharmacies?",
+        "When is it safe to bring the {} home after a {}?",
+        "Who checks gas lines for {} households after a {}?",
+        "Is the medicine for my {} still good if the fridge died in the {}?"]
+WHO = ['dog', 'cat', 'grandmother', 'neighbor', 'baby', 'horse', 'parrot', 'uncle']
+WHAT = ['flood', 'hurricane', 'wildfire', 'blizzard', 'heat wave', 'tornado', 'tsunami']
+
+
+def traffic(messages, sessions, seed=7):
+    rng = random.Random(seed)
+    items = []
+    for _ in range(messages):
+        if rng.random() < 0.5:
+            message = rng.choice(CHEAP)
+        else:
+            message = rng.choice(OPEN).format(rng.choice(WHO), rng.choice(WHAT))
+        items.append((f"sms-{rng.randrange(sessions)}", message))
+    return items
+
+
+def fresh_sessions(app_module, items, workdir, mode):
+    """Pre-create the sessions with their own learned store, so neither run reuses the other's answers"""
+    app_module.user_sessions.clear()
+    learned = os.path.join(workdir, f'{mode}-learned.json')
+    warm = os.path.join(workdir, f'{mode}-warm.json')
+    for session_id in {session_id for session_id, _ in items}:
+        app_module.user_sessions[session_id] = app_module.DisasterChatbot(learned_responses_file=learned,
+                                                                          warm_responses_file=warm)
+
+
+def run_single(url, items, concurrency):
+    session = threading.local()
+
+    def send(item):
+        if not hasattr(session, 'http'):
+            session.http = requests.Session()
+        session_id, message = item
+        response = session.http.post(f"{url}/chat", json={'session_id': session_id, 'message': message})
+        return response.json()['success']
+
+    # One message per request; each session's messages stay in order
+    by_session = {}
+    for item in items:
+        by_session.setdefault(item[0], []).append(item)
+
+    def relay(session_items):
+        return all(send(item) for item in session_items)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return all(pool.map(relay, by_session.values()))
+
+
+def run_batch(url, items, batch_size):
+    http = requests.Session()
+    ok = True
+    for i in range(0, len(items), batch_size):
+        chunk = items[i:i + batch_size]
+        response = http.post(f"{url}/chat/batch", json={'messages': [
+            {'session_id': session_id, 'message': message} for session_id, message in chunk]})
+        ok = ok and all(result['success'] for result in response.json()['results'])
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single versus batch chat throughput")
+    parser.add_argument('--messages', type=int, default=400)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8, help="parallel /chat senders (besides one)")
+    parser.add_argument('--stub-latency-ms', type=float, default=300)
+    args = parser.parse_args()
+
+    stub, os.environ['LIFELINK_LLM_STUB_URL'] = start_stub_server(latency='lognormal', latency_ms=args.stub_latency_ms,
+                                                                  jitter_ms=args.stub_latency_ms / 3, seed=1)
+    import app as app_module
+    from llm_usage import usage
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    items = traffic(args.messages, args.sessions)
+
+    print("=" * 70)
+    print("BATCH CHAT THROUGHPUT")
+    print("=" * 70)
+    print(f"{args.messages} messages from {args.sessions} sessions, stub Gemini ~{args.stub_latency_ms:.0f} ms\n")
+    print(f"{'mode':<34}{'seconds':>10}{'msgs/s':>10}{'LLM calls':>12}")
+
+    workdir = tempfile.TemporaryDirectory()
+    results = {}
+    for mode, label, run in [
+        ('sequential', "/chat, one sender", lambda: run_single(url, items, 1)),
+        ('single', f"/chat, {args.concurrency} senders", lambda: run_single(url, items, args.concurrency)),
+        ('batch', f"/chat/batch ({args.batch_size} per request)", lambda: run_batch(url, items, args.batch_size)),
+    ]:
+        fresh_sessions(app_module, items, workdir.name, mode)
+        usage.reset()
+        start = time.perf_counter()
+        ok = run()
+        elapsed = time.perf_counter() - start
+        results[mode] = elapsed
+        calls = usage.report()['totals']['calls']
+        print(f"{label:<34}{elapsed:>10.2f}{args.messages / elapsed:>10.1f}{calls:>12}" + ("" if ok else "  (errors)"))
+
+    print(f"\nBatch speedup: {results['sequential'] / results['batch']:.1f}x over one sender, "
+          f"{results['single'] / results['batch']:.1f}x over {args.concurrency}")
+    server.shutdown()
+    stub.shutdown()
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: prompt tokens and session memory for long conversations
+Compares sending the full history with every Gemini prompt against the
+token-budgeted context with a rolling summary
+
+Usage:
+    python benchmark_conversation_context.py [--turns 50]
+"""
+
+import argparse
+import sys
+import time
+from conversation_context import ConversationContext, estimate_tokens
+
+QUESTIONS = [
+    "How do I protect my house from a flood?",
+    "What about my pets?",
+    "The water is now at the front door, should we go upstairs?",
+    "How long can we stay without power?",
+    "Is tap water safe to drink after the flood?",
+]
+# A typical 300-word Gemini answer
+ANSWER = ("Move valuables and important documents to a higher floor. Turn off electricity "
+          "at the main breaker if water is approaching outlets. ") * 12
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversation context size benchmark")
+    parser.add_argument('--turns', type=int, default=50)
+    args = parser.parse_args()
+
+    full_history = []
+    context = ConversationContext()
+    print("=" * 70)
+    print("CONVERSATION CONTEXT PER GEMINI PROMPT")
+    print("=" * 70)
+    print(f"{'turn':>6}{'full history':>16}{'budgeted':>12}{'history bytes':>16}{'context bytes':>16}")
+
+    render_seconds = 0.0
+    for turn in range(1, args.turns + 1):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        full_tokens = sum(estimate_tokens(text) for text in full_history)
+        start = time.perf_counter()
+        budgeted_tokens = estimate_tokens(context.render())
+        render_seconds += time.perf_counter() - start
+        if turn in (1, 2, 5, 10, 25) or turn == args.turns:
+            history_bytes = sum(sys.getsizeof(text) for text in full_history)
+            print(f"{turn:>6}{full_tokens:>16}{budgeted_tokens:>12}{history_bytes:>16}{context.memory_bytes():>16}")
+        full_history += [question, ANSWER]
+        context.add('user', question, 'flood')
+        context.add('assistant', ANSWER)
+
+    print(f"\nBuilding the budgeted context took {render_seconds / args.turns * 1e6:.0f} µs per turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark the learned responses CLI on a large generated store
+Each subcommand runs in its own process so its wall time and peak memory
+(max RSS) can be measured separately
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from learned_store import write_learned_responses
+
+DISASTER_TYPES = ['earthquake', 'flood', 'fire', 'hurricane', 'tornado',
+                  'winter_storm', 'tsunami', 'wildfire', 'heat_wave', 'general_disaster']
+
+
+def generate_entries(count, seed=42):
+    """Yield synthetic learned responses with realistic field sizes"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        disaster_type = rng.choice(DISASTER_TYPES)
+        question = f"Question {i} about {disaster_type.replace('_', ' ')} safety and supplies?"
+        yield question.lower(), {
+            'question': question,
+            'answer': f"Answer {i}: " + "Stay calm, follow official guidance and check on neighbours. " * 4,
+            'disaster_type': disaster_type,
+            'learned_from': 'gemini',
+            'timestamp': (start + timedelta(seconds=i * 30)).isoformat(),
+            'usage_count': int(rng.paretovariate(1.5))
+        }
+
+
+def run(args):
+    """Run the CLI in a child process; return (seconds, max RSS in MB)"""
+    command = [sys.executable, 'manage_learned_responses.py'] + args
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    if status != 0:
+        raise RuntimeError(f"{' '.join(args)} failed with status {status}")
+    # ru_maxrss is reported in kilobytes on Linux
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def benchmark_learned_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    options = parser.parse_args()
+    
+    print("=" * 70)
+    print(f"LEARNED RESPONSES CLI BENCHMARK ({options.entries:,} entries)")
+    print("=" * 70)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'learned_responses.json')
+        start = time.perf_counter()
+        write_learned_responses(store, generate_entries(options.entries))
+        size_mb = os.path.getsize(store) / (1024 * 1024)
+        print(f"\nGenerated {size_mb:,.0f} MB store in {time.perf_counter() - start:.1f}s\n")
+        
+        commands = [
+            ['stats', '--top', '10'],
+            ['list', '--page', '500', '--page-size', '20', '--jsonl'],
+            ['list', '--type', 'flood', '--min-usage', '3', '--since', '2025-03-01', '--page-size', '0', '--jsonl'],
+            ['search', 'neighbours', '--type', 'tsunami', '--page-size', '0', '--jsonl'],
+            ['export', '--type', 'wildfire', '--output-dir', os.path.join(tmp, 'export')],
+            ['prune', '--max-usage', '1', '--until', '2025-02-01', '--dry-run'],
+            ['prune', '--max-usage', '1', '--until', '2025-02-01'],
+            ['delete', 'question 10 about flood safety and supplies?'],
+        ]
+        
+        print(f"{'command':<72} {'time':>8} {'max RSS':>10}")
+        for command in commands:
+            elapsed, rss = run(['--file', store] + command)
+            label = ' '.join(command).replace(tmp + os.sep, '')
+            print(f"{label:<72} {elapsed:7.1f}s {rss:8.0f} MB")
+
+
+if __name__ == "__main__":
+    benchmark_learned_cli()
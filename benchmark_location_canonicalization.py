@@ -0,0 +1,109 @@
+"""
+Benchmark: weather cache hit rate with and without location canonicalization
+Replays free-form locations as users type them ("NYC", "new york city",
+"New Yrok", "Portland, ME", unknown towns) through WeatherAlertService with a
+counting stand-in for WeatherAPI, and reports upstream calls and cache hit
+rates, plus the gazetteer's load time and lookup cost.
+
+Usage:
+    python benchmark_location_canonicalization.py [--requests 5000] [--unknown 0.15]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+from gazetteer import Gazetteer
+from llm_backends import LLMBackend, LLMResponse
+from metrics import metrics
+from weather_service import WeatherAlertService
+
+# How people wrote some of the places
+SPELLINGS = [
+    ["New York", "NYC", "new york", "New York, NY", "new york city", "NY City", "Manhattan", "New Yrok"],
+    ["Los Angeles", "LA", "los angeles, ca", "L.A.", "Los Angeles, California", "Los Angelas"],
+    ["Houston", "houston tx", "Houston, Texas", "HOUSTON"],
+    ["Miami", "miami, fl", "Miami, Florida", "Miami FL USA"],
+    ["New Orleans", "NOLA", "new orleans, la", "New Orleans, Louisiana", "Big Easy", "New Orleens"],
+    ["Tampa", "tampa fl", "Tampa, Florida", "Tampa Bay"],
+    ["St. Louis", "Saint Louis", "st louis mo", "St. Louis, Missouri", "STL"],
+    ["San Francisco", "SF", "san francisco, ca", "San Fran", "San Fransisco"],
+    ["Portland", "Portland, OR", "portland oregon", "PDX"],
+    ["Portland, ME", "portland maine", "Portland, Maine"],
+    ["Washington DC", "DC", "Washington, D.C.", "washington"],
+    ["Manila", "manila, philippines", "Manila PH", "Metro Manila"],
+    ["Mumbai", "Bombay", "mumbai, india", "Mumbai, Maharashtra"],
+    ["Sao Paulo", "São Paulo", "sao paulo, brazil", "Sao Paolo"],
+]
+UNKNOWN = ["Lake Charles", "Biloxi", "Pensacola", "Gulfport", "Beaumont", "Port Arthur", "Slidell",
+           "Hilo", "Kauai", "Naples, FL", "Cedar Rapids", "Mayfield", "Lahaina", "Asheville"]
+
+
+class QuietLLM(LLMBackend):
+    name = 'stub'
+
+    def generate(self, prompt, system=None, timeout=None):
+        return LLMResponse("🧥 Dress for the weather.")
+
+
+def counting_api():
+    calls = []
+
+    def fetch(query):
+        calls.append(query)
+        return {'success': True, 'location': query, 'country': 'US', 'temperature': 60, 'feels_like': 58,
+                'condition': 'Cloudy', 'description': 'overcast clouds', 'humidity': 60, 'wind_speed': 5,
+                'timestamp': datetime.now().isoformat(), 'is_mock': False}
+    return fetch, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather cache hit rate with location canonicalization")
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--unknown', type=float, default=0.15, help="share of places not in the gazetteer")
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    traffic = [rng.choice(UNKNOWN) if rng.random() < args.unknown else rng.choice(rng.choice(SPELLINGS))
+               for _ in range(args.requests)]
+
+    print("=" * 70)
+    print("LOCATION CANONICALIZATION")
+    print("=" * 70)
+    loads = []
+    for _ in range(5):
+        start = time.perf_counter()
+        gazetteer = Gazetteer.load()
+        loads.append((time.perf_counter() - start) * 1000)
+    print(f"\n{args.requests} lookups, {args.unknown:.0%} for places outside the gazetteer; "
+          f"gazetteer loads in {min(loads):.1f} ms\n")
+    print(f"{'mode':<26}{'cache keys':>12}{'upstream':>10}{'cache hits':>12}{'canonical':>11}")
+
+    for label, gazetteer in [("raw strings (before)", Gazetteer()), ("canonicalized", gazetteer)]:
+        service = WeatherAlertService(llm_backend=QuietLLM(), cache_seconds=3600, gazetteer=gazetteer)
+        service._fetch_weather, calls = counting_api()
+        metrics.reset()
+        for location in traffic:
+            service.get_weather(location)
+        counters = metrics.snapshot()['counters']
+        hits = counters.get('weather_cache{result=hit}', 0) + counters.get('weather_cache{result=shared}', 0)
+        canonical = f"{gazetteer.hit_rate():.0%}" if gazetteer.places else "-"
+        print(f"{label:<26}{len(service.weather_cache.entries):>12}{len(calls):>10}"
+              f"{hits / len(traffic):>12.1%}{canonical:>11}")
+
+    fresh = Gazetteer.load()
+    distinct = sorted(set(traffic))
+    start = time.perf_counter()
+    for location in distinct:
+        fresh.resolve(location)
+    first = (time.perf_counter() - start) / len(distinct) * 1e6
+    start = time.perf_counter()
+    for location in traffic:
+        fresh.resolve(location)
+    repeat = (time.perf_counter() - start) / len(traffic) * 1e6
+    print(f"\nLookup cost: {first:.0f} µs for a new spelling, {repeat:.1f} µs for a repeated one")
+    print(f"Results: {fresh.stats()['lookups']}")
+
+
+if __name__ == "__main__":
+    main()
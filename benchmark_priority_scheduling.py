@@ -0,0 +1,85 @@
+"""
+Benchmark: queue latency per urgency class during a traffic burst
+Simulated Gemini/model calls compete for a few slots, first come first
+served versus the urgency priority queue
+
+Usage:
+    python benchmark_priority_scheduling.py [--requests 200] [--slots 4]
+"""
+
+import argparse
+import random
+import threading
+import time
+from admission import PriorityGate
+from metrics import Metrics
+from urgency import priority_for, urgency_score
+
+MESSAGES = {
+    'critical': ["My child is trapped and bleeding", "Help, water is rising in our house and we are on the roof"],
+    'high': ["My neighbour is injured", "How do I treat burns on my arm?"],
+    'normal': ["Tell me about hurricanes", "What is a tsunami?", "How do earthquakes form?"],
+}
+MIX = [('critical', 0.1), ('high', 0.2), ('normal', 0.7)]
+
+
+def run(requests, slots, service_seconds, arrival_seconds, use_priority, seed=3):
+    """Replay a burst and return queue waits by urgency class"""
+    recorder = Metrics()
+    gate = PriorityGate(slots, max_queue=requests)
+    rng = random.Random(seed)
+    threads = []
+
+    def call(priority):
+        with gate.slot(priority if use_priority else 'normal', max_wait=600) as granted:
+            assert granted
+            time.sleep(service_seconds)
+
+    def request(message):
+        # Score at ingress exactly as /chat does
+        priority = priority_for(urgency_score(message))
+        start = time.perf_counter()
+        call(priority)
+        recorder.observe('queue_wait_by_class', time.perf_counter() - start - service_seconds,
+                         priority=priority)
+
+    for _ in range(requests):
+        cls = rng.choices([c for c, _ in MIX], weights=[w for _, w in MIX])[0]
+        thread = threading.Thread(target=request, args=(rng.choice(MESSAGES[cls]),))
+        thread.start()
+        threads.append(thread)
+        time.sleep(arrival_seconds)
+    for thread in threads:
+        thread.join()
+    return recorder.snapshot()['latency']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-priority queue latency benchmark")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--slots', type=int, default=4)
+    parser.add_argument('--service-ms', type=float, default=100)
+    parser.add_argument('--arrival-ms', type=float, default=15)
+    args = parser.parse_args()
+
+    capacity = args.slots / (args.service_ms / 1000)
+    offered = 1000 / args.arrival_ms
+    print("=" * 70)
+    print("PRIORITY SCHEDULING UNDER A BURST")
+    print("=" * 70)
+    print(f"{args.requests} requests at {offered:.0f}/s against {capacity:.0f}/s of capacity "
+          f"({args.slots} slots x {args.service_ms:.0f} ms)\n")
+    print(f"{'':<16}{'priority':<10}{'count':>7}{'p50 wait':>12}{'p95 wait':>12}{'max wait':>12}")
+
+    for label, use_priority in [('FIFO', False), ('priority queue', True)]:
+        latency = run(args.requests, args.slots, args.service_ms / 1000, args.arrival_ms / 1000, use_priority)
+        for cls, _ in MIX:
+            stats = latency.get(f"queue_wait_by_class{{priority={cls}}}")
+            if stats:
+                print(f"{label:<16}{cls:<10}{stats['count']:>7}{stats['p50_ms']:>9.0f} ms"
+                      f"{stats['p95_ms']:>9.0f} ms{stats['max_ms']:>9.0f} ms")
+        label = ''
+
+
+if __name__ == "__main__":
+    main()
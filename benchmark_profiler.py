@@ -0,0 +1,112 @@
+"""
+Benchmark: /chat latency with the sampling profiler off, sampling some
+requests, and sampling all of them, plus the hot spots it found
+Sends a relief-line mix of questions through the app with Gemini replaced
+by the local stub server (llm_stub_server.py).
+
+Usage:
+    python benchmark_profiler.py [--requests 1000] [--interval-ms 10] [--stub-latency-ms 50]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+# Gemini is the stub; rate limits would shed the repeated questions
+os.environ['LIFELINK_LLM_BACKEND'] = 'stub'
+os.environ.setdefault('LIFELINK_IP_RATE', '100000')
+os.environ.setdefault('LIFELINK_IP_BURST', '100000')
+os.environ.setdefault('LIFELINK_SESSION_RATE', '100000')
+os.environ.setdefault('LIFELINK_SESSION_BURST', '100000')
+
+from llm_stub_server import start_stub_server
+
+MESSAGES = [
+    "Flood safety tips", "What should I do during an earthquake?", "Hello", "Thanks",
+    "What to avoid during a hurricane?", "How do I keep my {} calm in a {}?",
+    "Where can my {} get insulin after the {} closed pharmacies?",
+]
+WHO = ['dog', 'cat', 'grandmother', 'neighbor', 'baby', 'horse']
+WHAT = ['flood', 'hurricane', 'wildfire', 'blizzard', 'tornado']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat latency under the sampling profiler")
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--interval-ms', type=float, default=10)
+    parser.add_argument('--stub-latency-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    stub, os.environ['LIFELINK_LLM_STUB_URL'] = start_stub_server(latency_ms=args.stub_latency_ms)
+    import app as app_module
+    from profiler import profiler
+
+    rng = random.Random(4)
+    messages = [rng.choice(MESSAGES).format(rng.choice(WHO), rng.choice(WHAT)) for _ in range(args.requests)]
+    client = app_module.app.test_client()
+    workdir = tempfile.TemporaryDirectory()
+    profiler.interval = args.interval_ms / 1000
+
+    print("=" * 70)
+    print("SAMPLING PROFILER OVERHEAD")
+    print("=" * 70)
+    print(f"{args.requests} /chat requests, stub Gemini ~{args.stub_latency_ms:.0f} ms, "
+          f"sampling every {args.interval_ms:g} ms\n")
+    print(f"{'sample rate':<14}{'median ms':>10}{'p95 ms':>10}{'overhead':>10}")
+
+    # One session, warmed up so every configuration sees the same learned
+    # store; the sample rates take turns request by request
+    session_id = 'profile'
+    app_module.user_sessions[session_id] = app_module.DisasterChatbot(
+        learned_responses_file=os.path.join(workdir.name, 'learned.json'),
+        warm_responses_file=os.path.join(workdir.name, 'warm.json'))
+
+    def send(message):
+        start = time.perf_counter()
+        client.post('/chat', json={'message': message, 'session_id': session_id})
+        elapsed = time.perf_counter() - start
+        client.post('/reset', json={'session_id': session_id})
+        return elapsed
+
+    for message in sorted(set(messages)):
+        send(message)
+
+    rates = [0, 0.1, 1.0]
+    latencies = {rate: [] for rate in rates}
+    profiler.snapshot(reset=True)
+    for message in messages:
+        for rate in rates:
+            profiler.sample_rate = rate
+            latencies[rate].append(send(message))
+    profiler.sample_rate = 0
+    profile = profiler.snapshot()
+
+    baseline = None
+    for rate in rates:
+        ordered = sorted(latencies[rate])
+        median = ordered[len(ordered) // 2] * 1000
+        baseline = baseline or median
+        print(f"{rate:<14g}{median:>10.2f}{ordered[int(0.95 * len(ordered))] * 1000:>10.2f}"
+              f"{median / baseline - 1:>+10.1%}")
+
+    # Where the sampled time went: frames on the stack (inclusive) per answer path
+    inclusive = Counter()
+    for stack, count in profile.items():
+        frames = stack.split(';')
+        for frame in set(frames[2:]):
+            if frame.startswith(('chatbot.', 'learned_store.', 'llm_backends.', 'llm_usage.', 'near_duplicates.')):
+                inclusive[(frames[1], frame)] += count
+    total = sum(profile.values())
+    print(f"\nHot spots in the sampled requests (share of {total} samples):")
+    for (path, frame), count in inclusive.most_common(12):
+        print(f"  {count / total:>6.1%}  {path:<8}{frame}")
+
+    stub.shutdown()
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
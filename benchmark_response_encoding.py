@@ -0,0 +1,85 @@
+"""
+Benchmark: bytes per /chat response, verbose JSON versus compact encoding
+Sends a relief-line mix of questions through the app (Gemini replaced by
+the local stub server) in each negotiated format and reports the bytes on
+the wire per response.
+
+Usage:
+    python benchmark_response_encoding.py [--messages 200]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+# Gemini is the stub; rate limits would shed the repeated questions
+os.environ['LIFELINK_LLM_BACKEND'] = 'stub'
+os.environ.setdefault('LIFELINK_IP_RATE', '100000')
+os.environ.setdefault('LIFELINK_IP_BURST', '100000')
+os.environ.setdefault('LIFELINK_SESSION_RATE', '100000')
+os.environ.setdefault('LIFELINK_SESSION_BURST', '100000')
+
+from llm_stub_server import start_stub_server
+
+MESSAGES = [
+    "Flood safety tips", "What should I do during an earthquake?", "Hello", "Thanks",
+    "What to avoid during a hurricane?", "Fire emergency help", "Tornado advice",
+    "How do I keep my dog calm in a flood?", "Why is the tap water brown after the hurricane?",
+    "How do I treat a burn from the wildfire smoke?",
+]
+
+FORMATS = [
+    ('JSON (before)', {}),
+    ('JSON + gzip', {'Accept-Encoding': 'gzip'}),
+    ('compact', {'Accept': 'application/vnd.lifelink.compact+json'}),
+    ('compact + gzip', {'Accept': 'application/vnd.lifelink.compact+json', 'Accept-Encoding': 'gzip'}),
+    ('compact + catalog + gzip', {'Accept': 'application/vnd.lifelink.compact+json', 'Accept-Encoding': 'gzip',
+                                  'X-LifeLink-Catalog': None}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per /chat response by encoding")
+    parser.add_argument('--messages', type=int, default=200)
+    args = parser.parse_args()
+
+    stub, os.environ['LIFELINK_LLM_STUB_URL'] = start_stub_server()
+    import app as app_module
+
+    client = app_module.app.test_client()
+    rng = random.Random(5)
+    messages = [rng.choice(MESSAGES) for _ in range(args.messages)]
+    catalog = client.get('/answers', headers={'Accept-Encoding': 'gzip'})
+
+    print("=" * 70)
+    print("BYTES PER /chat RESPONSE")
+    print("=" * 70)
+    print(f"{args.messages} messages; the answer catalog is {len(catalog.data)} bytes gzipped, fetched once\n")
+    print(f"{'format':<28}{'mean bytes':>12}{'total KB':>12}{'vs before':>12}")
+
+    workdir = tempfile.TemporaryDirectory()
+    before = None
+    for n, (label, headers) in enumerate(FORMATS):
+        # One session per format with its own learned store, reset between
+        # messages so follow-up context stays out of the answers
+        session_id = f'format-{n}'
+        app_module.user_sessions[session_id] = app_module.DisasterChatbot(
+            learned_responses_file=os.path.join(workdir.name, f'{n}-learned.json'),
+            warm_responses_file=os.path.join(workdir.name, f'{n}-warm.json'))
+        if 'X-LifeLink-Catalog' in headers:
+            headers = dict(headers, **{'X-LifeLink-Catalog': app_module.static_answers.version})
+        total = 0
+        for message in messages:
+            response = client.post('/chat', json={'message': message, 'session_id': session_id}, headers=headers)
+            total += len(response.data)
+            client.post('/reset', json={'session_id': session_id})
+        before = before or total
+        print(f"{label:<28}{total / len(messages):>12.0f}{total / 1024:>12.1f}{total / before:>11.0%}")
+
+    stub.shutdown()
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: bytes transferred for static assets on a typical page load
+Compares the old policy (no-store on everything, uncompressed) with hashed,
+precompressed, immutable assets - on a first visit and on a repeat visit
+
+Usage:
+    python benchmark_static_assets.py
+"""
+
+import tempfile
+from flask import Flask, request
+from static_assets import AssetRegistry, build_assets, discover_sources
+
+# What a page embedding the widget loads: the script and a weather background
+PAGE_ASSETS = ['widget.js', 'images/Sunny.jpg']
+ACCEPT_ENCODING = 'br, gzip'
+# What a current mobile browser sends for images
+IMAGE_ACCEPT = 'image/avif,image/webp,image/apng,*/*;q=0.8'
+# Background display width on a phone (CSS pixels x device pixel ratio)
+IMAGE_WIDTH = 800
+
+
+def make_app(registry):
+    app = Flask(__name__)
+
+    @app.route('/widget.js')
+    def widget_js():
+        return registry.serve('widget.js')
+
+    @app.route('/assets/<version>/<path:name>')
+    def static_asset(version, name):
+        return registry.serve(name, version)
+
+    @app.route('/images/<path:filename>')
+    def negotiated_image(filename):
+        return registry.serve_image(f"images/{filename}", request.args.get('w', type=int))
+
+    return app
+
+
+class BrowserCache:
+    """Minimal HTTP cache: honours immutable max-age and revalidates with ETags"""
+
+    def __init__(self, client):
+        self.client = client
+        self.entries = {}
+
+    def get(self, url):
+        """Fetch a URL, returning bytes that went over the wire"""
+        cached = self.entries.get(url)
+        if cached and 'immutable' in cached['cache_control']:
+            return 0
+        headers = {'Accept-Encoding': ACCEPT_ENCODING, 'Accept': IMAGE_ACCEPT if '/images/' in url else '*/*'}
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        response = self.client.get(url, headers=headers)
+        body = len(response.get_data())
+        if response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            self.entries[url] = {
+                'etag': response.headers.get('ETag'),
+                'cache_control': response.headers.get('Cache-Control', '')
+            }
+        return body
+
+
+def page_urls(registry):
+    # Partner sites use the fixed widget URL; images are format-negotiated
+    return ['/widget.js'] + [
+        registry.image_url(name, IMAGE_WIDTH) for name in PAGE_ASSETS if name != 'widget.js'
+    ]
+
+
+def main():
+    sources = discover_sources()
+    old_bytes = sum(len(open(sources[name], 'rb').read()) for name in PAGE_ASSETS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_assets(sources, tmp)
+        registry = AssetRegistry(build_dir=tmp)
+        browser = BrowserCache(make_app(registry).test_client())
+        urls = page_urls(registry)
+        first = sum(browser.get(url) for url in urls)
+        repeat = sum(browser.get(url) for url in urls)
+
+    print("=" * 60)
+    print("STATIC ASSET BYTES PER PAGE LOAD")
+    print("=" * 60)
+    print(f"Assets: {', '.join(PAGE_ASSETS)} (Accept-Encoding: {ACCEPT_ENCODING}, images at {IMAGE_WIDTH}w)\n")
+    print(f"{'':<24}{'first visit':>16}{'repeat visit':>16}")
+    print(f"{'no-store, identity':<24}{old_bytes/1024:>13.1f} KB{old_bytes/1024:>13.1f} KB")
+    print(f"{'hashed + precompressed':<24}{first/1024:>13.1f} KB{repeat/1024:>13.1f} KB")
+    print(f"\nSaved: {1 - first/old_bytes:.0%} on first visit, {1 - repeat/old_bytes:.0%} on repeat visits")
+
+
+if __name__ == "__main__":
+    main()
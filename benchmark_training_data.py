@@ -0,0 +1,79 @@
+"""
+Benchmark training-sample generation
+Compares the original row-by-row (iterrows) loop against the vectorized
+batch pipeline on the full disaster response message set
+"""
+
+import time
+import pandas as pd
+from train_model import DisasterChatbotTrainer, NON_CATEGORY_COLUMNS
+
+
+def legacy_message_samples(dataset, knowledge):
+    """Original iterrows implementation, without the 5,000 row cap"""
+    samples = []
+    df = pd.DataFrame(dataset['train'])
+    
+    for idx, row in df.iterrows():
+        message = str(row.get('message', ''))
+        if len(message) < 10:
+            continue
+        
+        categories = []
+        for col in df.columns:
+            if col not in NON_CATEGORY_COLUMNS:
+                if row.get(col) == 1:
+                    categories.append(col.replace('_', ' '))
+        
+        if categories:
+            category_text = ', '.join(categories[:3])
+            input_text = f"A person needs help with: {category_text}. Message: {message[:200]}"
+            output_text = f"This is a {category_text} situation. I understand you need assistance. "
+            
+            for cat_key, cat_data in knowledge.items():
+                if any(cat in cat_key for cat in categories):
+                    output_text += f"Important do's: {', '.join(cat_data['dos'][:3])}. "
+                    output_text += f"Critical don'ts: {', '.join(cat_data['donts'][:3])}."
+                    break
+            
+            samples.append({'input': input_text, 'output': output_text[:512]})
+    
+    return samples
+
+
+def benchmark_training_data():
+    print("=" * 70)
+    print("TRAINING SAMPLE GENERATION BENCHMARK")
+    print("=" * 70)
+    
+    trainer = DisasterChatbotTrainer(load_model=False)
+    dataset = trainer.load_disaster_dataset()
+    knowledge = trainer.load_knowledge_base()
+    rows = len(dataset['train'])
+    print(f"\nMessages in train split: {rows}\n")
+    
+    start = time.perf_counter()
+    legacy = legacy_message_samples(dataset, knowledge)
+    legacy_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    vectorized = list(trainer.iter_training_samples(dataset, knowledge))
+    vectorized_time = time.perf_counter() - start
+    # Knowledge base Q&A pairs are appended after the messages
+    vectorized_messages = vectorized[:len(vectorized) - 4 * len(knowledge)]
+    
+    start = time.perf_counter()
+    pipeline = trainer.build_training_dataset(dataset, knowledge)
+    pipeline_time = time.perf_counter() - start
+    
+    print(f"iterrows loop:        {legacy_time:8.2f}s  ({rows / legacy_time:,.0f} rows/s, {len(legacy)} samples)")
+    print(f"vectorized generator: {vectorized_time:8.2f}s  ({rows / vectorized_time:,.0f} rows/s, {len(vectorized_messages)} samples)")
+    print(f"datasets map:         {pipeline_time:8.2f}s  ({rows / pipeline_time:,.0f} rows/s, {len(pipeline)} samples incl. knowledge base)")
+    print(f"\nSpeedup (generator vs iterrows): {legacy_time / vectorized_time:.1f}x")
+    
+    assert vectorized_messages == legacy, "Vectorized samples differ from the iterrows loop"
+    print("✓ Vectorized samples are identical to the iterrows loop")
+
+
+if __name__ == "__main__":
+    benchmark_training_data()
@@ -0,0 +1,87 @@
+"""
+Benchmark: cold-start latency with and without the startup warm-up
+Asks near variants of the common question templates right after startup,
+once against an empty warm cache and once after the warm-up has run.
+
+Uses Gemini or the trained model when available; otherwise (or with
+--simulate-ms) generation is simulated with a fixed delay.
+
+Usage:
+    python benchmark_warmup.py [--simulate-ms 1500]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from chatbot import DisasterChatbot
+from metrics import Metrics
+from warmup import Warmup
+
+
+def variant_questions(knowledge):
+    """Rephrasings that miss the knowledge base intents but match a template"""
+    for disaster_type in knowledge:
+        name = disaster_type.replace('_', ' ')
+        yield f"During a {name}, what to do?"
+        yield f"{name.title()}: what to do during it"
+
+
+def make_bot(workdir, simulate_seconds):
+    bot = DisasterChatbot(learned_responses_file=os.path.join(workdir, 'learned.json'),
+                          warm_responses_file=os.path.join(workdir, 'warm.json'))
+    if simulate_seconds is not None:
+        def simulated(question, disaster_type, use_gemini, knowledge_response, learn=True, context=None):
+            time.sleep(simulate_seconds)
+            return f"Generated answer for: {question}"
+        bot._generate_expensive_response = simulated
+        bot.model_loaded = True
+    return bot
+
+
+def first_ask_latency(bot, questions):
+    recorder = Metrics()
+    for question in questions:
+        start = time.perf_counter()
+        bot.chat(question)
+        recorder.observe('first_ask', time.perf_counter() - start)
+    return recorder.snapshot()['latency']['first_ask']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start latency with and without warm-up")
+    parser.add_argument('--simulate-ms', type=float, default=None,
+                        help="Simulated generation time (default: real backends, or 1500 if none)")
+    args = parser.parse_args()
+
+    results = {}
+    warmup_report = None
+    for label in ('without warm-up', 'with warm-up'):
+        with tempfile.TemporaryDirectory() as workdir:
+            simulate = args.simulate_ms
+            bot = make_bot(workdir, None if simulate is None else simulate / 1000)
+            if not bot.can_pregenerate and simulate is None:
+                simulate = args.simulate_ms = 1500
+                bot = make_bot(workdir, simulate / 1000)
+            if label == 'with warm-up':
+                warmup = Warmup(bot, top_n=0, interval=0)
+                warmup.run()
+                warmup_report = warmup.report()
+            results[label] = first_ask_latency(bot, list(variant_questions(bot.knowledge)))
+
+    print("=" * 70)
+    print("COLD-START LATENCY")
+    print("=" * 70)
+    backend = f"simulated {args.simulate_ms:.0f} ms generation" if args.simulate_ms else "real backends"
+    print(f"First ask of near-template questions right after startup ({backend})\n")
+    print(f"{'':<18}{'questions':>10}{'p50':>12}{'p95':>12}{'max':>12}")
+    for label, stats in results.items():
+        print(f"{label:<18}{stats['count']:>10}{stats['p50_ms']:>9.0f} ms"
+              f"{stats['p95_ms']:>9.0f} ms{stats['max_ms']:>9.0f} ms")
+    cold = warmup_report['cold_start_ms']
+    print(f"\nWarm-up generated {warmup_report['counts']['generated']} answers in the background "
+          f"(mean {cold['mean']:.0f} ms each)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: weather alerts for many locations, sequential versus bulk
+The weather API is simulated with a fixed delay and Gemini is the local
+stub server (llm_stub_server.py), so only the lookups' overlap, the cache
+and shared recommendations differ between the runs.
+
+Usage:
+    python benchmark_weather_bulk.py [--locations 50] [--api-latency-ms 250]
+                                     [--stub-latency-ms 600] [--climates 8]
+"""
+
+import argparse
+import random
+import time
+import zlib
+from datetime import datetime
+from llm_backends import StubBackend
+from llm_stub_server import start_stub_server
+from llm_usage import usage
+from weather_service import WEATHER_WORKERS, WeatherAlertService
+
+CLIMATES = [('Rainy', 'light rain'), ('Sunny', 'clear sky'), ('Cloudy', 'overcast clouds'),
+            ('Snowy', 'light snow'), ('Stormy', 'thunderstorm'), ('Foggy', 'mist')]
+
+
+def simulated_api(climates, latency):
+    """WeatherAPI.com stand-in: nearby towns report the same conditions"""
+    def fetch(location):
+        time.sleep(latency)
+        rng = random.Random(zlib.crc32(location.encode('utf-8')) % climates)
+        condition, description = rng.choice(CLIMATES)
+        temperature = rng.randrange(30, 95, 5)
+        return {'success': True, 'location': location, 'country': 'US', 'temperature': temperature,
+                'feels_like': temperature - 2, 'condition': condition, 'description': description,
+                'humidity': rng.randrange(40, 95, 5), 'wind_speed': rng.randrange(0, 30, 5),
+                'timestamp': datetime.now().isoformat(), 'is_mock': False}
+    return fetch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential versus bulk weather alerts")
+    parser.add_argument('--locations', type=int, default=50)
+    parser.add_argument('--api-latency-ms', type=float, default=250)
+    parser.add_argument('--stub-latency-ms', type=float, default=600)
+    parser.add_argument('--climates', type=int, default=8, help="distinct sets of conditions among the locations")
+    args = parser.parse_args()
+
+    stub, url = start_stub_server(latency_ms=args.stub_latency_ms)
+    locations = [f"Town {n}" for n in range(args.locations)]
+    fetch = simulated_api(args.climates, args.api_latency_ms / 1000)
+
+    def service(cache_seconds):
+        weather = WeatherAlertService(llm_backend=StubBackend(url), cache_seconds=cache_seconds)
+        weather._fetch_weather = fetch
+        return weather
+
+    print("=" * 70)
+    print("BULK WEATHER ALERTS")
+    print("=" * 70)
+    print(f"{args.locations} locations ({args.climates} climates), API ~{args.api_latency_ms:.0f} ms, "
+          f"stub Gemini ~{args.stub_latency_ms:.0f} ms, {WEATHER_WORKERS} workers\n")
+    print(f"{'mode':<34}{'seconds':>10}{'LLM calls':>12}")
+
+    uncached, cached = service(0), service(600)
+    runs = [
+        ('sequential, no cache (before)', lambda: [uncached.get_weather_alert(location) for location in locations]),
+        ('bulk, cold cache', lambda: cached.get_weather_alerts(locations)),
+        ('bulk, warm cache', lambda: cached.get_weather_alerts(locations)),
+    ]
+    results = []
+    for label, run in runs:
+        usage.reset()
+        start = time.perf_counter()
+        alerts = run()
+        elapsed = time.perf_counter() - start
+        results.append(elapsed)
+        calls = usage.report()['totals']['calls']
+        ok = all(alert['success'] for alert in alerts)
+        print(f"{label:<34}{elapsed:>10.2f}{calls:>12}" + ("" if ok else "  (errors)"))
+
+    print(f"\nBulk speedup: {results[0] / results[1]:.1f}x with a cold cache; "
+          f"a warm one answers in {results[2] * 1000:.1f} ms")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: weather subscriptions under a simulated 10k-subscriber load
+Subscribers (one thread each, as SSE connections are served) watch a set of
+locations with a skewed popularity. The weather API is simulated with a
+delay and conditions that change now and then; Gemini is the local stub
+server (llm_stub_server.py). Reports upstream weather and LLM calls per
+minute, against every widget polling /weather-alert itself, and the push
+fan-out latency from a poll noticing a change to each subscriber having it.
+
+Usage:
+    python benchmark_weather_subscriptions.py [--subscribers 10000] [--locations 50]
+                                              [--poll-seconds 2] [--duration 20]
+"""
+
+import argparse
+import random
+import threading
+import time
+from datetime import datetime
+from llm_backends import StubBackend
+from llm_stub_server import start_stub_server
+from llm_usage import usage
+from weather_service import WeatherAlertService
+from weather_subscriptions import WeatherSubscriptions
+
+# As /weather/subscribe waits between keep-alive comments
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def simulated_api(latency, change_rate, seed=3):
+    """WeatherAPI.com stand-in whose temperature drifts on some polls"""
+    rng = random.Random(seed)
+    temperatures = {}
+    lock = threading.Lock()
+    calls = []
+
+    def fetch(location):
+        time.sleep(latency)
+        with lock:
+            calls.append(location)
+            temperature = temperatures.get(location, 60)
+            if rng.random() < change_rate:
+                temperature += rng.choice((-5, 5))
+            temperatures[location] = temperature
+        return {'success': True, 'location': location, 'country': 'US', 'temperature': temperature,
+                'feels_like': temperature - 2, 'condition': 'Cloudy', 'description': 'overcast clouds',
+                'humidity': 60, 'wind_speed': 10, 'timestamp': datetime.now().isoformat(), 'is_mock': False}
+    return fetch, calls
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000 if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather subscription fan-out under load")
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--locations', type=int, default=50)
+    parser.add_argument('--poll-seconds', type=float, default=2)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--change-rate', type=float, default=0.5, help="chance the weather changed at a poll")
+    parser.add_argument('--api-latency-ms', type=float, default=200)
+    parser.add_argument('--stub-latency-ms', type=float, default=300)
+    args = parser.parse_args()
+
+    stub, url = start_stub_server(latency_ms=args.stub_latency_ms)
+    fetch, upstream_calls = simulated_api(args.api_latency_ms / 1000, args.change_rate)
+    service = WeatherAlertService(llm_backend=StubBackend(url))
+    service._fetch_weather = fetch
+    subscriptions = WeatherSubscriptions(service, poll_seconds=args.poll_seconds,
+                                         max_subscribers=args.subscribers, max_locations=args.locations)
+
+    # Popularity is skewed: a few cities hold most viewers
+    rng = random.Random(11)
+    weights = [1 / (rank + 1) for rank in range(args.locations)]
+    chosen = rng.choices([f"City {n}" for n in range(args.locations)], weights=weights, k=args.subscribers)
+
+    print("=" * 70)
+    print("WEATHER SUBSCRIPTIONS")
+    print("=" * 70)
+    print(f"{args.subscribers} subscribers over {args.locations} locations for {args.duration:.0f} s, "
+          f"polled every {args.poll_seconds:g} s\n")
+
+    measuring = threading.Event()
+    stop = threading.Event()
+    latencies = []
+    received = [0]
+    lock = threading.Lock()
+
+    def viewer(location):
+        subscription = subscriptions.subscribe(location)
+        mine = []
+        # Idle like an SSE connection between heartbeats
+        while not stop.is_set():
+            event = subscription.next_event(timeout=SSE_HEARTBEAT_SECONDS)
+            if event and measuring.is_set() and not stop.is_set():
+                mine.append(time.monotonic() - event.published)
+        subscriptions.unsubscribe(subscription)
+        with lock:
+            latencies.extend(mine)
+            received[0] += len(mine)
+
+    threading.stack_size(256 * 1024)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=viewer, args=(location,), daemon=True) for location in chosen]
+    for thread in threads:
+        thread.start()
+    while subscriptions.subscriber_count() < args.subscribers:
+        time.sleep(0.05)
+    print(f"Subscribed in {time.perf_counter() - start:.1f} s; "
+          f"{subscriptions.poller_count()} pollers for {subscriptions.subscriber_count()} subscribers")
+
+    # Measure steady state only
+    usage.reset()
+    upstream_calls.clear()
+    start = time.perf_counter()
+    measuring.set()
+    time.sleep(args.duration)
+    stop.set()
+    minutes = (time.perf_counter() - start) / 60
+    print("Waiting for subscribers to see their next heartbeat and leave...")
+    for thread in threads:
+        thread.join()
+
+    ordered = sorted(latencies)
+    llm_calls = usage.report()['totals']['calls']
+    per_widget = args.subscribers * 60 / args.poll_seconds
+    print(f"\n{'':<30}{'per minute':>14}")
+    print(f"{'upstream weather calls':<30}{len(upstream_calls) / minutes:>14.0f}")
+    print(f"{'Gemini recommendation calls':<30}{llm_calls / minutes:>14.0f}")
+    print(f"{'widgets polling themselves':<30}{per_widget:>14.0f}  (uncached: weather and Gemini calls each)")
+    print(f"{'events pushed':<30}{received[0] / minutes:>14.0f}")
+    print(f"\nFan-out latency: p50 {percentile(ordered, 0.5):.1f} ms, p95 {percentile(ordered, 0.95):.1f} ms, "
+          f"p99 {percentile(ordered, 0.99):.1f} ms, max {percentile(ordered, 1):.1f} ms")
+    time.sleep(0.1)
+    print(f"Pollers left after everyone unsubscribed: {subscriptions.poller_count()}")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
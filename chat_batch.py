@@ -0,0 +1,174 @@
+"""
+Batch Chat
+Answers many messages in one request for SMS and relay gateways
+(POST /chat/batch). Each round takes at most one message per session, so
+a session's messages are answered in order with their conversation context:
+    1. Cheap steps (learned/pre-generated answers, greetings, knowledge
+       base intents, load shedding) run for every message in turn
+    2. Messages for the local model share padded generation passes,
+       MODEL_BATCH_SIZE at a time, each pass holding one in-flight slot
+    3. Messages for Gemini are fanned out in parallel, each queueing for
+       an in-flight slot by priority like a single /chat message
+
+Batches don't race sources against LIFELINK_RACE_SLO; gateways relay
+SMS, where a few seconds more matter less than throughput.
+"""
+
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from admission import MAX_EXPENSIVE_IN_FLIGHT, PRIORITY_HEAD_START, expensive_calls
+from chatbot import MIN_MODEL_ANSWER_LENGTH
+from metrics import metrics
+from profiler import profiler
+
+# Messages accepted in one batch request
+MAX_BATCH_ITEMS = int(os.environ.get('LIFELINK_BATCH_MAX_ITEMS', 500))
+
+# Sessions one batch may start (each keeps a chatbot in memory)
+MAX_BATCH_NEW_SESSIONS = int(os.environ.get('LIFELINK_BATCH_MAX_NEW_SESSIONS', 50))
+
+# Messages per shared model generation pass
+MODEL_BATCH_SIZE = int(os.environ.get('LIFELINK_MODEL_BATCH_SIZE', 16))
+
+# Gemini calls are bounded by the in-flight slots anyway
+_executor = ThreadPoolExecutor(max_workers=MAX_EXPENSIVE_IN_FLIGHT, thread_name_prefix='chat-batch')
+
+
+class BatchItem:
+    def __init__(self, session_id, message, bot, priority='normal', shed_reason=None):
+        """
+        Args:
+            session_id: Session the message belongs to
+            message: The user's message
+            bot: The session's DisasterChatbot
+            priority: Urgency class used to queue for Gemini/model capacity
+            shed_reason: Set by admission control when the client is over its rate
+        """
+        self.session_id = session_id
+        self.message = message
+        self.bot = bot
+        self.priority = priority
+        self.shed_reason = shed_reason
+        self.pending = None
+        self.response = None
+        self.degraded_reason = None
+        self.path = None  # 'cheap', 'model' or 'gemini'
+
+
+def batch_rounds(items):
+    """Split items into rounds with at most one message per session, keeping order"""
+    rounds = []
+    seen = {}  # session_id -> messages so far
+    for item in items:
+        position = seen.get(item.session_id, 0)
+        seen[item.session_id] = position + 1
+        if position == len(rounds):
+            rounds.append([])
+        rounds[position].append(item)
+    return rounds
+
+
+def answer_batch(items, executor=None):
+    """
+    Answer a batch of messages
+    Args:
+        items: BatchItems, in the order the gateway received them
+        executor: Runs the Gemini-bound messages (default: the shared pool)
+    Returns:
+        list: The same items with response, degraded_reason and path set
+    """
+    start = time.perf_counter()
+    for batch_round in batch_rounds(items):
+        _answer_round(batch_round, executor or _executor)
+
+    metrics.increment('batch_requests')
+    metrics.observe('batch_latency', time.perf_counter() - start)
+    metrics.observe_value('batch_items', len(items))
+    return items
+
+
+def _submit(executor, fn, *args):
+    # Gemini calls are still attributed to the batch route (and profiled with it)
+    return executor.submit(contextvars.copy_context().run, profiler.traced(fn), *args)
+
+
+def _answer_round(items, executor):
+    model_bound, futures = [], []
+    for item in items:
+        item.bot.degraded_reason = None
+        item.response, item.pending = item.bot.prepare_response(item.message, item.shed_reason)
+        if item.pending is None:
+            item.path = 'cheap'
+        elif not item.pending.use_gemini and item.bot.model_loaded:
+            item.path = 'model'
+            model_bound.append(item)
+        else:
+            item.path = 'gemini'
+            futures.append(_submit(executor, _answer_pending, item))
+
+    # The model passes run while the Gemini calls are in flight
+    for item, answer in _generate_model_batches(model_bound):
+        if len(answer) < MIN_MODEL_ANSWER_LENGTH and item.bot.gemini_available:
+            futures.append(_submit(executor, _finish_model_response, item, answer))
+        else:
+            item.response = _finish_model_answer(item, answer)
+    wait(futures)
+    for future in futures:
+        future.result()
+
+    for item in items:
+        item.degraded_reason = item.bot.degraded_reason
+        item.bot.record_turn(item.message, item.response)
+        metrics.increment('batch_answers', path=item.path)
+        profiler.set_path(item.path)
+
+
+def _answer_pending(item):
+    item.response = item.bot.answer_pending(item.pending, item.priority)
+
+
+def _finish_model_answer(item, answer):
+    pending = item.pending
+    return item.bot.finish_model_response(answer, pending.message, pending.disaster_type, pending.learn,
+                                          pending.context)
+
+
+def _finish_model_response(item, answer):
+    """Too-short model answer: ask Gemini once a slot is free"""
+    with expensive_calls.slot(item.priority) as granted:
+        item.response = _finish_model_answer(item, answer) if granted else item.bot.shed_pending(item.pending)
+
+
+def _generate_model_batches(items):
+    """
+    Generate model answers in shared passes, most urgent messages first
+    Yields:
+        tuple: (item, model answer) for each item that got one; the rest
+            are answered directly (shed, or one at a time after an error)
+    """
+    # Sessions may sit on different model versions - batch each version apart
+    groups = {}
+    for item in sorted(items, key=lambda item: -PRIORITY_HEAD_START[item.priority]):
+        groups.setdefault(id(getattr(item.bot, 'model', None)), []).append(item)
+
+    for group in groups.values():
+        for i in range(0, len(group), MODEL_BATCH_SIZE):
+            chunk = group[i:i + MODEL_BATCH_SIZE]
+            with expensive_calls.slot(chunk[0].priority) as granted:
+                if not granted:
+                    for item in chunk:
+                        item.response = item.bot.shed_pending(item.pending)
+                    continue
+                try:
+                    answers = chunk[0].bot.generate_with_model_batch([item.message for item in chunk])
+                except Exception as e:
+                    print(f"Batch generation failed, answering one at a time: {e}")
+                    answers = None
+            if answers is None:
+                for item in chunk:
+                    item.response = item.bot.answer_pending(item.pending, item.priority)
+                continue
+            metrics.observe_value('model_batch_size', len(chunk))
+            yield from zip(chunk, answers)
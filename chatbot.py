@@ -6,7 +6,7 @@ This handles the chatbot conversation and response generation
 # Try to import torch and transformers (optional for Gemini-only mode)
 try:
     import torch
-    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    import transformers  # noqa: F401 - needed by the shared model loader
     TORCH_AVAILABLE = True
 except ImportError:
     TORCH_AVAILABLE = False
@@ -15,26 +15,123 @@ except ImportError:
 import json
 import re
 import os
+import time
 from dotenv import load_dotenv
-import google.generativeai as genai
-from datetime import datetime
+from datetime import datetime, timedelta
+from learned_store import LearnedResponseStore
+from llm_backends import create_backend, evict_shared_models, load_shared_model
+from llm_usage import call_llm
+from admission import expensive_calls
+from answer_race import RACE_SLO_SECONDS, race
+from conversation_context import ConversationContext, estimate_tokens
+from metrics import metrics
+from profiler import profiler
+from prompt_templates import CHAT_PROMPT
+from model_versions import latest_version, resolve_model_path
 
 # Load environment variables
 load_dotenv()
 
+# How often a running chatbot looks for a newly published model version
+MODEL_VERSION_CHECK_SECONDS = 30
+
+# Gemini calls slower than this are abandoned (they hold an in-flight slot)
+GEMINI_TIMEOUT_SECONDS = 20
+
+# Answers pre-generated by the warm-up are regenerated after this long
+WARM_RESPONSE_MAX_AGE = timedelta(hours=24)
+
+# Footer lines under answers, below the separator (compact responses
+# send them as short codes - see compact_responses.py)
+FOOTER_SEPARATOR = "━━━━━━━━━━━━━━━━━━━━━━━━"
+EMERGENCY_FOOTER = "⚠️ For emergencies, call 911 first!"
+LEARNED_FOOTER = "📚 *Response from learned knowledge base*"
+SAVED_FOOTER = "💾 *This response has been saved for future learning*"
+HIGH_DEMAND_FOOTER = "⏳ *High demand right now - showing standard safety guidance.*"
+
+# Appended to answers given in degraded mode
+DEGRADED_NOTICE = f"\n\n{FOOTER_SEPARATOR}\n{HIGH_DEMAND_FOOTER}\n{EMERGENCY_FOOTER}"
+
+GREETING_RESPONSE = """👋 {name_match}I'm your LifeLink Disaster Response Assistant.
+
+I'm here to help you during emergencies. I can provide:
+
+🆘 Safety guidelines for various disasters
+✅ Do's and Don'ts for emergency situations
+📞 Emergency contact information
+💡 Immediate action steps
+
+You can ask me things like:
+• "What should I do during an earthquake?"
+• "Flood safety tips"
+• "Fire emergency help"
+• "Hurricane preparation"
+
+Type your question or click a quick action button above! 🚨"""
+
+THANK_YOU_RESPONSE = """You're welcome! 😊 Stay safe and remember:
+
+🚨 **In life-threatening emergencies, always call 911 first!**
+
+I'm here if you need more safety information or have other questions about disaster preparedness.
+
+Take care! 🙏"""
+
+# Model answers shorter than this are too generic to stand alone
+MIN_MODEL_ANSWER_LENGTH = 50
+
+# Decoding settings for the local model
+MODEL_GENERATION_KWARGS = {
+    'max_length': 256,
+    'num_beams': 4,
+    'temperature': 0.7,
+    'do_sample': True,
+    'top_p': 0.9,
+    'no_repeat_ngram_size': 3
+}
+
+# Assisted (draft model) decoding verifies draft tokens one sequence at a
+# time, so it runs greedy without beams
+ASSISTED_GENERATION_KWARGS = {
+    'max_length': 256,
+    'num_beams': 1,
+    'do_sample': False,
+    'no_repeat_ngram_size': 3
+}
+
+class PendingAnswer:
+    """A message that needs Gemini or the local model (see prepare_response)"""
+    def __init__(self, message, disaster_type, use_gemini, knowledge_response, learn, context):
+        self.message = message
+        self.disaster_type = disaster_type
+        self.use_gemini = use_gemini
+        self.knowledge_response = knowledge_response
+        self.learn = learn
+        self.context = context
+
 class DisasterChatbot:
-    def __init__(self, model_path="./disaster_chatbot_model", knowledge_file="disaster_knowledge_extended.json", learned_responses_file="learned_responses.json"):
+    def __init__(self, model_path="./disaster_chatbot_model", knowledge_file="disaster_knowledge_extended.json", learned_responses_file="learned_responses.json", draft_model_path=None, warm_responses_file="warm_responses.json", llm_backend=None):
         """
         Initialize the chatbot with self-learning capability
         Args:
             model_path: Path to the trained model
             knowledge_file: Path to disaster knowledge JSON
             learned_responses_file: Path to save learned responses from Gemini
+            draft_model_path: Optional small model for assisted decoding
+                (default: LIFELINK_DRAFT_MODEL environment variable)
+            warm_responses_file: Answers pre-generated by the startup warm-up
+            llm_backend: LLMBackend for the fallback (default: from configuration,
+                see llm_backends.py)
         """
         self.learned_responses_file = learned_responses_file
         
-        # Load learned responses (saved from Gemini)
-        self.learned_responses = self._load_learned_responses()
+        # Load learned responses (saved from Gemini) - one store shared by all sessions
+        self.learned_store = LearnedResponseStore.shared(learned_responses_file)
+        self.learned_responses = self.learned_store.responses
+        
+        # Pre-generated answers for common questions (see warmup.py), kept
+        # apart from learned responses so they are never trained on
+        self.warm_store = LearnedResponseStore.shared(warm_responses_file)
         # Set device only if torch is available
         if TORCH_AVAILABLE:
             self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -60,37 +157,34 @@ class DisasterChatbot:
             except:
                 pass
         
-        if self.gemini_api_key:
-            try:
-                genai.configure(api_key=self.gemini_api_key)
-                self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-                self.gemini_available = True
-                print("✓ Gemini 2.0 Flash fallback enabled")
-            except Exception as e:
-                print(f"Warning: Gemini fallback unavailable: {e}")
-                self.gemini_available = False
+        # LLM fallback: Gemini unless LIFELINK_LLM_BACKEND selects another
+        # (gemini_available is True whenever some LLM backend is usable)
+        try:
+            self.llm = llm_backend or create_backend(api_key=self.gemini_api_key)
+        except Exception as e:
+            print(f"Warning: LLM fallback unavailable: {e}")
+            self.llm = None
+        self.gemini_available = self.llm is not None
+        if self.llm:
+            print(f"✓ {self.llm.label} fallback enabled")
         else:
-            self.gemini_available = False
             print("ℹ️  Gemini fallback not configured (add API key to .env)")
         
         # Try to load local model only if PyTorch is available
+        self.model_path = model_path
+        self.model_version_path = None
+        self._last_version_check = time.monotonic()
         self.model_loaded = False
         if TORCH_AVAILABLE:
             try:
-                self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-                self.model = AutoModelForSeq2SeqLM.from_pretrained(model_path)
-                self.model.to(self.device)
-                self.model.eval()
+                self._load_model(resolve_model_path(model_path))
                 self.model_loaded = True
                 print("✓ Custom trained model loaded successfully")
             except Exception as e:
                 print(f"Warning: Could not load custom model: {e}")
                 try:
                     print("Loading base model instead...")
-                    self.tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-base")
-                    self.model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-base")
-                    self.model.to(self.device)
-                    self.model.eval()
+                    self._load_model("google/flan-t5-base")
                     self.model_loaded = False
                     print("✓ Base model loaded successfully")
                 except Exception as e2:
@@ -100,11 +194,26 @@ class DisasterChatbot:
         else:
             print("ℹ️  PyTorch not available - using Gemini API only")
         
+        # Optional draft model for assisted decoding (must share the tokenizer)
+        self.draft_model = None
+        draft_model_path = draft_model_path or os.getenv('LIFELINK_DRAFT_MODEL')
+        if TORCH_AVAILABLE and draft_model_path and self.model_version_path:
+            try:
+                _, self.draft_model = load_shared_model(draft_model_path, self.device, pin=True)
+                print(f"✓ Draft model loaded for assisted decoding ({draft_model_path})")
+            except Exception as e:
+                print(f"Warning: Could not load draft model: {e}")
+        
         # Load extended knowledge base
         try:
             with open(knowledge_file, 'r', encoding='utf-8') as f:
                 self.knowledge = json.load(f)
             print(f"✓ Loaded extended knowledge base with {len(self.knowledge)} disaster types")
+            # Unrecognised disasters are answered with the general guidance,
+            # which only the basic knowledge base has
+            if 'general_disaster' not in self.knowledge:
+                with open('disaster_knowledge.json', 'r', encoding='utf-8') as f:
+                    self.knowledge['general_disaster'] = json.load(f)['general_disaster']
         except Exception as e:
             print(f"Warning: Extended knowledge base not found ({e}), loading basic version...")
             try:
@@ -114,90 +223,139 @@ class DisasterChatbot:
                 print("Warning: No knowledge base found")
                 self.knowledge = {}
         
-        self.conversation_history = []
+        # Bounded, token-budgeted history used as context for Gemini
+        self.context = ConversationContext()
+        
+        # Why the last answer skipped Gemini/the model (None if it didn't)
+        self.degraded_reason = None
+        
+        # Race Gemini and the model against this deadline (None: one after another)
+        self.race_slo = RACE_SLO_SECONDS
         
         print(f"✓ Loaded {len(self.learned_responses)} learned responses from previous conversations")
     
-    def _load_learned_responses(self):
-        """Load previously learned responses from file"""
+    def _load_model(self, path):
+        """Load (or reuse) the model at path, shared by every chatbot instance"""
+        self.tokenizer, self.model = load_shared_model(path, self.device)
+        self.model_version_path = path
+    
+    def _maybe_reload_model(self):
+        """
+        Switch to a newly published model version without a restart
+        The LATEST pointer is checked at most every MODEL_VERSION_CHECK_SECONDS
+        """
+        now = time.monotonic()
+        if now - self._last_version_check < MODEL_VERSION_CHECK_SECONDS:
+            return
+        self._last_version_check = now
+        
+        if not latest_version(self.model_path):
+            return
+        path = resolve_model_path(self.model_path)
+        if path == self.model_version_path:
+            return
         try:
-            if os.path.exists(self.learned_responses_file):
-                with open(self.learned_responses_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
+            print(f"🔄 Switching to model version {path}...")
+            self._load_model(path)
+            self.model_loaded = True
+            evict_shared_models(keep=path)
+            print("✓ Model version switched")
         except Exception as e:
-            print(f"Note: Could not load learned responses: {e}")
-            return {}
+            print(f"Warning: Could not load model version {path}: {e}")
     
     def _save_learned_response(self, question, answer, disaster_type='general'):
         """
         Save a new learned response from Gemini
-        This builds our knowledge base automatically
+        This builds our knowledge base automatically; rephrasings of a
+        question we already know are merged into that entry as aliases
         """
         try:
-            # Create a normalized key from the question
-            key = question.lower().strip()
-            
-            # Save the response with metadata
-            self.learned_responses[key] = {
-                'question': question,
-                'answer': answer,
-                'disaster_type': disaster_type,
-                'learned_from': 'gemini',
-                'timestamp': datetime.now().isoformat(),
-                'usage_count': 1
-            }
-            
-            # Save to file
-            with open(self.learned_responses_file, 'w', encoding='utf-8') as f:
-                json.dump(self.learned_responses, f, indent=2, ensure_ascii=False)
-            
-            print(f"✓ Learned new response: '{question[:50]}...'")
+            key, merged = self.learned_store.add(question, answer, disaster_type)
+            if merged:
+                print(f"✓ Merged near-duplicate question into: '{self.learned_responses[key]['question'][:50]}...'")
+            else:
+                print(f"✓ Learned new response: '{question[:50]}...'")
             return True
             
         except Exception as e:
             print(f"Error saving learned response: {e}")
             return False
     
-    def _find_similar_learned_response(self, question):
+    def _find_similar_learned_response(self, question, disaster_type=None):
         """
         Search learned responses for similar questions
-        Uses keyword matching to find relevant saved responses
+        Uses near-duplicate (MinHash) matching, then keyword overlap
+        Args:
+            disaster_type: Only reuse answers learned for this disaster type
         """
-        question_lower = question.lower()
-        question_words = set(question_lower.split())
-        
-        best_match = None
-        best_score = 0
-        
-        for key, response_data in self.learned_responses.items():
-            # Calculate similarity score (simple word overlap)
-            key_words = set(key.split())
-            overlap = len(question_words & key_words)
-            score = overlap / max(len(question_words), len(key_words))
-            
-            # If high similarity, use this response
-            if score > best_score and score > 0.5:  # 50% word overlap threshold
-                best_score = score
-                best_match = response_data
+        best_match, best_score = self.learned_store.find_similar(question, disaster_type)
         
         if best_match:
-            # Increment usage count
-            best_match['usage_count'] = best_match.get('usage_count', 0) + 1
-            self._save_learned_responses()
-            
             print(f"✓ Found similar learned response (similarity: {best_score:.2%})")
             return best_match['answer']
         
         return None
     
+    def find_warm_entry(self, question, disaster_type=None):
+        """
+        Entry pre-generated by the warm-up for a near variant of question
+        Only close matches count, and answers older than WARM_RESPONSE_MAX_AGE are ignored
+        Args:
+            disaster_type: Only use answers pre-generated for this disaster type
+        """
+        # Another worker may be the one running the warm-up
+        self.warm_store.reload_if_changed()
+        # Near duplicates only - word overlap confuses "during a flood" with "during a fire"
+        key, _ = self.warm_store.match(question, overlap=False, disaster_type=disaster_type)
+        if key is None:
+            return None
+        
+        entry = self.warm_store.responses[key]
+        return entry if self.is_warm_response_fresh(entry) else None
+    
+    def _find_warm_response(self, question, disaster_type=None):
+        """Pre-generated answer for question, or None"""
+        entry = self.find_warm_entry(question, disaster_type)
+        if entry is None:
+            return None
+        metrics.increment('warm_cache_hits')
+        return entry['answer']
+    
+    @staticmethod
+    def is_warm_response_fresh(entry):
+        """True if a pre-generated answer is younger than WARM_RESPONSE_MAX_AGE"""
+        try:
+            return datetime.now() - datetime.fromisoformat(entry['timestamp']) < WARM_RESPONSE_MAX_AGE
+        except (KeyError, ValueError):
+            return False
+    
+    @property
+    def can_pregenerate(self):
+        """True if Gemini or a trained model is available to pre-generate answers"""
+        return self.gemini_available or self.model_loaded
+    
+    def pregenerate_answer(self, question, disaster_type):
+        """
+        Generate an answer ahead of time and cache it in the warm store
+        The caller holds an expensive slot (see warmup.py)
+        Returns:
+            str: The answer, or None if neither Gemini nor a trained model is available
+        """
+        if not self.can_pregenerate:
+            return None
+        answer = self._generate_expensive_response(question, disaster_type, self.gemini_available,
+                                                   None, learn=False)
+        
+        # Replace a stale answer instead of merging into it as an alias
+        key, _ = self.warm_store.match(question, overlap=False)
+        if key is not None:
+            self.warm_store.delete(key)
+        self.warm_store.add(question, answer, disaster_type, learned_from='warmup')
+        return answer
+    
     def _save_learned_responses(self):
         """Save all learned responses to file"""
-        try:
-            with open(self.learned_responses_file, 'w', encoding='utf-8') as f:
-                json.dump(self.learned_responses, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving learned responses: {e}")
+        self.learned_store.save()
         
     def detect_disaster_type(self, message):
         """Detect the type of disaster from the message"""
@@ -252,10 +410,12 @@ class DisasterChatbot:
                 response += f"{i}. {do}\n"
             return response
     
-    def ask_gemini(self, user_message, disaster_type='general_disaster', save_for_learning=True):
+    def ask_gemini(self, user_message, disaster_type='general_disaster', save_for_learning=True, context=None):
         """
         Fallback to Google Gemini for questions outside our knowledge base
         Automatically saves responses to build knowledge base
+        Args:
+            context: Earlier conversation (ConversationContext.render()) for follow-ups
         """
         if not self.gemini_available:
             return None
@@ -264,21 +424,16 @@ class DisasterChatbot:
             # Create a disaster-focused prompt for Gemini
             disaster_name = disaster_type.replace('_', ' ').title()
             
-            prompt = f"""You are a disaster response expert assistant providing emergency guidance.
-
-Emergency Context: {disaster_name}
-Question: {user_message}
-
-Provide clear, actionable safety advice with:
-- Clear do's and don'ts
-- Prioritize life safety
-- Be concise but comprehensive (max 300 words)
-- Use bullet points or numbered lists
-- Include emergency contact reminders when relevant
-
-Response:"""
+            conversation = f"\nConversation so far:\n{context}\n" if context else ""
+            prompt = CHAT_PROMPT.render(disaster_name=disaster_name, conversation=conversation,
+                                        question=user_message)
+            if context:
+                metrics.observe_value('gemini_context_tokens', estimate_tokens(context))
             
-            response = self.gemini_model.generate_content(prompt)
+            # The instructions are the model's system instruction, sent as a
+            # stable prefix the backend can cache
+            response = call_llm(self.llm, CHAT_PROMPT, prompt, timeout=GEMINI_TIMEOUT_SECONDS,
+                                caller='chat_follow_up' if context else 'chat_answer')
             gemini_response = response.text
             
             # Save this response for future learning
@@ -287,10 +442,11 @@ Response:"""
             
             # Add attribution
             attributed_response = f"{gemini_response}\n\n"
-            attributed_response += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
-            attributed_response += "🤖 *Powered by Google Gemini 2.0 Flash*\n"
-            attributed_response += "💾 *This response has been saved for future learning*\n"
-            attributed_response += "⚠️ For emergencies, call 911 first!"
+            attributed_response += f"{FOOTER_SEPARATOR}\n"
+            attributed_response += f"🤖 *Powered by {self.llm.label}*\n"
+            if save_for_learning:
+                attributed_response += f"{SAVED_FOOTER}\n"
+            attributed_response += EMERGENCY_FOOTER
             
             return attributed_response
             
@@ -298,6 +454,60 @@ Response:"""
             print(f"Gemini fallback error: {e}")
             return None
     
+    def generate_with_model(self, user_message, assisted=None):
+        """
+        Generate an answer with the local seq2seq model
+        Args:
+            user_message: The user's question
+            assisted: Use the draft model for assisted decoding
+                (default: whenever a draft model is loaded)
+        """
+        if assisted is None:
+            assisted = self.draft_model is not None
+        
+        # Prepare input
+        input_text = f"Disaster emergency: {user_message}"
+        inputs = self.tokenizer(
+            input_text,
+            return_tensors="pt",
+            max_length=256,
+            truncation=True
+        ).to(self.device)
+        
+        # Generate
+        with torch.no_grad():
+            if assisted:
+                # The draft model proposes tokens, the main model verifies them
+                outputs = self.model.generate(
+                    **inputs,
+                    assistant_model=self.draft_model,
+                    **ASSISTED_GENERATION_KWARGS
+                )
+            else:
+                outputs = self.model.generate(**inputs, **MODEL_GENERATION_KWARGS)
+        
+        return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+    
+    def generate_with_model_batch(self, user_messages):
+        """
+        Generate answers for several questions in one padded model pass
+        (no assisted decoding - the draft model verifies one sequence at a time)
+        Returns:
+            list: One answer per message, in order
+        """
+        inputs = self.tokenizer(
+            [f"Disaster emergency: {message}" for message in user_messages],
+            return_tensors="pt",
+            max_length=256,
+            truncation=True,
+            padding=True
+        ).to(self.device)
+        
+        with torch.no_grad():
+            outputs = self.model.generate(**inputs, **MODEL_GENERATION_KWARGS)
+        
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    
     def should_use_gemini_fallback(self, user_message, disaster_type):
         """
         Determine if we should use Gemini fallback
@@ -333,15 +543,56 @@ Response:"""
         
         return False  # Default to knowledge base
     
-    def generate_response(self, user_message):
-        """Generate a response to user message with self-learning capability"""
+    def generate_response(self, user_message, shed_reason=None, priority='normal'):
+        """
+        Generate a response to user message with self-learning capability
+        Args:
+            user_message: The user's message
+            shed_reason: Set by admission control when this client is over
+                its rate limit - Gemini and the model are skipped
+            priority: Urgency class ('critical', 'high', 'normal') used to
+                queue for Gemini/model capacity
+        """
+        response, pending = self.prepare_response(user_message, shed_reason)
+        if pending is None:
+            profiler.set_path('shed' if self.degraded_reason else 'cheap')
+            return response
+        
+        # Shed to the knowledge base when no expensive slot frees up in
+        # time (urgent messages are served first)
+        if self.race_slo:
+            profiler.set_path('race')
+            # The slot is held until the slower source finishes in the background
+            if not expensive_calls.acquire(priority):
+                return self.shed_pending(pending)
+            return self._race_expensive_response(pending.message, pending.disaster_type, pending.use_gemini,
+                                                 pending.knowledge_response, pending.learn, pending.context)
+        return self.answer_pending(pending, priority)
+    
+    def prepare_response(self, user_message, shed_reason=None):
+        """
+        Run the cheap steps of the cascade: learned and pre-generated
+        answers, greetings, knowledge base intents and load shedding
+        Returns:
+            tuple: (response, None) when answered, or (None, PendingAnswer)
+                when the message needs Gemini or the local model
+        """
         user_message_lower = user_message.lower().strip()
         
+        # Detect disaster type - follow-ups like "what about my pets?" keep
+        # the disaster the conversation is about
+        disaster_type = self.detect_disaster_type(user_message)
+        contextual = disaster_type == 'general_disaster' and self.context.topic is not None
+        if contextual:
+            disaster_type = self.context.topic
+        # Saved answers to a follow-up must be about the conversation's disaster
+        scope = disaster_type if contextual else None
+        
         # STEP 1: Check if we've learned this response before
-        learned_response = self._find_similar_learned_response(user_message)
+        learned_response = self._find_similar_learned_response(user_message, scope)
         if learned_response:
             # We found a similar question we learned before!
-            return f"{learned_response}\n\n━━━━━━━━━━━━━━━━━━━━━━━━\n📚 *Response from learned knowledge base*\n⚠️ For emergencies, call 911 first!"
+            return f"{learned_response}\n\n{FOOTER_SEPARATOR}\n{LEARNED_FOOTER}\n{EMERGENCY_FOOTER}", None
         
         # Handle greetings and casual messages (more flexible detection)
         greetings = ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening', 'hi there', 'hello there']
@@ -360,46 +611,49 @@ Response:"""
                     name = parts[1].strip().rstrip('!').rstrip('.').strip()
                     name_match = f"Nice to meet you, {name}!\n\n"
             
-            return f"""👋 {name_match}I'm your LifeLink Disaster Response Assistant.
-
-I'm here to help you during emergencies. I can provide:
-
-🆘 Safety guidelines for various disasters
-✅ Do's and Don'ts for emergency situations
-📞 Emergency contact information
-💡 Immediate action steps
-
-You can ask me things like:
-• "What should I do during an earthquake?"
-• "Flood safety tips"
-• "Fire emergency help"
-• "Hurricane preparation"
-
-Type your question or click a quick action button above! 🚨"""
+            return GREETING_RESPONSE.format(name_match=name_match), None
         
         # Handle thank you messages
         thank_you = ['thank', 'thanks', 'appreciate', 'grateful']
         if any(word in user_message_lower for word in thank_you) and len(user_message.split()) < 5:
-            return """You're welcome! 😊 Stay safe and remember:
-
-🚨 **In life-threatening emergencies, always call 911 first!**
-
-I'm here if you need more safety information or have other questions about disaster preparedness.
-
-Take care! 🙏"""
-        
-        # Detect disaster type
-        disaster_type = self.detect_disaster_type(user_message)
-        
-        # STEP 2: Check if we should use Gemini fallback for complex questions
-        # Gemini will automatically save the response for learning
-        if self.gemini_available and self.should_use_gemini_fallback(user_message, disaster_type):
-            print(f"🤖 Using Gemini for new question: {user_message[:50]}...")
-            gemini_response = self.ask_gemini(user_message, disaster_type, save_for_learning=True)
-            if gemini_response:
-                return gemini_response
-        
-        # Check for specific intents (use knowledge base)
+            return THANK_YOU_RESPONSE, None
+        
+        # Questions the knowledge base answers directly
+        knowledge_response = self._knowledge_intent_response(user_message_lower, disaster_type)
+        use_gemini = self.gemini_available and self.should_use_gemini_fallback(user_message, disaster_type)
+        if knowledge_response and not use_gemini:
+            return knowledge_response, None
+        
+        # Pre-generated by the startup warm-up - cheap, so served even when shedding
+        warm_response = self._find_warm_response(user_message, scope)
+        if warm_response:
+            return warm_response, None
+        
+        # Everything below may call Gemini or the local model - shed load
+        # to the knowledge base when the client is over its rate
+        if shed_reason:
+            return self._degraded_response(shed_reason, disaster_type, knowledge_response), None
+        # Answers that lean on the conversation aren't saved as learned
+        # responses - they would be wrong for someone else's question
+        return None, PendingAnswer(user_message, disaster_type, use_gemini, knowledge_response,
+                                   learn=not contextual, context=self.context.render())
+    
+    def answer_pending(self, pending, priority='normal'):
+        """Answer a PendingAnswer with Gemini or the local model once an expensive slot is free"""
+        with expensive_calls.slot(priority) as granted:
+            if not granted:
+                return self.shed_pending(pending)
+            return self._generate_expensive_response(pending.message, pending.disaster_type, pending.use_gemini,
+                                                     pending.knowledge_response, learn=pending.learn,
+                                                     context=pending.context)
+    
+    def shed_pending(self, pending, reason='inflight'):
+        """Knowledge base answer for a PendingAnswer that got no Gemini/model capacity"""
+        profiler.set_path('shed')
+        return self._degraded_response(reason, pending.disaster_type, pending.knowledge_response)
+    
+    def _knowledge_intent_response(self, user_message_lower, disaster_type):
+        """Knowledge base answer for help/avoid/safety questions, or None"""
         if any(word in user_message_lower for word in ['help', 'what do', 'what should', 'need advice']):
             return self.get_knowledge_response(disaster_type, 'help')
         
@@ -409,51 +663,49 @@ Take care! 🙏"""
         elif any(word in user_message_lower for word in ['safety', 'tip', 'advice', 'guide']):
             return self.get_knowledge_response(disaster_type, 'general')
         
+        return None
+    
+    def _degraded_response(self, reason, disaster_type, knowledge_response=None):
+        """Knowledge base answer given instead of a Gemini/model call"""
+        self.degraded_reason = reason
+        metrics.increment('chat_shed', reason=reason)
+        response = knowledge_response or self.get_knowledge_response(disaster_type, 'help')
+        return response + DEGRADED_NOTICE
+    
+    def _generate_expensive_response(self, user_message, disaster_type, use_gemini, knowledge_response, learn=True, context=None):
+        """
+        Answer with Gemini or the local model (caller holds an in-flight slot)
+        Gemini answers are saved as learned responses unless learn is False;
+        context is the earlier conversation for Gemini prompts
+        """
+        # STEP 2: Use Gemini fallback for complex questions
+        # Gemini will automatically save the response for learning
+        if use_gemini:
+            profiler.set_path('gemini')
+            print(f"🤖 Using Gemini for new question: {user_message[:50]}...")
+            gemini_response = self.ask_gemini(user_message, disaster_type, save_for_learning=learn, context=context)
+            if gemini_response:
+                return gemini_response
+        
+        # Check for specific intents (use knowledge base)
+        if knowledge_response:
+            return knowledge_response
+        
         # Generate response using model
+        if TORCH_AVAILABLE and self.model_version_path:
+            self._maybe_reload_model()
+        
         if self.model_loaded:
+            profiler.set_path('model')
             try:
-                # Prepare input
-                input_text = f"Disaster emergency: {user_message}"
-                inputs = self.tokenizer(
-                    input_text,
-                    return_tensors="pt",
-                    max_length=256,
-                    truncation=True
-                ).to(self.device)
-                
-                # Generate
-                with torch.no_grad():
-                    outputs = self.model.generate(
-                        **inputs,
-                        max_length=256,
-                        num_beams=4,
-                        temperature=0.7,
-                        do_sample=True,
-                        top_p=0.9,
-                        no_repeat_ngram_size=3
-                    )
-                
-                response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-                
-                # If model response is too short or generic, try Gemini
-                if len(response) < 50 and self.gemini_available:
-                    print("Model response too short, trying Gemini fallback...")
-                    gemini_response = self.ask_gemini(user_message, disaster_type, save_for_learning=True)
-                    if gemini_response:
-                        return gemini_response
-                
-                # Enhance with knowledge base if response is generic
-                if len(response) < 50:
-                    knowledge_response = self.get_knowledge_response(disaster_type, 'help')
-                    return f"{response}\n\n{knowledge_response}"
-                
-                return response
+                response = self.generate_with_model(user_message)
+                return self.finish_model_response(response, user_message, disaster_type, learn, context)
             
             except Exception as e:
                 print(f"Error generating response: {e}")
                 # Try Gemini fallback with learning enabled
                 if self.gemini_available:
-                    gemini_response = self.ask_gemini(user_message, disaster_type, save_for_learning=True)
+                    gemini_response = self.ask_gemini(user_message, disaster_type, save_for_learning=learn, context=context)
                     if gemini_response:
                         return gemini_response
                 # Fall back to knowledge base
@@ -462,32 +714,87 @@ Take care! 🙏"""
         else:
             # Model not trained - try Gemini first for complex questions
             if self.gemini_available and len(user_message.split()) > 5:
-                gemini_response = self.ask_gemini(user_message, disaster_type, save_for_learning=True)
+                profiler.set_path('gemini')
+                gemini_response = self.ask_gemini(user_message, disaster_type, save_for_learning=learn, context=context)
                 if gemini_response:
                     return gemini_response
             
             # Use knowledge base if model not trained
             return self.get_knowledge_response(disaster_type, 'help')
     
-    def chat(self, user_message):
-        """Main chat interface"""
-        # Add to conversation history
-        self.conversation_history.append({
-            'role': 'user',
-            'content': user_message
-        })
-        
-        # Generate response
-        response = self.generate_response(user_message)
-        
-        # Add to conversation history
-        self.conversation_history.append({
-            'role': 'assistant',
-            'content': response
-        })
+    def finish_model_response(self, response, user_message, disaster_type, learn=True, context=None):
+        """Model answer, with Gemini or the knowledge base standing in when it is too short"""
+        # If model response is too short or generic, try Gemini
+        if len(response) < MIN_MODEL_ANSWER_LENGTH and self.gemini_available:
+            print("Model response too short, trying Gemini fallback...")
+            gemini_response = self.ask_gemini(user_message, disaster_type, save_for_learning=learn, context=context)
+            if gemini_response:
+                return gemini_response
+        
+        # Enhance with knowledge base if response is generic
+        if len(response) < MIN_MODEL_ANSWER_LENGTH:
+            knowledge_response = self.get_knowledge_response(disaster_type, 'help')
+            return f"{response}\n\n{knowledge_response}"
         
         return response
     
+    def _race_expensive_response(self, user_message, disaster_type, use_gemini, knowledge_response, learn, context):
+        """
+        Start Gemini and the local model together and answer with the
+        preferred one ready within race_slo seconds, else the knowledge base
+        The caller's expensive slot is released once both have finished
+        """
+        gemini = ('gemini', lambda: self.ask_gemini(user_message, disaster_type,
+                                                    save_for_learning=learn, context=context))
+        model = ('model', lambda: self._model_answer(user_message))
+        
+        if TORCH_AVAILABLE and self.model_version_path:
+            self._maybe_reload_model()
+        
+        # Same source preferences as the sequential path: a knowledge base
+        # intent answer (served by the fallback) outranks the model
+        candidates = []
+        if use_gemini:
+            candidates.append(gemini)
+        if self.model_loaded:
+            if not knowledge_response:
+                candidates.append(model)
+        elif self.gemini_available and not use_gemini and len(user_message.split()) > 5:
+            candidates.append(gemini)
+        
+        knowledge = ('knowledge', lambda: knowledge_response or self.get_knowledge_response(disaster_type, 'help'))
+        answer, source = race(candidates, knowledge, self.race_slo, on_complete=expensive_calls.release)
+        if candidates and source != candidates[0][0]:
+            print(f"⏱️ Answered from {source} within the {self.race_slo:g}s SLO")
+        return answer
+    
+    def _model_answer(self, user_message):
+        """Local model answer, or None if it is too short to be useful"""
+        response = self.generate_with_model(user_message)
+        return response if len(response) >= MIN_MODEL_ANSWER_LENGTH else None
+    
+    def chat(self, user_message, shed_reason=None, priority='normal'):
+        """
+        Main chat interface
+        After it returns, degraded_reason tells whether load was shed
+        """
+        self.degraded_reason = None
+        turn = 'follow_up' if self.context.total_turns else 'first'
+        start = time.perf_counter()
+        
+        # Generate response (the context holds only earlier turns meanwhile)
+        response = self.generate_response(user_message, shed_reason, priority)
+        metrics.observe('chat_turn_latency', time.perf_counter() - start, turn=turn)
+        
+        self.record_turn(user_message, response)
+        return response
+    
+    def record_turn(self, user_message, response):
+        """Add a question and its answer to the conversation history"""
+        topic = self.detect_disaster_type(user_message)
+        self.context.add('user', user_message, topic if topic != 'general_disaster' else None)
+        self.context.add('assistant', response)
+    
     def get_emergency_contacts(self):
         """Return emergency contact information"""
         return """
@@ -514,7 +821,7 @@ Remember: Your safety is the priority! 🙏
     
     def reset_conversation(self):
         """Reset conversation history"""
-        self.conversation_history = []
+        self.context.clear()
 
 if __name__ == "__main__":
     # Test the chatbot
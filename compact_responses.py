@@ -0,0 +1,175 @@
+"""
+Compact Responses
+A bandwidth-lean /chat encoding for clients on slow links (2G, SMS gateways).
+
+Clients opt in with the Accept header COMPACT_MEDIA_TYPE (or "format":
+"compact" in the request body). A compact answer is minified JSON with
+short keys:
+    ok  1 on success, 0 on error (with "e")
+    x   answer text without its footer
+    i   id of a static answer (knowledge base guidance, greeting, ...)
+    f   footer codes, one character each (see FOOTER_CODES)
+    m   label of the LLM for the "A" footer
+    d   degraded reason, only when degraded
+    p   priority initial, only when not normal
+
+Static answers are listed by GET /answers, a cacheable catalog keyed by
+content hash. A client that sends the catalog's version in the
+X-LifeLink-Catalog header gets just "i" for them; others get "x" as well.
+
+Every JSON response is also gzipped when the client accepts it.
+"""
+
+import gzip
+import hashlib
+import json
+import re
+from chatbot import (EMERGENCY_FOOTER, FOOTER_SEPARATOR, GREETING_RESPONSE, HIGH_DEMAND_FOOTER,
+                     LEARNED_FOOTER, SAVED_FOOTER, THANK_YOU_RESPONSE)
+from static_assets import MIN_COMPRESSION_SAVING, accepted_encodings
+
+COMPACT_MEDIA_TYPE = 'application/vnd.lifelink.compact+json'
+CATALOG_HEADER = 'X-LifeLink-Catalog'
+
+# Footer line -> code (the "A" footer carries the LLM label in "m")
+FOOTER_CODES = {
+    'E': EMERGENCY_FOOTER,
+    'K': LEARNED_FOOTER,
+    'S': SAVED_FOOTER,
+    'D': HIGH_DEMAND_FOOTER,
+}
+_CODE_FOR_LINE = {line: code for code, line in FOOTER_CODES.items()}
+_POWERED_BY = re.compile(r"^🤖 \*Powered by (.+)\*$")
+
+# Responses smaller than this aren't worth gzipping
+GZIP_MIN_BYTES = 200
+
+# Knowledge base intents answered with fixed text (see DisasterChatbot.get_knowledge_response)
+KNOWLEDGE_INTENTS = ('help', 'avoid', 'general')
+
+
+def answer_id(text):
+    """Content id of a static answer"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:10]
+
+
+def split_footer(text):
+    """
+    Separate an answer from its footer lines
+    Returns:
+        tuple: (answer text, footer codes, LLM label or None); lines
+            without a code stay in the answer text
+    """
+    body, separator, footer = text.rpartition(f"\n\n{FOOTER_SEPARATOR}\n")
+    if not separator:
+        return text.strip(), '', None
+
+    codes, label, kept = [], None, []
+    for line in footer.split('\n'):
+        powered = _POWERED_BY.match(line)
+        if powered:
+            codes.append('A')
+            label = powered.group(1)
+        elif line in _CODE_FOR_LINE:
+            codes.append(_CODE_FOR_LINE[line])
+        else:
+            kept.append(line)
+    if kept:
+        return text.strip(), '', None
+    return body.strip(), ''.join(codes), label
+
+
+def join_footer(body, codes, label=None):
+    """Inverse of split_footer: the answer as the verbose /chat response shows it"""
+    if not codes:
+        return body
+    lines = [f"🤖 *Powered by {label}*" if code == 'A' else FOOTER_CODES[code] for code in codes]
+    return f"{body}\n\n{FOOTER_SEPARATOR}\n" + '\n'.join(lines)
+
+
+class StaticAnswers:
+    def __init__(self, texts=()):
+        """Catalog of answers that never change, keyed by content id"""
+        self.answers = {}
+        for text in texts:
+            self.answers[answer_id(text.strip())] = text.strip()
+        self.version = answer_id(json.dumps(self.answers, sort_keys=True))
+
+    @classmethod
+    def build(cls, chatbot):
+        """Knowledge base guidance for every disaster type, plus the fixed replies"""
+        texts = [chatbot.get_knowledge_response(disaster_type, intent)
+                 for disaster_type in chatbot.knowledge for intent in KNOWLEDGE_INTENTS]
+        texts += [GREETING_RESPONSE.format(name_match=''), THANK_YOU_RESPONSE, chatbot.get_emergency_contacts()]
+        return cls(texts)
+
+    def id_for(self, text):
+        """Id of a static answer, or None"""
+        key = answer_id(text)
+        return key if key in self.answers else None
+
+    def catalog(self):
+        return {'v': self.version, 'a': self.answers}
+
+
+def wants_compact(request, data=None):
+    """True if the client negotiated compact responses"""
+    if isinstance(data, dict) and data.get('format') == 'compact':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', COMPACT_MEDIA_TYPE]) == COMPACT_MEDIA_TYPE
+
+
+def compact_result(result, static_answers, client_catalog=None):
+    """
+    Compact form of one /chat result
+    Args:
+        result: The verbose result dict ('success', 'response', ...)
+        static_answers: StaticAnswers catalog
+        client_catalog: Catalog version the client holds (X-LifeLink-Catalog)
+    """
+    if not result.get('success'):
+        return {'ok': 0, 'e': result.get('error')}
+
+    body, codes, label = split_footer(result['response'])
+    compact = {'ok': 1}
+    static_id = static_answers.id_for(body)
+    if static_id:
+        compact['i'] = static_id
+    if not static_id or client_catalog != static_answers.version:
+        compact['x'] = body
+    if codes:
+        compact['f'] = codes
+    if label:
+        compact['m'] = label
+    if result.get('degraded'):
+        compact['d'] = result['degraded_reason']
+    if result.get('priority', 'normal') != 'normal':
+        compact['p'] = result['priority'][0]
+    return compact
+
+
+def encode_compact(payload):
+    """Minified JSON (UTF-8, no spaces)"""
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def gzip_response(response, accept_encoding):
+    """
+    Gzip a JSON response in place if the client accepts it and it pays off
+    Returns:
+        The response
+    """
+    if (response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', COMPACT_MEDIA_TYPE)):
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in accepted_encodings(accept_encoding):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    compressed = gzip.compress(data, compresslevel=6, mtime=0)
+    if len(compressed) <= len(data) * (1 - MIN_COMPRESSION_SAVING):
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
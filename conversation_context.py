@@ -0,0 +1,132 @@
+"""
+Conversation Context
+A bounded, token-budgeted window of one session's conversation for Gemini
+prompts. Recent turns are kept (clipped), and older ones are folded into a
+short rolling summary, so follow-ups like "what about my pets?" are
+answered in context without the history growing with the session.
+
+Token counts are estimates (about four characters per token), which is
+close enough to keep prompts within budget without calling a tokenizer.
+"""
+
+import math
+import re
+import sys
+from collections import deque
+
+# Tokens of conversation included in a prompt (summary + recent turns)
+CONTEXT_TOKEN_BUDGET = 600
+
+# Part of the budget the rolling summary may use
+SUMMARY_TOKEN_BUDGET = 150
+
+# Each kept turn is clipped to this many tokens (answers run to 300 words)
+TURN_TOKEN_LIMIT = 120
+
+# Words of a user message kept in the summary
+SUMMARY_WORDS = 20
+
+# Attribution footers appended to answers - not worth sending back
+_FOOTER = re.compile(r'\n*━+.*\Z', re.DOTALL)
+
+
+def estimate_tokens(text):
+    """Approximate token count of text"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def clip_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, at a word boundary"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + ' …'
+
+
+class ConversationContext:
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, summary_budget=SUMMARY_TOKEN_BUDGET,
+                 turn_limit=TURN_TOKEN_LIMIT):
+        """
+        Args:
+            budget: Tokens of context included in a prompt
+            summary_budget: Tokens of that budget kept for the rolling summary
+            turn_limit: Tokens each recent turn is clipped to
+        """
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.turn_limit = turn_limit
+        self.turns = deque()   # {'role', 'content', 'tokens'}, oldest first
+        self.turn_tokens = 0
+        self.summary = deque()  # short lines about folded turns, oldest first
+        self.summary_tokens = 0
+        self.topic = None       # last specific disaster type discussed
+        self.total_turns = 0
+
+    def add(self, role, content, topic=None):
+        """
+        Add a turn, folding the oldest turns into the summary when over budget
+        Args:
+            role: 'user' or 'assistant'
+            content: Message text
+            topic: Disaster type the turn is about, if a specific one
+        """
+        if role == 'assistant':
+            content = _FOOTER.sub('', content)
+        content = clip_to_tokens(content.strip(), self.turn_limit)
+        tokens = estimate_tokens(content)
+        self.turns.append({'role': role, 'content': content, 'tokens': tokens})
+        self.turn_tokens += tokens
+        self.total_turns += 1
+        if topic:
+            self.topic = topic
+
+        while self.turns and self.turn_tokens > self.budget - self.summary_budget:
+            self._fold(self.turns.popleft())
+
+    def _fold(self, turn):
+        """Move a turn out of the window into the rolling summary"""
+        self.turn_tokens -= turn['tokens']
+        # The user's words carry the situation; answers can be asked for again
+        if turn['role'] != 'user':
+            return
+        words = turn['content'].split()
+        line = ' '.join(words[:SUMMARY_WORDS]) + (' …' if len(words) > SUMMARY_WORDS else '')
+        self.summary.append(line)
+        self.summary_tokens += estimate_tokens(line)
+        while self.summary_tokens > self.summary_budget:
+            self.summary_tokens -= estimate_tokens(self.summary.popleft())
+
+    def render(self):
+        """
+        Context block for a prompt
+        Returns:
+            str: Summary and recent turns within the token budget ('' if there are none)
+        """
+        parts = []
+        if self.summary:
+            parts.append("Earlier the user said: " + " | ".join(self.summary))
+        for turn in self.turns:
+            speaker = 'User' if turn['role'] == 'user' else 'Assistant'
+            parts.append(f"{speaker}: {turn['content']}")
+        return "\n".join(parts)
+
+    @property
+    def tokens(self):
+        """Estimated tokens render() produces"""
+        return self.turn_tokens + self.summary_tokens
+
+    def memory_bytes(self):
+        """Approximate memory held by the stored text"""
+        return (sum(sys.getsizeof(turn['content']) for turn in self.turns)
+                + sum(sys.getsizeof(line) for line in self.summary))
+
+    def __len__(self):
+        return len(self.turns)
+
+    def clear(self):
+        self.turns.clear()
+        self.turn_tokens = 0
+        self.summary.clear()
+        self.summary_tokens = 0
+        self.topic = None
+        self.total_turns = 0
@@ -0,0 +1,206 @@
+"""
+Location Canonicalization
+Maps free-form locations ("NYC", "new york", "New York, NY", "new york
+city") to one canonical place from a local gazetteer (gazetteer.json), so
+the weather cache and pollers see one key per place and WeatherAPI gets
+one unambiguous query.
+
+Names are matched exactly, through alias tables, then fuzzily for typos:
+one letter added, dropped, changed or swapped in a known name of at least
+MIN_FUZZY_LENGTH characters. Short names and inputs with extra words are
+never matched fuzzily - "Orland", "Dalles" and "Jacksonville Beach" are
+other towns, not typos of Orlando, Dallas and Jacksonville. Qualifiers after a comma
+or at the end ("Portland, ME", "springfield mo") pick between places with
+the same name. Unresolved names fall through to the upstream unchanged.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from metrics import metrics
+
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.json')
+
+# Shortest known name a typo may be matched to
+MIN_FUZZY_LENGTH = 8
+
+# Fuzzy candidates (most shared trigrams first) checked per lookup
+FUZZY_CANDIDATES = 5
+
+# Distinct inputs whose resolution is remembered
+RESOLVE_CACHE_SIZE = 4096
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    """Lowercase ASCII words: accents, punctuation and extra spaces removed"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    return _NON_ALNUM.sub(' ', text.replace('.', '').replace("'", '')).strip()
+
+
+def _one_edit_apart(a, b):
+    """True if b is a with one character added, dropped, changed, or two neighbours swapped"""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1 or a == b:
+        return False
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Place:
+    def __init__(self, id, name, region, region_name, country, lat, lon, aliases=()):
+        """A canonical place from the gazetteer"""
+        self.id = id
+        self.name = name
+        self.region = region
+        self.region_name = region_name
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+        self.aliases = list(aliases)
+        self.key = normalize(name)
+
+    @property
+    def query(self):
+        """Unambiguous WeatherAPI query (coordinates)"""
+        return f"{self.lat},{self.lon}"
+
+    def __repr__(self):
+        return f"Place({self.id!r})"
+
+
+class Gazetteer:
+    def __init__(self, places=(), countries=None):
+        """
+        Args:
+            places: Place objects, most preferred first among equal names
+            countries: Country code -> list of names and abbreviations
+        """
+        self.places = {}
+        self.names = {}        # normalized name or alias -> place ids
+        self.qualifiers = {}   # normalized region/country -> place ids it matches
+        self.trigrams = {}     # trigram -> names containing it
+        self.lock = threading.Lock()
+        self.results = Counter()
+        self.load_ms = 0.0
+
+        country_names = {code: [code] + list(names) for code, names in (countries or {}).items()}
+        for place in places:
+            self.places[place.id] = place
+            for name in [place.name] + place.aliases:
+                key = normalize(name)
+                ids = self.names.setdefault(key, [])
+                if place.id not in ids:
+                    ids.append(place.id)
+            for qualifier in [place.region, place.region_name] + country_names.get(place.country, [place.country]):
+                self.qualifiers.setdefault(normalize(qualifier), set()).add(place.id)
+        for key in self.names:
+            if len(key) >= MIN_FUZZY_LENGTH:
+                for trigram in _trigrams(key):
+                    self.trigrams.setdefault(trigram, []).append(key)
+        self._resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self._match)
+
+    @classmethod
+    def load(cls, path=GAZETTEER_FILE):
+        """Load the gazetteer file (an empty gazetteer if it can't be read)"""
+        start = time.perf_counter()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Gazetteer unavailable ({e}); locations go to WeatherAPI as typed")
+            return cls()
+        gazetteer = cls([Place(**entry) for entry in data.get('places', [])], data.get('countries'))
+        gazetteer.load_ms = (time.perf_counter() - start) * 1000
+        print(f"✓ Gazetteer loaded: {len(gazetteer.places)} places, {len(gazetteer.names)} names "
+              f"({gazetteer.load_ms:.1f} ms)")
+        return gazetteer
+
+    def resolve(self, location):
+        """
+        Canonical place for a free-form location
+        Returns:
+            Place, or None if the location isn't in the gazetteer
+        """
+        place, result = self._resolve(location.strip())
+        with self.lock:
+            self.results[result] += 1
+        metrics.increment('location_canonical', result=result)
+        return place
+
+    def hit_rate(self):
+        """Share of lookups resolved to a place"""
+        with self.lock:
+            total = sum(self.results.values())
+            return round(1 - self.results['miss'] / total, 4) if total else 0.0
+
+    def stats(self):
+        with self.lock:
+            results = dict(self.results)
+        return {'places': len(self.places), 'names': len(self.names), 'load_ms': round(self.load_ms, 2),
+                'lookups': results, 'hit_rate': self.hit_rate()}
+
+    def _match(self, location):
+        """(place or None, 'exact', 'alias', 'fuzzy' or 'miss') for a location"""
+        parts = [normalize(part) for part in location.split(',')]
+        parts = [part for part in parts if part]
+        if not parts:
+            return None, 'miss'
+        head, qualifiers = parts[0], parts[1:]
+
+        # Qualifiers may also trail without a comma: "portland me", "miami fl usa"
+        attempts = [(head, qualifiers)]
+        words = head.split()
+        peeled = True
+        while peeled:
+            peeled = False
+            for n in (3, 2, 1):
+                tail = ' '.join(words[-n:])
+                if len(words) > n and tail in self.qualifiers:
+                    words = words[:-n]
+                    qualifiers = [tail] + qualifiers
+                    attempts.append((' '.join(words), qualifiers))
+                    peeled = True
+                    break
+
+        for name, name_qualifiers in attempts:
+            place = self._pick(self.names.get(name, ()), name_qualifiers)
+            if place:
+                return place, 'exact' if name == place.key else 'alias'
+        for name, name_qualifiers in attempts:
+            place = self._pick(self._fuzzy(name), name_qualifiers)
+            if place:
+                return place, 'fuzzy'
+        return None, 'miss'
+
+    def _pick(self, place_ids, qualifiers):
+        """First place (most preferred) matching every qualifier"""
+        for place_id in place_ids:
+            if all(place_id in self.qualifiers.get(qualifier, ()) for qualifier in qualifiers):
+                return self.places[place_id]
+        return None
+
+    def _fuzzy(self, name):
+        """Place ids of the one known name a single typo away, if there is exactly one"""
+        if len(name) < MIN_FUZZY_LENGTH - 1:
+            return []
+        shared = Counter(key for trigram in _trigrams(name) for key in self.trigrams.get(trigram, ()))
+        matches = [key for key, _ in shared.most_common(FUZZY_CANDIDATES)
+                   if len(name.split()) <= len(key.split()) and _one_edit_apart(name, key)]
+        return self.names[matches[0]] if len(matches) == 1 else []
@@ -0,0 +1,128 @@
+"""
+Image Derivatives
+Resized, quality-tuned AVIF/WebP/progressive JPEG variants of the
+background images, so slow mobile connections get the smallest file
+their browser can display. Built by static_assets.py.
+"""
+
+import io
+import os
+from werkzeug.http import parse_accept_header
+
+# Optional: Pillow for building derivatives (originals are served without it)
+try:
+    from PIL import Image, features  # type: ignore
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    Image = None  # type: ignore
+    features = None  # type: ignore
+
+# Widths generated for each image (never wider than the original)
+WIDTHS = [400, 800, 1200]
+
+# Formats in order of preference, with encoder settings
+FORMATS = [
+    ('avif', 'image/avif', 'AVIF', {'quality': 50}),
+    ('webp', 'image/webp', 'WEBP', {'quality': 75, 'method': 6}),
+    ('jpg', 'image/jpeg', 'JPEG', {'quality': 78, 'progressive': True, 'optimize': True}),
+]
+MIME_TYPES = {ext: mime for ext, mime, _, _ in FORMATS}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DERIVED_PREFIX = 'images/derived'
+
+
+def supported_formats():
+    """Formats this Pillow build can encode"""
+    if not PIL_AVAILABLE:
+        return []
+    return [fmt for fmt in FORMATS if fmt[0] != 'avif' or features.check('avif')]
+
+
+def is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def build_derivatives(name, source):
+    """
+    Encode every width/format variant of one image
+    Args:
+        name: Logical asset name, e.g. 'images/Rainy.jpg'
+        source: Path of the original image
+    Returns:
+        tuple: (image info dict, {derived asset name: encoded bytes})
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    files = {}
+    variants = []
+    with Image.open(source) as original:
+        original = original.convert('RGB')
+        width, height = original.size
+        widths = sorted({min(w, width) for w in WIDTHS})
+        for target_width in widths:
+            target_height = round(height * target_width / width)
+            resized = original if target_width == width else original.resize(
+                (target_width, target_height), Image.LANCZOS
+            )
+            for ext, mime, pil_format, options in supported_formats():
+                buf = io.BytesIO()
+                resized.save(buf, pil_format, **options)
+                derived_name = f"{DERIVED_PREFIX}/{stem}-{target_width}w.{ext}"
+                files[derived_name] = buf.getvalue()
+                variants.append({
+                    'name': derived_name,
+                    'format': ext,
+                    'mime': mime,
+                    'width': target_width,
+                    'height': target_height,
+                    'bytes': len(files[derived_name])
+                })
+
+    info = {
+        'width': width,
+        'height': height,
+        'bytes': os.path.getsize(source),
+        'variants': variants
+    }
+    return info, files
+
+
+def choose_variant(info, width=None, accept=''):
+    """
+    Pick the smallest suitable variant for a request
+    Args:
+        info: Image entry from the asset manifest
+        width: Display width in pixels (None for full size)
+        accept: The request's Accept header
+    Returns:
+        dict: The chosen variant, or None if there are no variants
+    """
+    # Formats the browser names explicitly (q=0 refuses one); JPEG always works
+    accepted = {mime.lower() for mime, quality in parse_accept_header(accept) if quality > 0}
+    acceptable = [
+        v for v in info['variants']
+        if v['mime'] == 'image/jpeg' or v['mime'] in accepted
+    ]
+    if not acceptable:
+        return None
+
+    # Narrowest width that still covers the requested width
+    widths = sorted({v['width'] for v in acceptable})
+    target = width or widths[-1]
+    chosen_width = next((w for w in widths if w >= target), widths[-1])
+    candidates = [v for v in acceptable if v['width'] == chosen_width]
+    return min(candidates, key=lambda v: v['bytes'])
+
+
+def report(images):
+    """Print bytes saved per image by the best variant at each width"""
+    for name, info in images.items():
+        print(f"   • {name}: {info['width']}x{info['height']}, {info['bytes']/1024:.1f} KB original")
+        by_width = {}
+        for variant in info['variants']:
+            by_width.setdefault(variant['width'], []).append(variant)
+        for width, variants in sorted(by_width.items()):
+            sizes = ', '.join(f"{v['format']} {v['bytes']/1024:.1f} KB" for v in variants)
+            best = min(v['bytes'] for v in variants)
+            print(f"       {width:>5}w: {sizes} (saves {1 - best/info['bytes']:.0%})")
@@ -0,0 +1,461 @@
+"""
+Learned Responses Store
+Answers learned from Gemini, shared by every chatbot session in the process.
+Near-duplicate questions are collapsed into one canonical entry with aliases.
+"""
+
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from near_duplicates import LSHIndex, MinHasher, jaccard, tokenize
+from usage_stats import UsageStats, file_signature
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Content-word Jaccard similarity at which two questions count as the same
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Word overlap needed for the looser "similar question" match
+OVERLAP_THRESHOLD = 0.5
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def normalize_question(question):
+    """Key used for a question in the store"""
+    return question.lower().strip()
+
+
+@contextmanager
+def store_write_lock(path):
+    """
+    Exclusive lock on a store file while it is read, changed and rewritten
+    Shared by servers and manage_learned_responses.py, so neither writes back
+    entries the other has just removed (no-op without fcntl)
+    """
+    if not FCNTL_AVAILABLE:
+        yield
+        return
+    with open(path + '.write.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+class LearnedResponseStore:
+    def __init__(self, path="learned_responses.json"):
+        """
+        Load a learned responses file and index its questions
+        Args:
+            path: JSON file mapping question keys to learned entries
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.hasher = MinHasher()
+        self.signature = file_signature(path)
+        self.responses = self._load()
+        self._build_index()
+        self.stats = UsageStats.from_entries(self.responses.items())
+
+    @classmethod
+    def shared(cls, path="learned_responses.json"):
+        """Return the process-wide store for a file, loading it once"""
+        store_key = os.path.abspath(path)
+        with _STORES_LOCK:
+            if store_key not in _STORES:
+                _STORES[store_key] = cls(path)
+            return _STORES[store_key]
+
+    def _load(self):
+        """Load previously learned responses from file"""
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            print(f"Note: Could not load learned responses: {e}")
+            return {}
+
+    def save(self):
+        """Save all learned responses to file"""
+        try:
+            with self.lock:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.responses, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self.signature = file_signature(self.path)
+                self.stats.save(self.path)
+        except Exception as e:
+            print(f"Error saving learned responses: {e}")
+
+    def reload_if_changed(self):
+        """
+        Reload the file if another process has rewritten it since we last
+        loaded or saved it
+        Returns:
+            bool: True if the store was reloaded
+        """
+        signature = file_signature(self.path)
+        with self.lock:
+            if signature == self.signature:
+                return False
+            self.signature = signature
+            # Updated in place - chatbots hold a reference to this dict
+            self.responses.clear()
+            self.responses.update(self._load())
+            self._build_index()
+            self.stats = UsageStats.from_entries(self.responses.items())
+            return True
+
+    @contextmanager
+    def _updating(self):
+        """Hold the store and its file, starting from what is on disk, while changing them"""
+        with self.lock, store_write_lock(self.path):
+            self.reload_if_changed()
+            yield
+
+    # ------------------------------------------------------------------
+    # Index of question variants (canonical questions and their aliases)
+    # ------------------------------------------------------------------
+
+    def _build_index(self):
+        self.index = LSHIndex(num_perm=self.hasher.num_perm)
+        self.variants = {}       # variant key -> canonical key
+        self.variant_tokens = {}  # variant key -> content tokens
+        self.variant_words = {}   # variant key -> word set for overlap matching
+        for key, entry in self.responses.items():
+            self._index_entry(key, entry)
+
+    def _index_entry(self, key, entry):
+        self._index_variant(key, key)
+        for alias in entry.get('aliases', []):
+            self._index_variant(normalize_question(alias), key)
+
+    def _index_variant(self, variant, canonical, tokens=None):
+        tokens = tokens if tokens is not None else tokenize(variant)
+        self.variants[variant] = canonical
+        self.variant_tokens[variant] = tokens
+        self.variant_words[variant] = set(variant.split())
+        self.index.add(variant, self.hasher.signature(tokens))
+
+    def _unindex_entry(self, key, entry):
+        for variant in [key] + [normalize_question(a) for a in entry.get('aliases', [])]:
+            if self.variants.get(variant) == key:
+                del self.variants[variant]
+                del self.variant_tokens[variant]
+                del self.variant_words[variant]
+                self.index.remove(variant)
+
+    def _find_near_duplicate(self, tokens, disaster_type=None):
+        """
+        Best canonical key whose question is a near duplicate of tokens
+        Returns:
+            tuple: (canonical key or None, similarity)
+        """
+        best_key, best_score = None, 0.0
+        for variant in self.index.query(self.hasher.signature(tokens)):
+            score = jaccard(tokens, self.variant_tokens[variant])
+            if score < NEAR_DUPLICATE_THRESHOLD or score <= best_score:
+                continue
+            canonical = self.variants[variant]
+            if disaster_type and self.responses[canonical].get('disaster_type') != disaster_type:
+                continue
+            best_key, best_score = canonical, score
+        return best_key, best_score
+
+    def _find_overlap(self, question, disaster_type=None):
+        """Looser match: simple word overlap with any known question variant"""
+        question_words = set(question.lower().split())
+        if not question_words:
+            return None, 0.0
+
+        best_key, best_score = None, 0.0
+        for variant, key_words in self.variant_words.items():
+            overlap = len(question_words & key_words)
+            score = overlap / max(len(question_words), len(key_words))
+            if score > best_score and score > OVERLAP_THRESHOLD:
+                canonical = self.variants[variant]
+                if disaster_type and self.responses[canonical].get('disaster_type') != disaster_type:
+                    continue
+                best_key, best_score = canonical, score
+        return best_key, best_score
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def match(self, question, overlap=True, disaster_type=None):
+        """
+        Find the learned entry for a question without recording a use
+        Tries an exact/alias hit, then a MinHash near duplicate, then word overlap
+        Args:
+            question: Question to look up
+            overlap: Fall back to the looser word overlap match
+            disaster_type: Only match entries learned for this disaster type
+        Returns:
+            tuple: (canonical key or None, similarity)
+        """
+        with self.lock:
+            key = normalize_question(question)
+            canonical = self.variants.get(key)
+            if canonical is not None and (not disaster_type or
+                                          self.responses[canonical].get('disaster_type') == disaster_type):
+                return canonical, 1.0
+
+            canonical, score = self._find_near_duplicate(tokenize(question), disaster_type)
+            if canonical is not None or not overlap:
+                return canonical, score
+            return self._find_overlap(question, disaster_type)
+
+    def find_similar(self, question, disaster_type=None):
+        """
+        Find the learned entry for a question and count the reuse
+        Args:
+            question: Question to look up
+            disaster_type: Only match entries learned for this disaster type
+        Returns:
+            tuple: (entry dict or None, similarity)
+        """
+        self.reload_if_changed()
+        with self.lock:
+            key, score = self.match(question, disaster_type=disaster_type)
+            if key is None:
+                return None, 0.0
+
+            with self._updating():
+                entry = self.responses.get(key)
+                if entry is None:  # deleted by another process meanwhile
+                    return None, 0.0
+                entry['usage_count'] = entry.get('usage_count', 0) + 1
+                self.stats.record_use(key, entry)
+                self.save()
+                return entry, score
+
+    def add(self, question, answer, disaster_type='general', learned_from='gemini'):
+        """
+        Save a learned response, merging it into an existing near-duplicate entry
+        Returns:
+            tuple: (canonical key, merged) - merged is True if no new entry was created
+        """
+        with self._updating():
+            key = normalize_question(question)
+            tokens = tokenize(question)
+
+            canonical = self.variants.get(key)
+            if canonical is None:
+                canonical, _ = self._find_near_duplicate(tokens, disaster_type)
+
+            if canonical is not None:
+                entry = self.responses[canonical]
+                if key not in self.variants:
+                    entry.setdefault('aliases', []).append(question)
+                    self._index_variant(key, canonical, tokens)
+                self.save()
+                return canonical, True
+
+            entry = {
+                'question': question,
+                'answer': answer,
+                'disaster_type': disaster_type,
+                'learned_from': learned_from,
+                'timestamp': datetime.now().isoformat(),
+                'usage_count': 1
+            }
+            self.responses[key] = entry
+            self._index_variant(key, key, tokens)
+            self.stats.add(key, entry)
+            self.save()
+            return key, False
+
+    def delete(self, key):
+        """Delete an entry (and its aliases). Returns True if it existed."""
+        with self._updating():
+            entry = self.responses.pop(key, None)
+            if entry is None:
+                return False
+            self._unindex_entry(key, entry)
+            if self.stats.remove(key, entry):
+                self.stats.rebuild_top(self.responses.items())
+            self.save()
+            return True
+
+    def dedupe(self):
+        """
+        Collapse near-duplicate entries already in the store
+        The oldest entry of each group stays canonical; the others become
+        its aliases and their usage counts are added to it.
+        Returns:
+            dict: entries before/after and how many were merged
+        """
+        with self._updating():
+            before = len(self.responses)
+            ordered = sorted(self.responses.items(), key=lambda item: item[1].get('timestamp', ''))
+
+            self.responses.clear()
+            self._build_index()
+            for key, entry in ordered:
+                tokens = tokenize(entry.get('question', key))
+                canonical, _ = self._find_near_duplicate(tokens, entry.get('disaster_type'))
+                if canonical is None:
+                    self.responses[key] = entry
+                    self._index_entry(key, entry)
+                    continue
+
+                target = self.responses[canonical]
+                target['usage_count'] = target.get('usage_count', 0) + entry.get('usage_count', 0)
+                for variant in [entry.get('question', key)] + entry.get('aliases', []):
+                    variant_key = normalize_question(variant)
+                    if variant_key not in self.variants:
+                        target.setdefault('aliases', []).append(variant)
+                        self._index_variant(variant_key, canonical)
+
+            self.stats = UsageStats.from_entries(self.responses.items())
+            self.save()
+            after = len(self.responses)
+            return {'before': before, 'after': after, 'merged': before - after}
+
+    def usage_stats(self, top=10):
+        """Running usage statistics (per-type counts, total reuse, top answers)"""
+        with self.lock:
+            return self.stats.snapshot(top)
+
+    def __len__(self):
+        return len(self.responses)
+
+
+# ----------------------------------------------------------------------
+# Streaming access to store files, for tools that must work in bounded
+# memory regardless of how large the store grows
+# ----------------------------------------------------------------------
+
+_WHITESPACE = re.compile(r'\s*')
+
+
+def make_filter(disaster_type=None, min_usage=None, max_usage=None, since=None, until=None):
+    """
+    Build an entry predicate from optional filters (None if no filter is set)
+    Args:
+        disaster_type: Exact disaster type
+        min_usage / max_usage: Inclusive usage_count bounds
+        since / until: ISO dates; since is inclusive, until is exclusive
+    """
+    since = datetime.fromisoformat(since).isoformat() if since else None
+    until = datetime.fromisoformat(until).isoformat() if until else None
+    if not any(value is not None for value in (disaster_type, min_usage, max_usage, since, until)):
+        return None
+
+    def predicate(entry):
+        if disaster_type is not None and entry.get('disaster_type') != disaster_type:
+            return False
+        usage = entry.get('usage_count', 0)
+        if min_usage is not None and usage < min_usage:
+            return False
+        if max_usage is not None and usage > max_usage:
+            return False
+        # Timestamps are ISO strings written by datetime.isoformat(), so they sort as text
+        timestamp = entry.get('timestamp', '')
+        if since is not None and timestamp < since:
+            return False
+        if until is not None and timestamp >= until:
+            return False
+        return True
+
+    return predicate
+
+
+def iter_learned_responses(path, predicate=None, chunk_size=1 << 20):
+    """
+    Stream (key, entry) pairs from a learned responses file
+    Only about chunk_size characters plus one entry are held in memory;
+    entries rejected by predicate are dropped inside the scan.
+    """
+    if not os.path.exists(path):
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        pos = 0
+        eof = not buf
+
+        def decode_next():
+            # Decode the next JSON value, reading more input if it is cut off
+            nonlocal buf, pos, eof
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    if end < len(buf) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+
+        def expect(chars):
+            # Consume one structural character, returning which one it was
+            nonlocal buf, pos, eof
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos < len(buf):
+                    char = buf[pos]
+                    if char not in chars:
+                        raise ValueError(f"Malformed learned responses file near offset {pos}: {char!r}")
+                    pos += 1
+                    return char
+                if eof:
+                    raise ValueError("Unexpected end of learned responses file")
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+
+        if eof:
+            return
+        expect('{')
+        pos = _WHITESPACE.match(buf, pos).end()
+        if buf[pos:pos + 1] == '}':
+            return
+
+        while True:
+            key = decode_next()
+            expect(':')
+            entry = decode_next()
+            if predicate is None or predicate(entry):
+                yield key, entry
+            if expect(',}') == '}':
+                return
+
+
+def write_learned_responses(path, items):
+    """
+    Atomically write (key, entry) pairs as a learned responses file
+    Streams entries one at a time; the output matches json.dump(indent=2)
+    Returns:
+        int: Number of entries written
+    """
+    tmp_path = path + '.tmp'
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for key, entry in items:
+            value = json.dumps(entry, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+            f.write(',\n  ' if count else '\n  ')
+            f.write(f"{json.dumps(key, ensure_ascii=False)}: {value}")
+            count += 1
+        f.write('\n}' if count else '}')
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,265 @@
+"""
+LLM Backends
+Text generation behind one interface, so the chatbot and weather service
+can run on Gemini, the local FLAN-T5 model, or the deterministic stub
+server (llm_stub_server.py) for offline tests and benchmarks.
+
+Select with LIFELINK_LLM_BACKEND=gemini|t5|stub (default gemini);
+LIFELINK_LLM_STUB_URL points at the stub server and LIFELINK_T5_MODEL
+at the model used by the t5 backend.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import requests
+
+# Optional backends
+try:
+    import google.generativeai as genai
+    GENAI_AVAILABLE = True
+except ImportError:
+    GENAI_AVAILABLE = False
+
+try:
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, TextIteratorStreamer
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+GEMINI_MODEL = 'gemini-2.0-flash-exp'
+DEFAULT_STUB_URL = 'http://127.0.0.1:8089'
+DEFAULT_T5_MODEL = 'google/flan-t5-base'
+
+# USD per million tokens (Gemini Flash list prices; override for other models)
+GEMINI_PROMPT_PRICE = float(os.environ.get('LIFELINK_PROMPT_PRICE', 0.10))
+GEMINI_RESPONSE_PRICE = float(os.environ.get('LIFELINK_RESPONSE_PRICE', 0.40))
+# Cached prompt tokens are billed at a quarter of the prompt price
+GEMINI_CACHED_PRICE = float(os.environ.get('LIFELINK_CACHED_PRICE', GEMINI_PROMPT_PRICE / 4))
+
+# FLAN-T5 input limit. Longer prompts lose their start, not the question
+# and "Response:" cue at the end
+T5_MAX_INPUT_TOKENS = 512
+
+# Decoding settings for instruction prompts on FLAN-T5
+T5_GENERATION_KWARGS = {
+    'max_new_tokens': 256,
+    'num_beams': 1,
+    'do_sample': False,
+    'no_repeat_ngram_size': 3
+}
+
+# Loaded seq2seq models are shared by every chatbot instance and backend;
+# pinned ones (draft models, the t5 backend's model) are never evicted
+_MODEL_CACHE = {}
+_PINNED_MODELS = set()
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+def load_shared_model(path, device, pin=False):
+    """Load a tokenizer/model pair once per process and reuse it"""
+    with _MODEL_CACHE_LOCK:
+        if path not in _MODEL_CACHE:
+            tokenizer = AutoTokenizer.from_pretrained(path)
+            model = AutoModelForSeq2SeqLM.from_pretrained(path)
+            model.to(device)
+            model.eval()
+            _MODEL_CACHE[path] = (tokenizer, model)
+        if pin:
+            _PINNED_MODELS.add(path)
+        return _MODEL_CACHE[path]
+
+
+def evict_shared_models(keep):
+    """Drop every cached model except keep and the pinned ones (e.g. after a version switch)"""
+    with _MODEL_CACHE_LOCK:
+        for path in list(_MODEL_CACHE):
+            if path != keep and path not in _PINNED_MODELS:
+                del _MODEL_CACHE[path]
+
+
+class LLMBackendError(Exception):
+    """A backend call failed (HTTP error, rate limited, bad response)"""
+
+
+class LLMResponse:
+    def __init__(self, text, prompt_tokens=None, response_tokens=None, cached_tokens=0):
+        """
+        Args:
+            text: Generated text
+            prompt_tokens: Tokens billed for the prompt (None if the backend doesn't say)
+            response_tokens: Tokens generated (None if the backend doesn't say)
+            cached_tokens: Prompt tokens served from the backend's cache
+        """
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.response_tokens = response_tokens
+        self.cached_tokens = cached_tokens
+
+
+class LLMBackend:
+    """
+    Text generation interface
+    Subclasses implement generate(); agenerate() and stream() fall back to it
+    """
+    name = 'base'
+    label = 'LLM'  # shown in answer attributions
+    prompt_price = 0.0    # USD per million tokens
+    response_price = 0.0
+    cached_price = 0.0
+
+    def generate(self, prompt, system=None, timeout=None):
+        """
+        Generate a completion
+        Args:
+            prompt: The per-call prompt
+            system: Static instructions (a system instruction where supported)
+            timeout: Seconds before giving up
+        Returns:
+            LLMResponse
+        """
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, system=None, timeout=None):
+        """generate() for asyncio callers"""
+        return await asyncio.to_thread(self.generate, prompt, system, timeout)
+
+    def stream(self, prompt, system=None, timeout=None):
+        """Yield the completion in chunks as they are generated"""
+        yield self.generate(prompt, system, timeout).text
+
+    def cost(self, prompt_tokens, response_tokens, cached_tokens=0):
+        """Estimated USD cost of one call"""
+        return ((prompt_tokens - cached_tokens) * self.prompt_price
+                + cached_tokens * self.cached_price
+                + response_tokens * self.response_price) / 1e6
+
+
+class GeminiBackend(LLMBackend):
+    name = 'gemini'
+    label = 'Google Gemini 2.0 Flash'
+    prompt_price = GEMINI_PROMPT_PRICE
+    response_price = GEMINI_RESPONSE_PRICE
+    cached_price = GEMINI_CACHED_PRICE
+
+    def __init__(self, api_key, model_name=GEMINI_MODEL):
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.models = {}  # system instruction -> GenerativeModel, created once
+        self.lock = threading.Lock()
+
+    def _model(self, system):
+        with self.lock:
+            if system not in self.models:
+                self.models[system] = genai.GenerativeModel(self.model_name, system_instruction=system)
+            return self.models[system]
+
+    @staticmethod
+    def _response(response):
+        meta = getattr(response, 'usage_metadata', None)
+        if meta is None or not getattr(meta, 'prompt_token_count', None):
+            return LLMResponse(response.text)
+        return LLMResponse(response.text, meta.prompt_token_count,
+                           getattr(meta, 'candidates_token_count', 0) or 0,
+                           getattr(meta, 'cached_content_token_count', 0) or 0)
+
+    def generate(self, prompt, system=None, timeout=None):
+        request_options = {'timeout': timeout} if timeout else None
+        return self._response(self._model(system).generate_content(prompt, request_options=request_options))
+
+    async def agenerate(self, prompt, system=None, timeout=None):
+        request_options = {'timeout': timeout} if timeout else None
+        response = await self._model(system).generate_content_async(prompt, request_options=request_options)
+        return self._response(response)
+
+    def stream(self, prompt, system=None, timeout=None):
+        request_options = {'timeout': timeout} if timeout else None
+        for chunk in self._model(system).generate_content(prompt, stream=True, request_options=request_options):
+            yield chunk.text
+
+
+class T5Backend(LLMBackend):
+    name = 't5'
+    label = 'FLAN-T5 (local)'
+
+    def __init__(self, model_path=DEFAULT_T5_MODEL, device=None):
+        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer, self.model = load_shared_model(model_path, self.device, pin=True)
+
+    def _inputs(self, prompt, system):
+        text = f"{system}\n\n{prompt}" if system else prompt
+        inputs = self.tokenizer(text, return_tensors="pt")
+        return {key: value[:, -T5_MAX_INPUT_TOKENS:].to(self.device) for key, value in inputs.items()}
+
+    def generate(self, prompt, system=None, timeout=None):
+        inputs = self._inputs(prompt, system)
+        with torch.no_grad():
+            outputs = self.model.generate(**inputs, **T5_GENERATION_KWARGS)
+        return LLMResponse(self.tokenizer.decode(outputs[0], skip_special_tokens=True),
+                           inputs['input_ids'].shape[1], outputs.shape[1])
+
+    def stream(self, prompt, system=None, timeout=None):
+        inputs = self._inputs(prompt, system)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+
+        def run():
+            with torch.no_grad():
+                self.model.generate(**inputs, streamer=streamer, **T5_GENERATION_KWARGS)
+
+        threading.Thread(target=run, daemon=True).start()
+        yield from streamer
+
+
+class StubBackend(LLMBackend):
+    name = 'stub'
+    label = 'LifeLink stub LLM'
+
+    def __init__(self, url=DEFAULT_STUB_URL):
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+
+    def _post(self, prompt, system, timeout, stream=False):
+        try:
+            response = self.session.post(f"{self.url}/generate", timeout=timeout, stream=stream,
+                                         json={'prompt': prompt, 'system': system, 'stream': stream})
+        except requests.exceptions.RequestException as e:
+            raise LLMBackendError(f"stub server unreachable: {e}") from e
+        if response.status_code != 200:
+            raise LLMBackendError(f"stub server returned {response.status_code}: {response.text[:200]}")
+        return response
+
+    def generate(self, prompt, system=None, timeout=None):
+        data = self._post(prompt, system, timeout).json()
+        usage = data.get('usage', {})
+        return LLMResponse(data['text'], usage.get('prompt_tokens'), usage.get('response_tokens'))
+
+    def stream(self, prompt, system=None, timeout=None):
+        with self._post(prompt, system, timeout, stream=True) as response:
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)['text']
+
+
+def create_backend(name=None, api_key=None):
+    """
+    Backend selected by configuration
+    Args:
+        name: 'gemini', 't5' or 'stub' (default: LIFELINK_LLM_BACKEND, else gemini)
+        api_key: Gemini API key
+    Returns:
+        LLMBackend, or None if the selected backend can't be used here
+    """
+    name = (name or os.environ.get('LIFELINK_LLM_BACKEND') or 'gemini').lower()
+    if name == 'gemini':
+        if not (GENAI_AVAILABLE and api_key):
+            return None
+        return GeminiBackend(api_key)
+    if name == 't5':
+        if not TORCH_AVAILABLE:
+            return None
+        return T5Backend(os.environ.get('LIFELINK_T5_MODEL', DEFAULT_T5_MODEL))
+    if name == 'stub':
+        return StubBackend(os.environ.get('LIFELINK_LLM_STUB_URL', DEFAULT_STUB_URL))
+    raise ValueError(f"Unknown LLM backend '{name}' (expected gemini, t5 or stub)")
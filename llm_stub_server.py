@@ -0,0 +1,216 @@
+"""
+LLM Stub Server
+Local HTTP stand-in for Gemini, so the Gemini path can be tested and
+benchmarked offline. Answers are deterministic (the same prompt always
+gets the same answer); latency, throughput and failures are configurable.
+
+API:
+    POST /generate  {"prompt": str, "system": str, "stream": bool}
+        -> {"text": str, "usage": {"prompt_tokens": int, "response_tokens": int}}
+        -> with stream, one {"text": chunk} JSON object per line
+        429 when over the throughput cap, 500 for injected failures
+    GET /health
+
+Usage:
+    python llm_stub_server.py [--port 8089] [--latency lognormal --latency-ms 800]
+                              [--rate 5 --burst 10] [--failure-rate 0.05]
+
+Run the app against it with LIFELINK_LLM_BACKEND=stub.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from admission import TokenBucket
+from conversation_context import estimate_tokens
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal')
+
+# Sentences the deterministic answers are assembled from
+ANSWER_SENTENCES = [
+    "Follow instructions from local emergency officials.",
+    "Move to higher ground if water is rising.",
+    "Keep an emergency kit with water, food, medicine and a flashlight.",
+    "Stay away from downed power lines.",
+    "Check on neighbors who may need help.",
+    "Keep your phone charged and listen for alerts.",
+    "Do not drive through flooded roads.",
+    "Have a family meeting point and an evacuation route.",
+    "Call 911 if anyone is in immediate danger.",
+    "Shelter in an interior room away from windows.",
+]
+
+
+def stub_answer(prompt, system=None, sentences=3):
+    """Deterministic answer for a prompt"""
+    digest = hashlib.sha256(f"{system or ''}\n{prompt}".encode('utf-8')).digest()
+    picks = [ANSWER_SENTENCES[b % len(ANSWER_SENTENCES)] for b in digest[:sentences]]
+    return f"[stub {digest[:4].hex()}] " + " ".join(picks)
+
+
+class StubConfig:
+    def __init__(self, latency='fixed', latency_ms=0.0, jitter_ms=0.0, rate=None, burst=None,
+                 failure_rate=0.0, stream_chunks=4, seed=None):
+        """
+        Args:
+            latency: Latency distribution ('fixed', 'uniform', 'normal' or 'lognormal')
+            latency_ms: Mean latency (the median for lognormal)
+            jitter_ms: Spread (uniform half-width, normal standard deviation,
+                lognormal sigma as a fraction of the median)
+            rate: Requests per second allowed (None: unlimited)
+            burst: Requests allowed at once above the rate (default: rate)
+            failure_rate: Share of requests answered with a 500
+            stream_chunks: Chunks a streamed answer is split into
+            seed: Random seed for reproducible latencies and failures
+        """
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency}'")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.stream_chunks = max(1, stream_chunks)
+        self.bucket = TokenBucket(rate, burst or max(1, rate)) if rate else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample_latency(self):
+        """Seconds to wait before answering"""
+        with self.lock:
+            if self.latency == 'uniform':
+                ms = self.random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+            elif self.latency == 'normal':
+                ms = self.random.gauss(self.latency_ms, self.jitter_ms)
+            elif self.latency == 'lognormal':
+                ms = self.latency_ms * self.random.lognormvariate(0, self.jitter_ms / self.latency_ms
+                                                                  if self.latency_ms else 0)
+            else:
+                ms = self.latency_ms
+        return max(0.0, ms) / 1000
+
+    def admit(self):
+        """False if the request is over the throughput cap"""
+        if self.bucket is None:
+            return True
+        with self.lock:
+            return self.bucket.take()
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.failure_rate
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/generate':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            prompt = data['prompt']
+        except (ValueError, KeyError):
+            self._send_json(400, {'error': "JSON body with 'prompt' required"})
+            return
+
+        config = self.server.config
+        if not config.admit():
+            self._send_json(429, {'error': 'rate limited'})
+            return
+        delay = config.sample_latency()
+        if config.should_fail():
+            time.sleep(delay)
+            self._send_json(500, {'error': 'injected failure'})
+            return
+
+        system = data.get('system')
+        text = stub_answer(prompt, system)
+        if not data.get('stream'):
+            time.sleep(delay)
+            self._send_json(200, {'text': text, 'usage': {
+                'prompt_tokens': estimate_tokens(system or '') + estimate_tokens(prompt),
+                'response_tokens': estimate_tokens(text)
+            }})
+            return
+
+        # Streaming: the latency is spread over the chunks
+        words = text.split(' ')
+        size = -(-len(words) // config.stream_chunks)
+        chunks = [' '.join(words[i:i + size]) + (' ' if i + size < len(words) else '')
+                  for i in range(0, len(words), size)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            self.wfile.write(json.dumps({'text': chunk}).encode('utf-8') + b'\n')
+            self.wfile.flush()
+        self.close_connection = True
+
+
+def start_stub_server(host='127.0.0.1', port=0, **config):
+    """
+    Start the stub server on a background thread
+    Args:
+        host: Interface to bind
+        port: Port (0 picks a free one)
+        **config: StubConfig settings
+    Returns:
+        tuple: (server, base URL) - call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.config = StubConfig(**config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic local LLM stub server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='fixed')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate', type=float, default=None, help="requests per second (default: unlimited)")
+    parser.add_argument('--burst', type=float, default=None)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.host, args.port, latency=args.latency, latency_ms=args.latency_ms,
+                                    jitter_ms=args.jitter_ms, rate=args.rate, burst=args.burst,
+                                    failure_rate=args.failure_rate, seed=args.seed)
+    print(f"🧪 LLM stub server on {url} "
+          f"(latency {args.latency} {args.latency_ms:g} ms, failure rate {args.failure_rate:g})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
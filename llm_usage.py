@@ -0,0 +1,128 @@
+"""
+LLM Usage Accounting
+Every LLM call goes through call_llm, which records prompt, response and
+cached tokens, latency and estimated cost per caller (the prompt template),
+route (the Flask endpoint that triggered it) and backend, so the costliest
+call sites show up on /admin/llm-usage.
+"""
+
+import threading
+import time
+from conversation_context import estimate_tokens
+from metrics import LatencySummary, metrics
+
+try:
+    from flask import has_request_context, request
+    FLASK_AVAILABLE = True
+except ImportError:
+    FLASK_AVAILABLE = False
+
+
+def current_route():
+    """Flask endpoint handling the current request, or 'background'"""
+    if FLASK_AVAILABLE and has_request_context() and request.endpoint:
+        return request.endpoint
+    return 'background'
+
+
+class UsageLedger:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # (caller, route, backend) -> totals and latency
+
+    def record(self, caller, route, backend, prompt_tokens, response_tokens, cached_tokens, cost, seconds,
+               error=False):
+        """Add one call to the totals for its caller, route and backend"""
+        with self.lock:
+            entry = self.entries.get((caller, route, backend))
+            if entry is None:
+                entry = self.entries[(caller, route, backend)] = {
+                    'calls': 0, 'errors': 0, 'prompt_tokens': 0, 'response_tokens': 0,
+                    'cached_tokens': 0, 'cost': 0.0, 'latency': LatencySummary()
+                }
+            entry['calls'] += 1
+            entry['errors'] += int(error)
+            entry['prompt_tokens'] += prompt_tokens
+            entry['response_tokens'] += response_tokens
+            entry['cached_tokens'] += cached_tokens
+            entry['cost'] += cost
+            entry['latency'].add(seconds)
+
+    def report(self):
+        """
+        Spend per call site, costliest first
+        Returns:
+            dict: 'call_sites' list and 'totals'
+        """
+        with self.lock:
+            rows = []
+            for (caller, route, backend), entry in self.entries.items():
+                latency = entry['latency'].summary()
+                rows.append({
+                    'caller': caller,
+                    'route': route,
+                    'backend': backend,
+                    'calls': entry['calls'],
+                    'errors': entry['errors'],
+                    'prompt_tokens': entry['prompt_tokens'],
+                    'response_tokens': entry['response_tokens'],
+                    'cached_tokens': entry['cached_tokens'],
+                    'prompt_tokens_per_call': round(entry['prompt_tokens'] / entry['calls'], 1),
+                    'cost_usd': round(entry['cost'], 6),
+                    'latency_p50_ms': latency['p50_ms'],
+                    'latency_p95_ms': latency['p95_ms'],
+                })
+        rows.sort(key=lambda row: row['cost_usd'], reverse=True)
+        totals = {key: sum(row[key] for row in rows)
+                  for key in ('calls', 'errors', 'prompt_tokens', 'response_tokens', 'cached_tokens')}
+        totals['cost_usd'] = round(sum(row['cost_usd'] for row in rows), 6)
+        return {'call_sites': rows, 'totals': totals}
+
+    def reset(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Shared by the whole process
+usage = UsageLedger()
+
+
+def call_llm(backend, template, prompt, timeout=None, caller=None):
+    """
+    Generate with a backend, sending the template's instructions as the
+    static prefix, and account for the call
+    Args:
+        backend: LLMBackend
+        template: PromptTemplate the prompt was rendered from
+        prompt: Rendered per-call part
+        timeout: Request timeout in seconds
+        caller: Name in usage reports (default: the template name)
+    Returns:
+        LLMResponse (exceptions are recorded and re-raised)
+    """
+    caller = caller or template.name
+    route = current_route()
+    start = time.perf_counter()
+    try:
+        response = backend.generate(prompt, system=template.instructions, timeout=timeout)
+    except Exception:
+        usage.record(caller, route, backend.name, 0, 0, 0, 0.0, time.perf_counter() - start, error=True)
+        metrics.increment('llm_errors', caller=caller)
+        raise
+
+    seconds = time.perf_counter() - start
+    # Estimated when the backend doesn't report token counts
+    prompt_tokens = response.prompt_tokens
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(template.instructions) + estimate_tokens(prompt)
+    response_tokens = response.response_tokens
+    if response_tokens is None:
+        response_tokens = estimate_tokens(response.text)
+    cost = backend.cost(prompt_tokens, response_tokens, response.cached_tokens)
+
+    usage.record(caller, route, backend.name, prompt_tokens, response_tokens, response.cached_tokens, cost, seconds)
+    metrics.increment('llm_calls', caller=caller)
+    metrics.observe('llm_latency', seconds, caller=caller)
+    metrics.observe_value('llm_prompt_tokens', prompt_tokens, caller=caller)
+    metrics.observe_value('llm_response_tokens', response_tokens, caller=caller)
+    return response
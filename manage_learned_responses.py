@@ -1,12 +1,65 @@
 """
 Learned Responses Manager
 Tool to view, manage, and export learned responses from Gemini
+
+Run without arguments for the interactive menu, or use a subcommand:
+    python manage_learned_responses.py stats --top 10
+    python manage_learned_responses.py list --type flood --page 2 --jsonl
+    python manage_learned_responses.py search "generator" --since 2025-01-01
+    python manage_learned_responses.py delete "question key" ...
+    python manage_learned_responses.py export --min-usage 2 --output-dir data --compression zstd
+    python manage_learned_responses.py prune --max-usage 1 --until 2025-01-01 --dry-run
 """
 
+import argparse
+import heapq
 import json
 import os
+import sys
+import time
 from datetime import datetime
 from collections import defaultdict
+from itertools import islice
+from training_shards import write_training_shards
+from usage_stats import TOP_K, UsageStats
+from learned_store import (
+    LearnedResponseStore,
+    iter_learned_responses,
+    make_filter,
+    store_write_lock,
+    write_learned_responses
+)
+
+def print_entry(number, key, data):
+    """Print one learned response in the manager's text format"""
+    question = data.get('question', key)
+    answer = data.get('answer', 'No answer')
+    disaster = data.get('disaster_type', 'general')
+    usage = data.get('usage_count', 0)
+    timestamp = data.get('timestamp', 'Unknown')
+    
+    # Parse timestamp
+    try:
+        dt = datetime.fromisoformat(timestamp)
+        time_str = dt.strftime('%Y-%m-%d %H:%M')
+    except:
+        time_str = timestamp
+    
+    print(f"{'─'*70}")
+    print(f"#{number} | 🔖 {disaster.replace('_', ' ').title()} | ⏰ {time_str} | 🔄 Used {usage}x")
+    print(f"{'─'*70}")
+    print(f"❓ Question: {question}")
+    print(f"\n💡 Answer:\n{answer[:300]}{'...' if len(answer) > 300 else ''}")
+    print()
+
+
+def parse_timestamp(value):
+    """datetime for an ISO timestamp, or None if it is missing or invalid"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
 
 class LearnedResponsesManager:
     def __init__(self, learned_file='learned_responses.json'):
@@ -27,7 +80,7 @@ class LearnedResponsesManager:
     def _save_responses(self):
         """Save responses to file"""
         try:
-            with open(self.learned_file, 'w', encoding='utf-8') as f:
+            with store_write_lock(self.learned_file), open(self.learned_file, 'w', encoding='utf-8') as f:
                 json.dump(self.responses, f, indent=2, ensure_ascii=False)
             print("✓ Saved successfully")
         except Exception as e:
@@ -35,7 +88,8 @@ class LearnedResponsesManager:
     
     def show_statistics(self):
         """Display statistics about learned responses"""
-        if not self.responses:
+        stats = UsageStats.for_file(self.learned_file).snapshot(top=5)
+        if not stats['total']:
             print("No learned responses yet.")
             return
         
@@ -43,38 +97,20 @@ class LearnedResponsesManager:
         print("📊 LEARNED RESPONSES STATISTICS")
         print("="*70)
         
-        total = len(self.responses)
+        total = stats['total']
+        total_usage = stats['total_usage']
         print(f"\n📚 Total Learned Responses: {total}")
-        
-        # Count by disaster type
-        by_type = defaultdict(int)
-        total_usage = 0
-        
-        for key, data in self.responses.items():
-            disaster_type = data.get('disaster_type', 'general')
-            usage_count = data.get('usage_count', 0)
-            by_type[disaster_type] += 1
-            total_usage += usage_count
-        
         print(f"🔄 Total Reuses: {total_usage} times")
         print(f"📈 Average Reuse: {total_usage/total if total > 0 else 0:.1f} times per response")
         
         print("\n📂 By Disaster Type:")
-        for disaster_type, count in sorted(by_type.items(), key=lambda x: x[1], reverse=True):
+        for disaster_type, count in stats['by_type'].items():
             print(f"   • {disaster_type.replace('_', ' ').title()}: {count} responses")
         
         # Most used responses
         print("\n🔥 Top 5 Most Used Responses:")
-        sorted_responses = sorted(
-            self.responses.items(),
-            key=lambda x: x[1].get('usage_count', 0),
-            reverse=True
-        )[:5]
-        
-        for i, (key, data) in enumerate(sorted_responses, 1):
-            question = data.get('question', key)
-            usage = data.get('usage_count', 0)
-            print(f"   {i}. [{usage} uses] {question[:60]}...")
+        for i, item in enumerate(stats['top'], 1):
+            print(f"   {i}. [{item['usage_count']} uses] {item['question'][:60]}...")
         
         print("\n" + "="*70 + "\n")
     
@@ -98,25 +134,7 @@ class LearnedResponsesManager:
             filtered = list(filtered)[:limit]
         
         for i, (key, data) in enumerate(filtered, 1):
-            question = data.get('question', key)
-            answer = data.get('answer', 'No answer')
-            disaster = data.get('disaster_type', 'general')
-            usage = data.get('usage_count', 0)
-            timestamp = data.get('timestamp', 'Unknown')
-            
-            # Parse timestamp
-            try:
-                dt = datetime.fromisoformat(timestamp)
-                time_str = dt.strftime('%Y-%m-%d %H:%M')
-            except:
-                time_str = timestamp
-            
-            print(f"{'─'*70}")
-            print(f"#{i} | 🔖 {disaster.replace('_', ' ').title()} | ⏰ {time_str} | 🔄 Used {usage}x")
-            print(f"{'─'*70}")
-            print(f"❓ Question: {question}")
-            print(f"\n💡 Answer:\n{answer[:300]}{'...' if len(answer) > 300 else ''}")
-            print()
+            print_entry(i, key, data)
         
         print("="*70 + "\n")
     
@@ -148,41 +166,102 @@ class LearnedResponsesManager:
     def delete_response(self, question_key):
         """Delete a learned response"""
         if question_key in self.responses:
+            # Rewrite what is on disk now - a server may have learned more since we loaded
+            _rewrite_without(self.learned_file, lambda key, data: key == question_key)
             del self.responses[question_key]
-            self._save_responses()
             print(f"✓ Deleted response: {question_key[:50]}...")
         else:
             print(f"Response not found: {question_key}")
     
-    def export_to_training_data(self, output_file='learned_training_data.json'):
-        """Export learned responses to training data format"""
-        if not self.responses:
-            print("No responses to export.")
-            return
-        
-        training_data = []
+    def iter_training_samples(self, since=None):
+        """
+        Yield learned responses in training data format
+        Args:
+            since: Only include responses learned after this ISO timestamp.
+                Responses without a valid timestamp can't be placed after
+                it, so they are only included when since is None
+        """
+        since_dt = parse_timestamp(since) if since else None
         
         for key, data in self.responses.items():
             question = data.get('question', '')
             answer = data.get('answer', '')
             disaster_type = data.get('disaster_type', 'general')
             
-            if question and answer:
-                training_data.append({
-                    'input': f"Disaster emergency: {question}",
-                    'output': answer,
-                    'disaster_type': disaster_type
-                })
-        
+            if not (question and answer):
+                continue
+            
+            if since_dt:
+                learned_at = parse_timestamp(data.get('timestamp'))
+                if learned_at is None or learned_at <= since_dt:
+                    continue
+            
+            yield {
+                'input': f"Disaster emergency: {question}",
+                'output': answer,
+                'disaster_type': disaster_type,
+                'timestamp': data.get('timestamp')
+            }
+    
+    def export_to_training_data(self, output_dir='learned_training_data', shard_size=10000,
+                                compression='gzip', partition_by='disaster_type'):
+        """
+        Export learned responses as sharded JSONL training data
+        Streams straight from the store file; see export_training_shards
+        """
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(training_data, f, indent=2, ensure_ascii=False)
+            manifest = export_training_shards(
+                self.learned_file, output_dir,
+                shard_size=shard_size,
+                compression=compression,
+                partition_by=partition_by
+            )
+            if not manifest['total_records']:
+                print("No responses to export.")
+                return manifest
             
-            print(f"✓ Exported {len(training_data)} responses to {output_file}")
-            print(f"  You can use this file to retrain your model with learned data!")
+            print(f"✓ Exported {manifest['total_records']} responses to {output_dir}/ "
+                  f"({len(manifest['shards'])} shards, {manifest['total_bytes']/1024:.1f} KB)")
+            print(f"  You can use this directory to retrain your model with learned data!")
+            return manifest
         except Exception as e:
             print(f"Error exporting: {e}")
     
+    def _time_lookups(self, store, questions):
+        """Average lookup time (ms) for slightly rephrased versions of questions"""
+        if not questions:
+            return 0.0
+        start = time.perf_counter()
+        for question in questions:
+            store.match(f"{question} now")
+        return (time.perf_counter() - start) * 1000 / len(questions)
+    
+    def dedupe_responses(self):
+        """Collapse near-duplicate questions into canonical entries with aliases"""
+        store = LearnedResponseStore(self.learned_file)
+        if not store.responses:
+            print("No learned responses yet.")
+            return
+        
+        questions = [entry.get('question', key) for key, entry in store.responses.items()]
+        before_bytes = os.path.getsize(self.learned_file)
+        before_lookup = self._time_lookups(store, questions)
+        
+        result = store.dedupe()
+        
+        after_bytes = os.path.getsize(self.learned_file)
+        after_lookup = self._time_lookups(store, questions)
+        self.responses = store.responses
+        
+        print("\n" + "="*70)
+        print("🧹 NEAR-DUPLICATE CLEANUP")
+        print("="*70)
+        print(f"\n📚 Entries:     {result['before']} → {result['after']} ({result['merged']} merged as aliases)")
+        print(f"💾 Store size:  {before_bytes/1024:.1f} KB → {after_bytes/1024:.1f} KB")
+        print(f"⏱️  Lookup time: {before_lookup:.3f} ms → {after_lookup:.3f} ms per question")
+        print("\n" + "="*70 + "\n")
+        return result
+    
     def clear_all(self, confirm=False):
         """Clear all learned responses"""
         if not confirm:
@@ -196,9 +275,266 @@ class LearnedResponsesManager:
         self._save_responses()
         print("✓ All learned responses cleared.")
 
-def main():
+# ----------------------------------------------------------------------
+# Non-interactive subcommands
+# All of them stream the store entry by entry, so memory stays bounded
+# no matter how large the store is. Filters are applied inside the scan.
+# ----------------------------------------------------------------------
+
+def _entry_filter(args):
+    return make_filter(
+        disaster_type=args.type,
+        min_usage=args.min_usage,
+        max_usage=args.max_usage,
+        since=args.since,
+        until=args.until
+    )
+
+
+def _page(items, args):
+    """Apply --page/--page-size to a stream (page size 0 means everything)"""
+    if not args.page_size:
+        return items
+    start = (args.page - 1) * args.page_size
+    return islice(items, start, start + args.page_size)
+
+
+def _emit(items, args):
+    """Write entries as JSON lines or in the text format; returns the count"""
+    count = 0
+    for count, (key, data) in enumerate(items, 1):
+        if args.jsonl:
+            sys.stdout.write(json.dumps({'key': key, **data}, ensure_ascii=False) + '\n')
+        else:
+            print_entry((args.page - 1) * args.page_size + count, key, data)
+    return count
+
+
+def cmd_stats(args):
+    """Per-type counts, total reuse and the top-K most used answers"""
+    predicate = _entry_filter(args)
+    if predicate is None and args.top <= TOP_K:
+        # Unfiltered stats come from the sidecar kept current by the store
+        stats = UsageStats.for_file(args.file).snapshot(args.top)
+        del stats['usage_by_type']
+        for item in stats['top']:
+            del item['disaster_type']
+        return _print_stats(stats, args)
+    
+    total = 0
+    total_usage = 0
+    by_type = defaultdict(int)
+    top = []  # min-heap of (usage, order, key, question)
+    
+    for order, (key, data) in enumerate(iter_learned_responses(args.file, predicate)):
+        usage = data.get('usage_count', 0)
+        total += 1
+        total_usage += usage
+        by_type[data.get('disaster_type', 'general')] += 1
+        item = (usage, -order, key, data.get('question', key))
+        if len(top) < args.top:
+            heapq.heappush(top, item)
+        elif item > top[0]:
+            heapq.heapreplace(top, item)
+    
+    top = [
+        {'key': key, 'question': question, 'usage_count': usage}
+        for usage, _, key, question in sorted(top, reverse=True)
+    ]
+    stats = {
+        'total': total,
+        'total_usage': total_usage,
+        'by_type': dict(sorted(by_type.items(), key=lambda x: x[1], reverse=True)),
+        'top': top
+    }
+    return _print_stats(stats, args)
+
+
+def _print_stats(stats, args):
+    total = stats['total']
+    total_usage = stats['total_usage']
+    top = stats['top']
+    if args.jsonl:
+        print(json.dumps(stats, ensure_ascii=False))
+        return stats
+    
+    print(f"📚 Total Learned Responses: {total}")
+    print(f"🔄 Total Reuses: {total_usage} times")
+    print("\n📂 By Disaster Type:")
+    for disaster_type, count in stats['by_type'].items():
+        print(f"   • {disaster_type.replace('_', ' ').title()}: {count} responses")
+    print(f"\n🔥 Top {args.top} Most Used Responses:")
+    for i, item in enumerate(top, 1):
+        print(f"   {i}. [{item['usage_count']} uses] {item['question'][:60]}")
+    return stats
+
+
+def cmd_list(args):
+    """List entries, one page at a time"""
+    items = iter_learned_responses(args.file, _entry_filter(args))
+    return _emit(_page(items, args), args)
+
+
+def cmd_search(args):
+    """List entries whose question, aliases or answer contain a keyword"""
+    keyword = args.keyword.lower()
+    
+    def matches(item):
+        _, data = item
+        return (keyword in data.get('question', '').lower()
+                or keyword in data.get('answer', '').lower()
+                or any(keyword in alias.lower() for alias in data.get('aliases', [])))
+    
+    items = filter(matches, iter_learned_responses(args.file, _entry_filter(args)))
+    return _emit(_page(items, args), args)
+
+
+def _rewrite_without(path, drop):
+    """
+    Stream the store into a new file, leaving out entries where drop(key, data)
+    Holds the store's write lock, so a running server finishes its save
+    first and reloads the rewritten file before its next change
+    """
+    removed = 0
+    stats = UsageStats()
+    
+    def kept():
+        nonlocal removed
+        for key, data in iter_learned_responses(path):
+            if drop(key, data):
+                removed += 1
+            else:
+                stats.add(key, data)
+                yield key, data
+    
+    with store_write_lock(path):
+        remaining = write_learned_responses(path, kept())
+        # The rewrite already saw every kept entry, so refresh the stats sidecar too
+        stats.save(path)
+    return removed, remaining
+
+
+def cmd_delete(args):
+    """Delete entries by key"""
+    keys = set(args.keys)
+    removed, remaining = _rewrite_without(args.file, lambda key, data: key in keys)
+    print(f"✓ Deleted {removed} response(s), {remaining} remaining")
+    return removed
+
+
+def cmd_prune(args):
+    """Delete every entry matching the filters"""
+    predicate = _entry_filter(args)
+    if predicate is None:
+        print("Refusing to prune without a filter (--type, --min-usage, --max-usage, --since, --until)")
+        return 0
+    
+    if args.dry_run:
+        count = sum(1 for _ in iter_learned_responses(args.file, predicate))
+        print(f"Would prune {count} response(s)")
+        return count
+    
+    removed, remaining = _rewrite_without(args.file, lambda key, data: predicate(data))
+    print(f"✓ Pruned {removed} response(s), {remaining} remaining")
+    return removed
+
+
+def iter_training_records(learned_file, predicate=None):
+    """Stream learned responses from the store file in training data format"""
+    for key, data in iter_learned_responses(learned_file, predicate):
+        question = data.get('question', '')
+        answer = data.get('answer', '')
+        if question and answer:
+            yield {
+                'input': f"Disaster emergency: {question}",
+                'output': answer,
+                'disaster_type': data.get('disaster_type', 'general')
+            }
+
+
+def export_training_shards(learned_file, output_dir, predicate=None, shard_size=10000,
+                           compression='gzip', partition_by='disaster_type'):
+    """
+    Stream learned responses into compressed JSONL shards with a manifest
+    Memory use does not depend on the store size; train_model.py reads the
+    shards back lazily.
+    Returns:
+        dict: The shard manifest (counts and checksums)
+    """
+    return write_training_shards(
+        iter_training_records(learned_file, predicate),
+        output_dir,
+        shard_size=shard_size,
+        compression=compression,
+        partition_by=partition_by,
+        source=os.path.abspath(learned_file)
+    )
+
+
+def cmd_export(args):
+    """Export matching entries as sharded JSONL training data"""
+    manifest = export_training_shards(
+        args.file, args.output_dir,
+        predicate=_entry_filter(args),
+        shard_size=args.shard_size,
+        compression=None if args.compression == 'none' else args.compression,
+        partition_by=None if args.no_partition else 'disaster_type'
+    )
+    print(f"✓ Exported {manifest['total_records']} responses to {args.output_dir}/ "
+          f"({len(manifest['shards'])} shards, {manifest['total_bytes']/1024:.1f} KB)")
+    return manifest
+
+
+def build_parser():
+    """Command line interface: subcommands for scripting, no subcommand for the menu"""
+    parser = argparse.ArgumentParser(description="Manage learned responses")
+    parser.add_argument('--file', default='learned_responses.json', help="Learned responses store")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--type', help="Only this disaster type")
+    filters.add_argument('--min-usage', type=int, help="Minimum usage count (inclusive)")
+    filters.add_argument('--max-usage', type=int, help="Maximum usage count (inclusive)")
+    filters.add_argument('--since', help="Learned on/after this ISO date")
+    filters.add_argument('--until', help="Learned before this ISO date")
+    
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--jsonl', action='store_true', help="Output JSON lines")
+    output.add_argument('--page', type=int, default=1, help="Page number (1-based)")
+    output.add_argument('--page-size', type=int, default=20, help="Entries per page (0 = all)")
+    
+    stats = subparsers.add_parser('stats', parents=[filters], help="Show statistics")
+    stats.add_argument('--top', type=int, default=5, help="How many most used answers to show")
+    stats.add_argument('--jsonl', action='store_true', help="Output one JSON line")
+    stats.set_defaults(func=cmd_stats)
+    
+    subparsers.add_parser('list', parents=[filters, output], help="List responses").set_defaults(func=cmd_list)
+    
+    search = subparsers.add_parser('search', parents=[filters, output], help="Search responses")
+    search.add_argument('keyword')
+    search.set_defaults(func=cmd_search)
+    
+    delete = subparsers.add_parser('delete', help="Delete responses by key")
+    delete.add_argument('keys', nargs='+')
+    delete.set_defaults(func=cmd_delete)
+    
+    export = subparsers.add_parser('export', parents=[filters], help="Export sharded JSONL training data")
+    export.add_argument('--output-dir', default='learned_training_data')
+    export.add_argument('--shard-size', type=int, default=10000, help="Records per shard")
+    export.add_argument('--compression', choices=['gzip', 'zstd', 'none'], default='gzip')
+    export.add_argument('--no-partition', action='store_true', help="Don't split shards by disaster type")
+    export.set_defaults(func=cmd_export)
+    
+    prune = subparsers.add_parser('prune', parents=[filters], help="Delete all responses matching the filters")
+    prune.add_argument('--dry-run', action='store_true')
+    prune.set_defaults(func=cmd_prune)
+    
+    return parser
+
+
+def interactive_menu(learned_file='learned_responses.json'):
     """Interactive menu"""
-    manager = LearnedResponsesManager()
+    manager = LearnedResponsesManager(learned_file)
     
     while True:
         print("\n" + "="*70)
@@ -209,11 +545,12 @@ def main():
         print("3. List by Disaster Type")
         print("4. Search Responses")
         print("5. Export to Training Data")
-        print("6. Clear All (Danger!)")
-        print("7. Exit")
+        print("6. Merge Near-Duplicate Questions")
+        print("7. Clear All (Danger!)")
+        print("8. Exit")
         print("\n" + "="*70)
         
-        choice = input("\nEnter choice (1-7): ").strip()
+        choice = input("\nEnter choice (1-8): ").strip()
         
         if choice == '1':
             manager.show_statistics()
@@ -245,19 +582,30 @@ def main():
                 manager.search_responses(keyword)
         
         elif choice == '5':
-            filename = input("Output filename (default: learned_training_data.json): ").strip()
-            filename = filename if filename else 'learned_training_data.json'
-            manager.export_to_training_data(filename)
+            output_dir = input("Output directory (default: learned_training_data): ").strip()
+            output_dir = output_dir if output_dir else 'learned_training_data'
+            manager.export_to_training_data(output_dir)
         
         elif choice == '6':
-            manager.clear_all()
+            manager.dedupe_responses()
         
         elif choice == '7':
+            manager.clear_all()
+        
+        elif choice == '8':
             print("\nGoodbye! 👋")
             break
         
         else:
-            print("Invalid choice. Please enter 1-7.")
+            print("Invalid choice. Please enter 1-8.")
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        interactive_menu(args.file)
+        return
+    args.func(args)
 
 if __name__ == '__main__':
     main()
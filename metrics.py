@@ -0,0 +1,117 @@
+"""
+Runtime Metrics
+Process-wide counters, latency and value summaries, exposed on /admin/metrics
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Latency samples kept per series for percentiles
+RESERVOIR_SIZE = 2000
+
+
+def _series(name, labels):
+    """Series key like 'chat_shed{reason=inflight}'"""
+    if not labels:
+        return name
+    return name + '{' + ','.join(f"{k}={v}" for k, v in sorted(labels.items())) + '}'
+
+
+class LatencySummary:
+    def __init__(self, scale=1000, suffix='_ms'):
+        """Summary of samples, reported multiplied by scale (seconds to ms by default)"""
+        self.scale = scale
+        self.suffix = suffix
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * self.scale if ordered else 0.0
+
+        return {
+            'count': self.count,
+            'mean' + self.suffix: round(self.total / self.count * self.scale, 2) if self.count else 0.0,
+            'p50' + self.suffix: round(percentile(0.50), 2),
+            'p95' + self.suffix: round(percentile(0.95), 2),
+            'p99' + self.suffix: round(percentile(0.99), 2),
+            'max' + self.suffix: round(self.max * self.scale, 2)
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.latencies = defaultdict(LatencySummary)
+        self.values = defaultdict(lambda: LatencySummary(scale=1, suffix=''))
+        self.gauges = {}
+        self.started_at = time.time()
+
+    def increment(self, name, value=1, **labels):
+        """Add to a counter"""
+        with self.lock:
+            self.counters[_series(name, labels)] += value
+
+    def observe(self, name, seconds, **labels):
+        """Record a latency in seconds"""
+        with self.lock:
+            self.latencies[_series(name, labels)].add(seconds)
+
+    def observe_value(self, name, value, **labels):
+        """Record a sample of a quantity other than time (e.g. prompt tokens)"""
+        with self.lock:
+            self.values[_series(name, labels)].add(value)
+
+    def gauge(self, name, func):
+        """Register a callable reporting a current value (e.g. queue depth)"""
+        with self.lock:
+            self.gauges[name] = func
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time a block of code"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """All counters, gauges and latency summaries"""
+        with self.lock:
+            counters = dict(sorted(self.counters.items()))
+            latencies = {key: lat.summary() for key, lat in sorted(self.latencies.items())}
+            values = {key: summary.summary() for key, summary in sorted(self.values.items())}
+            gauges = dict(self.gauges)
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'counters': counters,
+            'gauges': {name: func() for name, func in sorted(gauges.items())},
+            'latency': latencies,
+            'values': values
+        }
+
+    def reset(self):
+        """Clear all recorded values (gauges stay registered)"""
+        with self.lock:
+            self.counters.clear()
+            self.latencies.clear()
+            self.values.clear()
+            self.started_at = time.time()
+
+
+# Shared by the whole process
+metrics = Metrics()
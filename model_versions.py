@@ -0,0 +1,72 @@
+"""
+Model Versioning Helpers
+Versioned model directories, the LATEST pointer the server follows,
+and the learned-responses watermark used by incremental training
+"""
+
+import json
+import os
+from datetime import datetime
+
+VERSIONS_DIR = 'versions'
+LATEST_FILE = 'LATEST'
+WATERMARK_FILE = 'learned_watermark.json'
+
+
+def latest_version(model_dir):
+    """Return the name of the published model version, or None"""
+    try:
+        with open(os.path.join(model_dir, LATEST_FILE), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+        return version or None
+    except OSError:
+        return None
+
+
+def resolve_model_path(model_dir):
+    """
+    Resolve the directory the server should load
+    Returns the published version if there is one, otherwise model_dir itself
+    """
+    version = latest_version(model_dir)
+    if version:
+        version_path = os.path.join(model_dir, VERSIONS_DIR, version)
+        if os.path.isdir(version_path):
+            return version_path
+    return model_dir
+
+
+def new_version_path(model_dir):
+    """Create a new, timestamped version directory and return its path"""
+    version = datetime.now().strftime('v%Y%m%d-%H%M%S')
+    path = os.path.join(model_dir, VERSIONS_DIR, version)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def publish_version(model_dir, version_path):
+    """Atomically point LATEST at a version directory"""
+    pointer = os.path.join(model_dir, LATEST_FILE)
+    tmp_pointer = pointer + '.tmp'
+    with open(tmp_pointer, 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(os.path.normpath(version_path)) + '\n')
+    os.replace(tmp_pointer, pointer)
+
+
+def load_watermark(model_dir):
+    """Load the learned-responses watermark (empty dict if none yet)"""
+    try:
+        with open(os.path.join(model_dir, WATERMARK_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_watermark(model_dir, watermark):
+    """Atomically save the learned-responses watermark"""
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, WATERMARK_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermark, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,112 @@
+"""
+Near-Duplicate Detection for Learned Questions
+MinHash signatures with LSH banding, so rephrasings of the same question
+("What to do in a flood?" / "what do I do in a flood??") map to one entry
+"""
+
+import hashlib
+import random
+import re
+
+# Words that don't change what a question is about
+STOPWORDS = {
+    'a', 'about', 'am', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'can', 'could',
+    'do', 'does', 'doing', 'for', 'from', 'get', 'how', 'i', 'if', 'in', 'is', 'it',
+    'me', 'my', 'of', 'on', 'or', 'please', 'should', 'so', 'the', 'there', 'this',
+    'to', 'we', 'what', 'whats', 'when', 'where', 'which', 'who', 'will', 'with',
+    'would', 'you', 'your'
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def tokenize(text):
+    """
+    Content tokens of a question (lowercased, punctuation and stopwords removed)
+    Falls back to all tokens for questions made only of stopwords
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower().replace("'", ''))
+    content = {token for token in tokens if token not in STOPWORDS}
+    return content or set(tokens)
+
+
+def jaccard(a, b):
+    """Exact Jaccard similarity of two token sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures using universal hashing over a 64-bit token hash"""
+
+    def __init__(self, num_perm=32, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, tokens):
+        """Return the MinHash signature (tuple of num_perm ints) of a token set"""
+        if not tokens:
+            return (_MERSENNE_PRIME,) * self.num_perm
+
+        hashes = [
+            int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+            for token in tokens
+        ]
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self.permutations
+        )
+
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing over MinHash signatures
+    Signatures are cut into bands; keys sharing any band are candidates
+    """
+
+    def __init__(self, num_perm=32, bands=8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets = {}
+        self.key_bands = {}
+
+    def _band_keys(self, signature):
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def add(self, key, signature):
+        """Index a key under its signature (replacing any previous entry)"""
+        self.remove(key)
+        band_keys = self._band_keys(signature)
+        for band_key in band_keys:
+            self.buckets.setdefault(band_key, set()).add(key)
+        self.key_bands[key] = band_keys
+
+    def remove(self, key):
+        """Remove a key from the index"""
+        for band_key in self.key_bands.pop(key, []):
+            bucket = self.buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band_key]
+
+    def query(self, signature):
+        """Return the set of keys sharing at least one band with signature"""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        return candidates
+
+    def __len__(self):
+        return len(self.key_bands)
@@ -0,0 +1,208 @@
+"""
+Sampling Profiler
+Opt-in, low-overhead profiling of live requests. A fraction of requests
+(LIFELINK_PROFILE_SAMPLE_RATE, off by default) is traced: a background
+thread samples the stacks of the threads working on them every
+LIFELINK_PROFILE_INTERVAL_MS, including executor threads they fan out to.
+Samples are tagged with the route and the answer path (cheap, gemini,
+model, race, shed) and kept as folded stacks, the text format flamegraph.pl,
+speedscope and inferno read:
+
+    chat;gemini;app.chat;chatbot.DisasterChatbot.generate_response;... 42
+
+GET /admin/profile captures every request for a number of seconds, or
+returns what the sample rate has collected so far. Profiles are per worker
+process.
+"""
+
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from metrics import metrics
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# Share of requests traced outside captures (0 disables), and time between samples
+SAMPLE_RATE = _env_float('LIFELINK_PROFILE_SAMPLE_RATE', 0)
+INTERVAL_SECONDS = _env_float('LIFELINK_PROFILE_INTERVAL_MS', 10) / 1000
+
+# Innermost frames kept per sample, and distinct stacks kept per profile
+MAX_STACK_DEPTH = 64
+MAX_STACKS = 20000
+
+# Longest capture. A capture holds its request open, so it stays under
+# gunicorn's 30s worker timeout and nginx's 60s read timeout
+MAX_CAPTURE_SECONDS = 25
+
+_current_trace = contextvars.ContextVar('profile_trace', default=None)
+
+
+class _Trace:
+    def __init__(self, route, sampled):
+        """Samples of one traced request (sampled: picked by the sample rate)"""
+        self.route = route
+        self.sampled = sampled
+        self.paths = []
+        self.stacks = Counter()  # tuple of code objects (root first) -> samples
+
+
+_frame_names = {}  # code object -> "module.function"
+
+
+def _frame_name(code):
+    name = _frame_names.get(code)
+    if name is None:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        name = f"{module}.{getattr(code, 'co_qualname', code.co_name)}".replace(';', ':').replace(' ', '_')
+        _frame_names[code] = name
+    return name
+
+
+def _fold(prefix, stacks, into):
+    """Add a trace's samples to a folded profile (stack string -> samples)"""
+    for codes, count in stacks.items():
+        key = ';'.join([prefix] + [_frame_name(code) for code in codes])
+        if key in into or len(into) < MAX_STACKS:
+            into[key] += count
+        else:
+            into[f"{prefix};[other stacks]"] += count
+
+
+class SamplingProfiler:
+    def __init__(self, sample_rate=SAMPLE_RATE, interval=INTERVAL_SECONDS):
+        """
+        Args:
+            sample_rate: Share of requests traced outside captures
+            interval: Seconds between stack samples
+        """
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.threads = {}       # thread id -> _Trace it is working on
+        self.profile = Counter()
+        self.captures = []
+        self.lock = threading.Lock()
+        self.busy = threading.Event()
+        self.sampler = None
+
+    def start_request(self, route):
+        """Trace the current request if it is sampled or a capture is running"""
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and not self.captures:
+            return
+        trace = _Trace(route or 'unknown', sampled)
+        _current_trace.set(trace)
+        self._register(trace)
+        metrics.increment('profiled_requests', route=trace.route)
+
+    def end_request(self):
+        """Stop tracing the current request and add its samples to the profiles"""
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        _current_trace.set(None)
+        self._unregister()
+        prefix = f"{trace.route};{'+'.join(sorted(trace.paths)) or 'other'}"
+        stacks = dict.copy(trace.stacks)  # threads it fanned out to may still be sampled
+        with self.lock:
+            if trace.sampled:
+                _fold(prefix, stacks, self.profile)
+            for capture in self.captures:
+                _fold(prefix, stacks, capture)
+
+    def set_path(self, path):
+        """Tag the current request with an answer path (no-op when not traced)"""
+        trace = _current_trace.get()
+        if trace is not None and path not in trace.paths:
+            trace.paths.append(path)
+
+    def traced(self, fn):
+        """
+        Wrap work handed to another thread so it is sampled as part of the
+        request that submitted it (run it in a copied context)
+        """
+        @wraps(fn)
+        def run(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            self._register(trace)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._unregister()
+        return run
+
+    def _register(self, trace):
+        with self.lock:
+            self.threads[threading.get_ident()] = trace
+            self.busy.set()
+            if self.sampler is None:
+                self.sampler = threading.Thread(target=self._sample, name='profiler', daemon=True)
+                self.sampler.start()
+
+    def _unregister(self):
+        with self.lock:
+            self.threads.pop(threading.get_ident(), None)
+            if not self.threads:
+                self.busy.clear()
+
+    def _sample(self):
+        """Sampler loop: record the stack of every thread working on a traced request"""
+        while True:
+            self.busy.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                threads = list(self.threads.items())
+            for ident, trace in threads:
+                frame = frames.get(ident)
+                codes = []
+                while frame is not None and len(codes) < MAX_STACK_DEPTH:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                if codes:
+                    trace.stacks[tuple(reversed(codes))] += 1
+
+    def capture(self, seconds):
+        """
+        Trace every request for a number of seconds (blocks meanwhile)
+        Returns:
+            Counter: Folded stack -> samples
+        """
+        capture = Counter()
+        with self.lock:
+            self.captures.append(capture)
+        try:
+            time.sleep(min(seconds, MAX_CAPTURE_SECONDS))
+        finally:
+            with self.lock:
+                self.captures.remove(capture)
+        return capture
+
+    def snapshot(self, reset=False):
+        """Folded profile collected by the sample rate so far"""
+        with self.lock:
+            profile = Counter(self.profile)
+            if reset:
+                self.profile.clear()
+        return profile
+
+
+def folded(profile):
+    """Folded stack text ("frame;frame;frame samples" per line), heaviest first"""
+    return ''.join(f"{stack} {count}\n" for stack, count in profile.most_common())
+
+
+# Process-wide profiler used by app.py
+profiler = SamplingProfiler()
@@ -0,0 +1,74 @@
+"""
+Prompt Templates
+Gemini prompts split into a static instruction prefix, sent once per model
+as its system instruction, and a short per-call part. Templates are parsed
+once at import instead of rebuilding the whole prompt with an f-string on
+every call.
+"""
+
+from string import Formatter
+
+
+class PromptTemplate:
+    def __init__(self, name, instructions, template):
+        """
+        Args:
+            name: Identifies the template (and its call site) in usage reports
+            instructions: Static prefix, identical for every call
+            template: Per-call part with {field} placeholders
+        """
+        self.name = name
+        self.instructions = instructions
+        # (literal text, field name or None) pairs, parsed once
+        self._parts = [(literal, field) for literal, field, _, _ in Formatter().parse(template)]
+        self.fields = {field for _, field in self._parts if field}
+
+    def render(self, **values):
+        """The per-call part of the prompt"""
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Prompt '{self.name}' needs {sorted(missing)}")
+        return ''.join(literal + (str(values[field]) if field else '') for literal, field in self._parts)
+
+    def full_prompt(self, **values):
+        """Instructions and per-call part as one prompt, for backends without system instructions"""
+        return f"{self.instructions}\n\n{self.render(**values)}"
+
+
+CHAT_PROMPT = PromptTemplate(
+    'chat_answer',
+    instructions="""You are a disaster response expert assistant providing emergency guidance.
+
+Provide clear, actionable safety advice with:
+- Clear do's and don'ts
+- Prioritize life safety
+- Be concise but comprehensive (max 300 words)
+- Use bullet points or numbered lists
+- Include emergency contact reminders when relevant""",
+    template="""Emergency Context: {disaster_name}{conversation}
+Question: {question}
+
+Response:""")
+
+WEATHER_PROMPT = PromptTemplate(
+    'weather_recommendation',
+    instructions="""You are a helpful weather assistant. Based on the current weather conditions, provide personalized safety recommendations and tips.
+
+Generate 3-4 practical, caring recommendations. Format:
+- Start with an emoji
+- Be conversational and friendly
+- Include specific safety tips
+- Mention appropriate clothing/gear
+- Keep each tip to 1-2 sentences
+
+Example:
+☂️ Don't forget to bring an umbrella! The rain might catch you off guard.
+🧥 Wear a waterproof jacket to stay dry and comfortable.
+🚗 Drive carefully - roads may be slippery.""",
+    template="""Current Weather:
+- Condition: {condition} ({description})
+- Temperature: {temperature}°F (feels like {feels_like}°F)
+- Humidity: {humidity}%
+- Wind Speed: {wind_speed} mph
+
+Your recommendations:""")
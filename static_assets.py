@@ -0,0 +1,262 @@
+"""
+Static Asset Build and Serving
+Content-hashed asset URLs, precompressed gzip/brotli variants built ahead
+of time, and cache headers (immutable, strong ETags, 304s) for serving them
+
+Build before deploying (the Dockerfile does this):
+    python static_assets.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from datetime import datetime
+from flask import Response, abort, request, send_file
+from werkzeug.http import parse_accept_header
+import image_derivatives
+
+# Optional: brotli for smaller precompressed variants
+try:
+    import brotli  # type: ignore
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+    brotli = None  # type: ignore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(BASE_DIR, 'static_build')
+MANIFEST_FILE = 'asset-manifest.json'
+
+# Logical asset name -> source file
+ASSET_SOURCES = {
+    'widget.js': 'widget.js',
+}
+IMAGE_DIR = os.path.join('assets', 'images')
+
+# Only keep a compressed variant if it is at least this much smaller
+MIN_COMPRESSION_SAVING = 0.1
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+# Fixed URLs (e.g. /widget.js on partner sites) must pick up new releases
+REVALIDATE_CACHE = 'public, max-age=300, must-revalidate'
+
+
+def discover_sources(base_dir=BASE_DIR):
+    """Logical name -> source path for every static asset"""
+    sources = {name: os.path.join(base_dir, path) for name, path in ASSET_SOURCES.items()}
+    image_dir = os.path.join(base_dir, IMAGE_DIR)
+    if os.path.isdir(image_dir):
+        for filename in sorted(os.listdir(image_dir)):
+            sources[f"images/{filename}"] = os.path.join(image_dir, filename)
+    return sources
+
+
+def accepted_encodings(accept_encoding):
+    """Encodings an Accept-Encoding header lists explicitly, without refusing them with q=0"""
+    return {encoding.lower() for encoding, quality in parse_accept_header(accept_encoding) if quality > 0}
+
+
+def content_hash(data):
+    """Short content hash used in versioned URLs and ETags"""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+
+def build_assets(sources=None, output_dir=BUILD_DIR):
+    """
+    Copy assets into the build directory with precompressed variants
+    Args:
+        sources: Logical name -> source path (defaults to discover_sources())
+        output_dir: Where files and the manifest are written
+    Returns:
+        dict: The asset manifest
+    """
+    sources = sources or discover_sources()
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+
+    assets = {}
+    images = {}
+    for name, source in sources.items():
+        with open(source, 'rb') as f:
+            data = f.read()
+        target = os.path.join(output_dir, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+
+        encodings = {}
+        for encoding, suffix in ENCODINGS:
+            if encoding == 'br' and not BROTLI_AVAILABLE:
+                continue
+            compressed = _compress(data, encoding)
+            if len(compressed) <= len(data) * (1 - MIN_COMPRESSION_SAVING):
+                with open(target + suffix, 'wb') as f:
+                    f.write(compressed)
+                encodings[encoding] = {'file': name + suffix, 'bytes': len(compressed)}
+
+        assets[name] = {
+            'hash': content_hash(data),
+            'file': name,
+            'bytes': len(data),
+            'encodings': encodings
+        }
+
+        if image_derivatives.PIL_AVAILABLE and image_derivatives.is_image(name):
+            images[name], derived = image_derivatives.build_derivatives(name, source)
+            for derived_name, derived_data in derived.items():
+                derived_target = os.path.join(output_dir, derived_name)
+                os.makedirs(os.path.dirname(derived_target), exist_ok=True)
+                with open(derived_target, 'wb') as f:
+                    f.write(derived_data)
+                assets[derived_name] = {
+                    'hash': content_hash(derived_data),
+                    'file': derived_name,
+                    'bytes': len(derived_data),
+                    'encodings': {}
+                }
+
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'assets': assets,
+        'images': images
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class AssetRegistry:
+    def __init__(self, build_dir=BUILD_DIR, base_dir=BASE_DIR):
+        """
+        Load the asset manifest written by build_assets()
+        Without a build (development), assets are hashed from their sources
+        at startup and served uncompressed.
+        """
+        self.build_dir = build_dir
+        manifest_path = os.path.join(build_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.assets = manifest['assets']
+            self.images = manifest.get('images', {})
+            for entry in self.assets.values():
+                entry['path'] = os.path.join(build_dir, entry['file'])
+                for variant in entry['encodings'].values():
+                    variant['path'] = os.path.join(build_dir, variant['file'])
+            self.precompressed = True
+        else:
+            self.assets = {}
+            self.images = {}
+            for name, source in discover_sources(base_dir).items():
+                with open(source, 'rb') as f:
+                    data = f.read()
+                self.assets[name] = {
+                    'hash': content_hash(data), 'path': source,
+                    'bytes': len(data), 'encodings': {}
+                }
+            self.precompressed = False
+
+    def url(self, name):
+        """Versioned URL of an asset - changes whenever its content does"""
+        entry = self.assets.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown asset: {name}")
+        return f"/assets/{entry['hash']}/{name}"
+
+    def image_url(self, name, width=None):
+        """Format-negotiated URL of an image, optionally for a display width"""
+        if name not in self.assets:
+            raise KeyError(f"Unknown asset: {name}")
+        return f"/{name}" + (f"?w={width}" if width else "")
+
+    def serve_image(self, name, width=None):
+        """
+        Serve the smallest variant of an image the client can display
+        The format is negotiated from the Accept header
+        """
+        info = self.images.get(name)
+        if not info:
+            return self.serve(name)
+        variant = image_derivatives.choose_variant(info, width, request.headers.get('Accept', ''))
+        if variant is None:
+            return self.serve(name)
+        response = self.serve(variant['name'])
+        response.vary.add('Accept')
+        return response
+
+    def _choose_encoding(self, entry):
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in entry['encodings']:
+                return encoding, entry['encodings'][encoding]['path']
+        return None, entry['path']
+
+    def serve(self, name, version=None):
+        """
+        Response for an asset with caching headers
+        Args:
+            name: Logical asset name
+            version: Hash from a versioned URL; None for fixed URLs like /widget.js
+        """
+        entry = self.assets.get(name)
+        if entry is None or (version is not None and version != entry['hash']):
+            abort(404)
+
+        encoding, path = self._choose_encoding(entry)
+        # Strong ETag per representation: each encoding has its own bytes
+        etag = f"{entry['hash']}-{encoding}" if encoding else entry['hash']
+        cache_control = IMMUTABLE_CACHE if version is not None else REVALIDATE_CACHE
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = send_file(
+                path,
+                mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                conditional=False,
+                etag=False
+            )
+            # Cache-Control below replaces send_file's own expiry; the
+            # precompressed file's name must not leak into the response
+            response.headers.pop('Expires', None)
+            response.headers.pop('Content-Disposition', None)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build hashed, precompressed static assets")
+    parser.add_argument('--output-dir', default=BUILD_DIR)
+    args = parser.parse_args()
+
+    if not BROTLI_AVAILABLE:
+        print("⚠️  brotli not installed - building gzip variants only (pip install brotli)")
+    if not image_derivatives.PIL_AVAILABLE:
+        print("⚠️  Pillow not installed - serving original images only (pip install Pillow)")
+    manifest = build_assets(output_dir=args.output_dir)
+    print(f"✓ Built {len(manifest['assets'])} assets into {args.output_dir}/")
+    for name, entry in manifest['assets'].items():
+        if name.startswith(image_derivatives.DERIVED_PREFIX):
+            continue
+        sizes = ', '.join(f"{enc} {v['bytes']/1024:.1f} KB" for enc, v in entry['encodings'].items())
+        print(f"   • {name} [{entry['hash']}] {entry['bytes']/1024:.1f} KB" + (f" → {sizes}" if sizes else ""))
+    if manifest['images']:
+        print("\n🖼️  Image derivatives:")
+        image_derivatives.report(manifest['images'])
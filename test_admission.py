@@ -0,0 +1,93 @@
+"""
+Test admission control and degraded-mode answers
+Runs offline (no Gemini key or trained model needed)
+"""
+
+import os
+import tempfile
+from admission import PriorityGate, RateLimiter, TokenBucket, expensive_calls
+from chatbot import DEGRADED_NOTICE, DisasterChatbot
+from metrics import metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_admission():
+    print("\n" + "="*70)
+    print("🧪 TESTING ADMISSION CONTROL")
+    print("="*70 + "\n")
+
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=3, clock=clock)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+    clock.now += 2
+    assert [bucket.take() for _ in range(3)] == [True, True, False]
+    print("✓ Token bucket allows bursts and refills at its rate")
+
+    limiter = RateLimiter(rate=1, capacity=1, max_clients=2, clock=clock)
+    assert limiter.allow('a') and limiter.allow('b') and not limiter.allow('a')
+    limiter.allow('c')  # evicts 'b', the least recently seen
+    assert set(limiter.buckets) == {'a', 'c'}
+    print("✓ Per-client buckets, least recently seen forgotten first")
+
+    in_flight = PriorityGate(1)
+    with in_flight.slot() as first:
+        with in_flight.slot(max_wait=0) as second:
+            assert first and not second
+    with in_flight.slot() as again:
+        assert again
+    print("✓ In-flight limit sheds when no slot frees up in time")
+
+    metrics.reset()
+    tmp = tempfile.TemporaryDirectory()
+    bot = DisasterChatbot(learned_responses_file=os.path.join(tmp.name, 'learned.json'))
+    question = "Is the bridge on the river road still open for evacuation traffic"
+
+    response = bot.chat(question, shed_reason='session_rate')
+    assert bot.degraded_reason == 'session_rate' and response.endswith(DEGRADED_NOTICE)
+
+    # Occupy every expensive slot, as a burst of slow Gemini calls would
+    slots = [expensive_calls.slot() for _ in range(expensive_calls.limit)]
+    for slot in slots:
+        assert slot.__enter__()
+    try:
+        response = bot.chat(question)
+        assert bot.degraded_reason == 'inflight' and response.endswith(DEGRADED_NOTICE)
+
+        # Knowledge base questions never need a slot
+        bot.chat("What should I do during an earthquake?")
+        assert bot.degraded_reason is None
+    finally:
+        for slot in slots:
+            slot.__exit__(None, None, None)
+
+    bot.chat(question)
+    assert bot.degraded_reason is None
+    counters = metrics.snapshot()['counters']
+    assert counters['chat_shed{reason=session_rate}'] == 1
+    assert counters['chat_shed{reason=inflight}'] == 1
+    print(f"✓ Degraded answers from the knowledge base, recorded in metrics: {counters}")
+
+    import app as app_module
+    def client_ip(address, headers=None):
+        with app_module.app.test_request_context(environ_base={'REMOTE_ADDR': address}, headers=headers):
+            return app_module.client_ip()
+    relayed = {'X-Real-IP': '198.51.100.7', 'X-Forwarded-For': '198.51.100.7'}
+    assert client_ip('127.0.0.1', relayed) == '198.51.100.7'
+    assert client_ip('127.0.0.1') == '127.0.0.1'
+    assert client_ip('203.0.113.9', relayed) == '203.0.113.9'
+    assert '203.0.113.9' in app_module.untrusted_proxies
+    print("✓ Rate limits key on X-Real-IP from local nginx; other proxies are not believed, and logged")
+
+    tmp.cleanup()
+    print("\n✓ All admission control tests passed!")
+
+
+if __name__ == "__main__":
+    test_admission()
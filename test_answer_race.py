@@ -0,0 +1,104 @@
+"""
+Test racing answer sources under a response SLO
+Runs offline - Gemini is replaced by a slow fake
+"""
+
+import os
+import tempfile
+import threading
+import time
+from admission import expensive_calls
+from answer_race import race
+from chatbot import DisasterChatbot
+from llm_backends import LLMBackend, LLMResponse
+from metrics import metrics
+
+
+def source(answer, delay=0.0):
+    def run():
+        time.sleep(delay)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    return run
+
+
+class SlowGemini(LLMBackend):
+    def __init__(self, delay):
+        self.delay = delay
+
+    def generate(self, prompt, system=None, timeout=None):
+        time.sleep(self.delay)
+        return LLMResponse("Keep your dog on a leash and bring its food.")
+
+
+def test_answer_race():
+    print("\n" + "="*70)
+    print("🧪 TESTING ANSWER RACING")
+    print("="*70 + "\n")
+
+    metrics.reset()
+    fallback = ('knowledge', lambda: "Knowledge base answer")
+
+    start = time.perf_counter()
+    answer = race([('gemini', source("Gemini", 0.05)), ('model', source("Model", 0.01))], fallback, 1.0)
+    assert answer == ("Gemini", 'gemini') and time.perf_counter() - start < 0.5
+    print("✓ The preferred source wins when it is ready before the deadline")
+
+    completed = threading.Event()
+    start = time.perf_counter()
+    answer = race([('gemini', source("Gemini", 0.5)), ('model', source("Model", 0.01))], fallback, 0.1,
+                  on_complete=completed.set)
+    elapsed = time.perf_counter() - start
+    assert answer == ("Model", 'model') and 0.1 <= elapsed < 0.4, elapsed
+    assert not completed.is_set()
+    assert completed.wait(2)
+    time.sleep(0.05)
+    assert metrics.snapshot()['counters']['race_late_finish{source=gemini,useful=yes}'] == 1
+    print(f"✓ A hanging source loses at the deadline ({elapsed * 1000:.0f} ms) and finishes in the background")
+
+    start = time.perf_counter()
+    answer = race([('gemini', source(RuntimeError("down"))), ('model', source(None))], fallback, 1.0)
+    assert answer == ("Knowledge base answer", 'knowledge') and time.perf_counter() - start < 0.5
+    print("✓ The knowledge base answers at once when every source fails")
+
+    counters = metrics.snapshot()['counters']
+    assert counters['race_winner{source=model}'] == 1 and counters['race_slo{met=yes}'] == 3
+    assert metrics.snapshot()['gauges']['race_slo_attainment'] == 1.0
+
+    tmp = tempfile.TemporaryDirectory()
+    bot = DisasterChatbot(learned_responses_file=os.path.join(tmp.name, 'learned.json'),
+                          warm_responses_file=os.path.join(tmp.name, 'warm.json'), llm_backend=SlowGemini(0.5))
+    bot.race_slo = 0.15
+
+    question = "How do I keep my dog calm in a flood?"
+    start = time.perf_counter()
+    response = bot.chat(question)
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.4 and response.startswith("🆘"), elapsed
+    assert expensive_calls.in_flight == 1  # still held by the Gemini call
+    print(f"✓ Hanging Gemini: knowledge base answer after {elapsed * 1000:.0f} ms")
+
+    deadline = time.time() + 3
+    while expensive_calls.in_flight and time.time() < deadline:
+        time.sleep(0.02)
+    assert expensive_calls.in_flight == 0
+    assert bot.learned_store.match(question)[0] is not None
+    assert bot.chat(question).startswith("Keep your dog on a leash")
+    print("✓ The late Gemini answer is learned and the slot released")
+
+    # A knowledge base intent answer outranks the model, as it does without racing
+    bot.model_loaded = True
+    bot._model_answer = lambda message: "Model answer about evacuation routes and supplies."
+    assert expensive_calls.acquire()
+    response = bot._race_expensive_response("Where are the evacuation shelters?", 'flood', True,
+                                            "Intent answer: shelters are listed at ready.gov", False, None)
+    assert response == "Intent answer: shelters are listed at ready.gov", response
+    print("✓ With a knowledge base intent answer the model is not raced")
+
+    tmp.cleanup()
+    print("\n✓ All answer racing tests passed!")
+
+
+if __name__ == "__main__":
+    test_answer_race()
@@ -0,0 +1,105 @@
+"""
+Test the batch chat path used by /chat/batch
+Runs offline - Gemini is the local stub server, the model a recorder
+"""
+
+import os
+import tempfile
+from admission import AdmissionController
+from chat_batch import BatchItem, answer_batch, batch_rounds
+from chatbot import DisasterChatbot
+from llm_backends import StubBackend
+from llm_stub_server import start_stub_server
+from metrics import metrics
+
+
+class RecordingModel:
+    """Stands in for batched model generation and keeps the batch sizes"""
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, messages):
+        self.batches.append(list(messages))
+        return [f"Model answer for '{message}' - stay calm and follow official guidance." for message in messages]
+
+
+def test_chat_batch():
+    print("\n" + "="*70)
+    print("🧪 TESTING BATCH CHAT")
+    print("="*70 + "\n")
+
+    server, url = start_stub_server(latency_ms=20)
+    tmp = tempfile.TemporaryDirectory()
+    model = RecordingModel()
+    bots = {}
+    for session_id in ('sms-1', 'sms-2', 'sms-3'):
+        bot = DisasterChatbot(learned_responses_file=os.path.join(tmp.name, 'learned.json'),
+                              warm_responses_file=os.path.join(tmp.name, 'warm.json'),
+                              llm_backend=StubBackend(url))
+        bot.model_loaded = True
+        bot.generate_with_model_batch = model
+        bots[session_id] = bot
+
+    messages = [
+        ('sms-1', "Earthquake shaking has stopped now"),
+        ('sms-2', "Our basement is filling with flood water"),
+        ('sms-3', "How do I keep my cat calm in a hurricane?"),
+        ('sms-1', "Hello there"),
+        ('sms-3', "What about my elderly neighbor?"),
+        ('sms-2', "Flood safety tips"),
+    ]
+    items = [BatchItem(session_id, message, bots[session_id]) for session_id, message in messages]
+    assert [len(batch_round) for batch_round in batch_rounds(items)] == [3, 3]
+
+    metrics.reset()
+    answer_batch(items)
+    paths = [item.path for item in items]
+    assert paths == ['model', 'model', 'gemini', 'cheap', 'gemini', 'cheap'], paths
+    assert items[3].response.startswith("👋") and "Flood" in items[5].response
+    assert items[1].response.startswith("Model answer for 'Our basement")
+    assert "[stub " in items[2].response and "[stub " in items[4].response
+    assert model.batches == [["Earthquake shaking has stopped now", "Our basement is filling with flood water"]]
+    print(f"✓ Results in order: {paths}; model messages shared one pass")
+
+    # The follow-up kept the session's conversation (hurricane) and was not learned
+    assert bots['sms-3'].context.topic == 'hurricane' and bots['sms-3'].context.total_turns == 4
+    learned = [entry['question'] for entry in bots['sms-3'].learned_store.responses.values()]
+    assert learned == ["How do I keep my cat calm in a hurricane?"]
+    counters = metrics.snapshot()['counters']
+    assert counters['batch_answers{path=gemini}'] == 2 and counters['batch_requests'] == 1
+    print("✓ Each session's messages were answered in order with their context")
+
+    shed = [BatchItem('sms-2', "Why is the flood water brown?", bots['sms-2'], shed_reason='session_rate')]
+    answer_batch(shed)
+    assert shed[0].degraded_reason == 'session_rate' and "High demand" in shed[0].response
+    print("✓ Shed messages get knowledge base answers")
+
+    admission = AdmissionController(session_rate=0.001, session_burst=1, ip_rate=0.001, ip_burst=4)
+    assert admission.check_batch(['a', 'b', 'a'], '10.0.0.1') == [None, None, 'session_rate']
+    assert admission.check_batch(['c', 'd'], '10.0.0.1') == [None, 'ip_rate']
+    print("✓ A batch charges the gateway IP and each session per message")
+
+    import app as app_module
+    saved = app_module.MAX_BATCH_NEW_SESSIONS
+    app_module.MAX_BATCH_NEW_SESSIONS = 0
+    app_module.user_sessions['sms-1'] = bots['sms-1']
+    try:
+        response = app_module.app.test_client().post('/chat/batch', json={'messages': [
+            {'session_id': 'sms-1', 'message': "Hello there"},
+            {'session_id': 'sms-new', 'message': "Hello there"},
+        ]})
+        results = response.get_json()['results']
+        assert results[0]['success'] and results[1] == {'success': False, 'error': 'Too many new sessions in one batch'}
+        assert 'sms-new' not in app_module.user_sessions
+    finally:
+        app_module.MAX_BATCH_NEW_SESSIONS = saved
+        del app_module.user_sessions['sms-1']
+    print("✓ Messages for sessions past the per-batch limit are refused")
+
+    server.shutdown()
+    tmp.cleanup()
+    print("\n✓ All batch chat tests passed!")
+
+
+if __name__ == "__main__":
+    test_chat_batch()
@@ -0,0 +1,78 @@
+"""
+Test compact /chat responses, the static answer catalog and gzip
+Runs offline
+"""
+
+import gzip
+import json
+import os
+import tempfile
+from flask import Flask, jsonify, request
+from chatbot import DEGRADED_NOTICE, DisasterChatbot, THANK_YOU_RESPONSE
+from compact_responses import (COMPACT_MEDIA_TYPE, StaticAnswers, compact_result, encode_compact, gzip_response,
+                               join_footer, split_footer, wants_compact)
+
+
+def test_compact_responses():
+    print("\n" + "="*70)
+    print("🧪 TESTING COMPACT RESPONSES")
+    print("="*70 + "\n")
+
+    tmp = tempfile.TemporaryDirectory()
+    bot = DisasterChatbot(learned_responses_file=os.path.join(tmp.name, 'learned.json'),
+                          warm_responses_file=os.path.join(tmp.name, 'warm.json'))
+    bot.learned_store.add("Can I drink tap water after a flood?", "Boil it for one minute first.", 'flood')
+
+    learned = bot.chat("Can I drink tap water after a flood?")
+    assert split_footer(learned) == ("Boil it for one minute first.", 'KE', None)
+    gemini = "Keep pets leashed.\n\n" + "━" * 24 + "\n🤖 *Powered by Google Gemini 2.0 Flash*\n⚠️ For emergencies, call 911 first!"
+    assert split_footer(gemini) == ("Keep pets leashed.", 'AE', "Google Gemini 2.0 Flash")
+    odd = "Answer\n\n" + "━" * 24 + "\nSome other line"
+    assert split_footer(odd) == (odd, '', None)
+    for text in (learned, gemini):
+        assert join_footer(*split_footer(text)) == text
+    print("✓ Footers become short codes and expand back to the same text")
+
+    static_answers = StaticAnswers.build(bot)
+    assert len(static_answers.answers) == len(bot.knowledge) * 3 + 3
+    flood_help = bot.get_knowledge_response('flood', 'help')
+    degraded = {'success': True, 'response': flood_help + DEGRADED_NOTICE, 'degraded': True,
+                'degraded_reason': 'inflight', 'priority': 'critical'}
+    first = compact_result(degraded, static_answers)
+    assert first['x'] == flood_help and first['f'] == 'DE' and first['d'] == 'inflight' and first['p'] == 'c'
+    cached = compact_result(degraded, static_answers, client_catalog=static_answers.version)
+    assert cached == {'ok': 1, 'i': first['i'], 'f': 'DE', 'd': 'inflight', 'p': 'c'}
+    assert static_answers.catalog()['a'][cached['i']] == flood_help.strip()
+    assert 'x' not in compact_result({'success': True, 'response': THANK_YOU_RESPONSE}, static_answers,
+                                     static_answers.version)
+    verbose = len(json.dumps(dict(degraded, timestamp="2026-10-19T12:00:00.000000")).encode('utf-8'))
+    print(f"✓ Static answers go by id once the client has the catalog: {verbose} -> {len(encode_compact(cached))} bytes")
+
+    app = Flask(__name__)
+
+    @app.route('/chat', methods=['POST'])
+    def chat():
+        data = request.get_json()
+        if wants_compact(request, data):
+            return app.response_class(encode_compact(first), mimetype=COMPACT_MEDIA_TYPE)
+        return gzip_response(jsonify(degraded), request.headers.get('Accept-Encoding', ''))
+
+    client = app.test_client()
+    assert client.post('/chat', json={}, headers={'Accept': COMPACT_MEDIA_TYPE}).mimetype == COMPACT_MEDIA_TYPE
+    assert client.post('/chat', json={'format': 'compact'}).mimetype == COMPACT_MEDIA_TYPE
+    plain = client.post('/chat', json={}, headers={'Accept': '*/*'})
+    assert plain.mimetype == 'application/json' and 'Content-Encoding' not in plain.headers
+    zipped = client.post('/chat', json={}, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert zipped.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in zipped.headers['Vary']
+    assert json.loads(gzip.decompress(zipped.data)) == json.loads(plain.data)
+    for refusal in ('gzip;q=0', 'identity', 'deflate, gzip;q=0'):
+        response = client.post('/chat', json={}, headers={'Accept-Encoding': refusal})
+        assert 'Content-Encoding' not in response.headers and response.data == plain.data, refusal
+    print(f"✓ Negotiated by Accept or body; gzip {len(plain.data)} -> {len(zipped.data)} bytes (q=0 refuses it)")
+
+    tmp.cleanup()
+    print("\n✓ All compact response tests passed!")
+
+
+if __name__ == "__main__":
+    test_compact_responses()
@@ -0,0 +1,82 @@
+"""
+Test the token-budgeted conversation context and follow-up prompts
+Runs offline - Gemini is replaced by a recorder
+"""
+
+import os
+import tempfile
+from chatbot import DisasterChatbot
+from conversation_context import ConversationContext, estimate_tokens
+from llm_backends import LLMBackend, LLMResponse
+from metrics import metrics
+
+
+class RecordingGemini(LLMBackend):
+    """Stands in for Gemini and keeps the prompts it was sent"""
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, system=None, timeout=None):
+        self.prompts.append(prompt)
+        return LLMResponse(f"Answer number {len(self.prompts)}")
+
+
+def test_conversation_context():
+    print("\n" + "="*70)
+    print("🧪 TESTING CONVERSATION CONTEXT")
+    print("="*70 + "\n")
+
+    context = ConversationContext(budget=200, summary_budget=60, turn_limit=50)
+    for i in range(200):
+        context.add('user', f"Question {i} about the flood near the river bridge and our house " * 3, 'flood')
+        context.add('assistant', "Long answer " * 100 + "\n\n━━━━━━\n🤖 *Powered by Google Gemini*")
+        assert context.turn_tokens <= 200 - 60 and context.summary_tokens <= 60
+    rendered = context.render()
+    assert estimate_tokens(rendered) <= 200 + 10  # separators
+    assert "Powered by" not in rendered and rendered.startswith("Earlier the user said:")
+    assert "Question 199" in rendered and "Question 0 " not in rendered
+    assert context.topic == 'flood' and context.memory_bytes() < 4000
+    print(f"✓ 400 turns kept within {context.tokens} tokens and {context.memory_bytes()} bytes")
+
+    metrics.reset()
+    tmp = tempfile.TemporaryDirectory()
+    gemini = RecordingGemini()
+    bot = DisasterChatbot(learned_responses_file=os.path.join(tmp.name, 'learned.json'),
+                          warm_responses_file=os.path.join(tmp.name, 'warm.json'), llm_backend=gemini)
+
+    bot.chat("How do I protect my house from a flood?")
+    assert "Conversation so far" not in gemini.prompts[0]
+    bot.chat("What about my pets?")
+    follow_up = gemini.prompts[1]
+    assert "Emergency Context: Flood" in follow_up
+    assert "User: How do I protect my house from a flood?" in follow_up
+    assert "Assistant: Answer number 1" in follow_up
+    print("✓ Follow-ups are sent to Gemini with the earlier conversation")
+
+    # Only the self-contained question becomes a learned response
+    assert list(bot.learned_store.responses) == ["how do i protect my house from a flood?"]
+    print("✓ Answers that depend on the conversation are not learned")
+
+    snapshot = metrics.snapshot()
+    assert snapshot['values']['llm_prompt_tokens{caller=chat_answer}']['count'] == 1
+    assert snapshot['values']['llm_prompt_tokens{caller=chat_follow_up}']['count'] == 1
+    assert snapshot['values']['gemini_context_tokens']['count'] == 1
+    assert snapshot['latency']['chat_turn_latency{turn=follow_up}']['count'] == 1
+    print(f"✓ Prompt tokens measured: {snapshot['values']['llm_prompt_tokens{caller=chat_follow_up}']}")
+
+    # A saved answer to the same words asked outside any disaster doesn't
+    # answer a follow-up about the flood
+    bot.learned_store.add("What about my pets?", "Keep pets indoors.", 'general_disaster')
+    assert "Keep pets indoors." not in bot.chat("What about my pets?")
+    assert "Emergency Context: Flood" in gemini.prompts[-1]
+    print("✓ Follow-ups only reuse saved answers about the conversation's disaster")
+
+    bot.reset_conversation()
+    assert not bot.context.render() and bot.context.topic is None
+    assert "Keep pets indoors." in bot.chat("What about my pets?")
+    tmp.cleanup()
+    print("\n✓ All conversation context tests passed!")
+
+
+if __name__ == "__main__":
+    test_conversation_context()
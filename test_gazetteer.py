@@ -0,0 +1,85 @@
+"""
+Test location canonicalization with the local gazetteer
+Runs offline - the weather API and Gemini are replaced by fakes
+"""
+
+import os
+import tempfile
+from gazetteer import Gazetteer, normalize
+from llm_backends import LLMBackend, LLMResponse
+from weather_service import WeatherAlertService
+
+
+class QuietGemini(LLMBackend):
+    name = 'gemini'
+
+    def generate(self, prompt, system=None, timeout=None):
+        return LLMResponse("🧥 Dress for the weather.")
+
+
+def test_gazetteer():
+    print("\n" + "="*70)
+    print("🧪 TESTING LOCATION CANONICALIZATION")
+    print("="*70 + "\n")
+
+    assert normalize("  São Paulo ") == "sao paulo" and normalize("St. Louis, MO") == "st louis mo"
+
+    gazetteer = Gazetteer.load()
+    assert gazetteer.load_ms < 200, gazetteer.load_ms
+    for location in ("NYC", "new york", "New York, NY", "new york city", "New York, New York, USA"):
+        assert gazetteer.resolve(location).id == 'us-ny-new-york', location
+    print(f"✓ Spellings of one place resolve to it ({gazetteer.load_ms:.1f} ms to load)")
+
+    assert gazetteer.resolve("Portland").id == 'us-or-portland'
+    assert gazetteer.resolve("Portland, ME").id == 'us-me-portland'
+    assert gazetteer.resolve("portland maine").id == 'us-me-portland'
+    assert gazetteer.resolve("Springfield MO").id == 'us-mo-springfield'
+    assert gazetteer.resolve("Paris, France").id == 'fr-idf-paris'
+    print("✓ Qualifiers pick between places with the same name")
+
+    assert gazetteer.resolve("Philadelpia").id == 'us-pa-philadelphia'
+    assert gazetteer.resolve("Sacremento, CA").id == 'us-ca-sacramento'
+    assert gazetteer.resolve("Miami Beach") is None and gazetteer.resolve("Paris, TX") is None
+    assert gazetteer.resolve("Lyon") is None
+    # Other towns close to a known name, and typos of short names, are not guessed
+    for location in ("Orland", "Dalles", "Jacksonville Beach", "Chicgo"):
+        assert gazetteer.resolve(location) is None, location
+    stats = gazetteer.stats()
+    assert stats['lookups']['fuzzy'] == 2 and stats['lookups']['miss'] == 7
+    assert stats['hit_rate'] == round(1 - 7 / sum(stats['lookups'].values()), 4)
+    print(f"✓ Single typos in long names match; other towns and unknown places miss (hit rate {stats['hit_rate']:.0%})")
+
+    queries = []
+
+    def fake_api(query):
+        queries.append(query)
+        return {'success': True, 'location': 'New York' if query[0].isdigit() else query, 'country': 'US',
+                'temperature': 50, 'feels_like': 48, 'condition': 'Cloudy', 'description': 'overcast clouds',
+                'humidity': 60, 'wind_speed': 5, 'timestamp': '2026-10-19T12:00:00', 'is_mock': False}
+
+    service = WeatherAlertService(llm_backend=QuietGemini(), gazetteer=gazetteer)
+    service._fetch_weather = fake_api
+    for location in ("NYC", "new york", "New York, NY", "new york city", "Lyon", "lyon "):
+        assert service.get_weather(location)['success']
+    assert queries == ["40.71,-74.01", "Lyon"], queries
+    assert service.location_key("Big Apple") == service.location_key("NYC") == 'us-ny-new-york'
+    print("✓ One upstream call and cache entry per place; unresolved names go upstream as typed")
+
+    service._fetch_weather = lambda query: dict(service._get_mock_weather(query), country='??')
+    assert service.get_weather("Sacremento", refresh=True)['location'] == 'Sacramento'
+    print("✓ Mock weather is named after the canonical place")
+
+    tmp = tempfile.TemporaryDirectory()
+    broken = os.path.join(tmp.name, 'gazetteer.json')
+    with open(broken, 'w') as f:
+        f.write("{not json")
+    empty = Gazetteer.load(broken)
+    assert empty.resolve("NYC") is None and empty.stats()['places'] == 0
+    tmp.cleanup()
+    print("✓ An unreadable gazetteer leaves locations as typed")
+
+    print("\n✓ All location canonicalization tests passed!")
+
+
+if __name__ == "__main__":
+    test_gazetteer()
@@ -0,0 +1,127 @@
+"""
+Test the LLM backend interface against the local stub server
+Runs offline - no Gemini key or model download needed
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from chatbot import DisasterChatbot
+import llm_backends
+from llm_backends import LLMBackendError, StubBackend, create_backend, evict_shared_models
+from llm_stub_server import start_stub_server, stub_answer
+from llm_usage import usage
+from weather_service import WeatherAlertService
+
+
+def test_llm_backends():
+    print("\n" + "="*70)
+    print("🧪 TESTING LLM BACKENDS")
+    print("="*70 + "\n")
+
+    server, url = start_stub_server()
+    backend = StubBackend(url)
+    first = backend.generate("What should I do in a flood?", system="Be brief.")
+    second = backend.generate("What should I do in a flood?", system="Be brief.")
+    assert first.text == second.text == stub_answer("What should I do in a flood?", "Be brief.")
+    assert backend.generate("What should I do in a fire?").text != first.text
+    assert first.prompt_tokens > 0 and first.response_tokens > 0
+    print(f"✓ Deterministic answers: {first.text[:50]}...")
+
+    chunks = list(backend.stream("What should I do in a flood?", system="Be brief."))
+    assert len(chunks) > 1 and "".join(chunks) == first.text
+    assert asyncio.run(backend.agenerate("What should I do in a flood?", system="Be brief.")).text == first.text
+    print(f"✓ Streaming ({len(chunks)} chunks) and async give the same answer")
+    server.shutdown()
+
+    server, url = start_stub_server(latency='normal', latency_ms=50, jitter_ms=10, seed=1)
+    start = time.perf_counter()
+    StubBackend(url).generate("Slow question")
+    assert time.perf_counter() - start >= 0.02
+    server.shutdown()
+
+    server, url = start_stub_server(rate=1, burst=2)
+    backend = StubBackend(url)
+    results = []
+    for _ in range(4):
+        try:
+            backend.generate("Busy question")
+            results.append('ok')
+        except LLMBackendError as e:
+            results.append('429' if '429' in str(e) else str(e))
+    assert results == ['ok', 'ok', '429', '429'], results
+    server.shutdown()
+
+    server, url = start_stub_server(failure_rate=1.0)
+    try:
+        StubBackend(url).generate("Doomed question")
+        assert False, "failure not injected"
+    except LLMBackendError as e:
+        assert '500' in str(e)
+    server.shutdown()
+    print("✓ Latency, throughput cap (429) and failures (500) are configurable")
+
+    os.environ['LIFELINK_LLM_BACKEND'] = 'stub'
+    server, os.environ['LIFELINK_LLM_STUB_URL'] = start_stub_server()
+    try:
+        assert isinstance(create_backend(), StubBackend)
+        usage.reset()
+        tmp = tempfile.TemporaryDirectory()
+        bot = DisasterChatbot(learned_responses_file=os.path.join(tmp.name, 'learned.json'),
+                              warm_responses_file=os.path.join(tmp.name, 'warm.json'))
+        bot.model_loaded = False
+        response = bot.chat("How do I keep my dog calm in a flood?")
+        assert "[stub " in response and "Powered by LifeLink stub LLM" in response, response
+
+        service = WeatherAlertService()
+        recommendation = service.get_weather_recommendation({
+            'success': True, 'condition': 'Rainy', 'description': 'light rain', 'temperature': 60,
+            'feels_like': 58, 'humidity': 80, 'wind_speed': 5, 'location': 'Boston'})
+        assert recommendation.startswith("[stub ")
+        backends = {row['backend'] for row in usage.report()['call_sites']}
+        assert backends == {'stub'}
+        print("✓ Chatbot and weather service select the stub through configuration")
+        tmp.cleanup()
+    finally:
+        del os.environ['LIFELINK_LLM_BACKEND'], os.environ['LIFELINK_LLM_STUB_URL']
+        server.shutdown()
+
+    cache = {'./disaster_chatbot_model': 'base', './disaster_chatbot_model/versions/v1': 'v1',
+             './disaster_chatbot_model/versions/v2': 'v2', './disaster_chatbot_draft_model': 'draft'}
+    saved = dict(llm_backends._MODEL_CACHE), set(llm_backends._PINNED_MODELS)
+    llm_backends._MODEL_CACHE.clear()
+    llm_backends._MODEL_CACHE.update(cache)
+    llm_backends._PINNED_MODELS.add('./disaster_chatbot_draft_model')
+    try:
+        evict_shared_models(keep='./disaster_chatbot_model/versions/v2')
+        assert set(llm_backends._MODEL_CACHE) == {'./disaster_chatbot_model/versions/v2',
+                                                  './disaster_chatbot_draft_model'}
+    finally:
+        llm_backends._MODEL_CACHE.clear()
+        llm_backends._MODEL_CACHE.update(saved[0])
+        llm_backends._PINNED_MODELS.clear()
+        llm_backends._PINNED_MODELS.update(saved[1])
+    print("✓ A version switch evicts the base model and older versions, not pinned ones")
+
+    if llm_backends.TORCH_AVAILABLE:
+        class WordTokenizer:
+            """One token per word, then </s>"""
+            def __call__(self, text, return_tensors=None):
+                ids = [len(word) for word in text.split()] + [1]
+                return {'input_ids': llm_backends.torch.tensor([ids]),
+                        'attention_mask': llm_backends.torch.ones(1, len(ids), dtype=llm_backends.torch.long)}
+
+        t5 = object.__new__(llm_backends.T5Backend)
+        t5.tokenizer, t5.device = WordTokenizer(), llm_backends.torch.device('cpu')
+        inputs = t5._inputs("Earlier: " + "flood " * 1000 + "Question: pets? Response:", "Be brief.")
+        ids = inputs['input_ids'][0].tolist()
+        assert len(ids) == inputs['attention_mask'].shape[1] == llm_backends.T5_MAX_INPUT_TOKENS
+        assert ids[-4:] == [len("Question:"), len("pets?"), len("Response:"), 1]
+        print("✓ Long T5 prompts keep their end (the question and Response: cue)")
+
+    print("\n✓ All LLM backend tests passed!")
+
+
+if __name__ == "__main__":
+    test_llm_backends()
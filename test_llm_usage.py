@@ -0,0 +1,92 @@
+"""
+Test prompt templates and Gemini token/cost accounting
+Runs offline - Gemini is replaced by fakes
+"""
+
+from flask import Flask
+from llm_backends import GeminiBackend, LLMBackend, LLMResponse
+from llm_usage import UsageLedger, call_llm, usage
+from prompt_templates import CHAT_PROMPT, WEATHER_PROMPT, PromptTemplate
+from weather_service import WeatherAlertService
+
+
+class FakeGemini(LLMBackend):
+    """Priced like Gemini; returns canned text and optional token counts"""
+    name = 'gemini'
+    prompt_price = GeminiBackend.prompt_price
+    response_price = GeminiBackend.response_price
+    cached_price = GeminiBackend.cached_price
+
+    def __init__(self, text="Stay safe.", tokens=None, error=None):
+        self.text = text
+        self.tokens = tokens or (None, None, 0)
+        self.error = error
+        self.prompts = []
+
+    def generate(self, prompt, system=None, timeout=None):
+        self.prompts.append((system, prompt))
+        if self.error:
+            raise self.error
+        return LLMResponse(self.text, *self.tokens)
+
+
+def test_llm_usage():
+    print("\n" + "="*70)
+    print("🧪 TESTING LLM USAGE ACCOUNTING")
+    print("="*70 + "\n")
+
+    template = PromptTemplate('demo', "Be brief.", "Q: {question} ({kind})")
+    assert template.render(question="Flood?", kind='x') == "Q: Flood? (x)"
+    assert template.full_prompt(question="Flood?", kind='x') == "Be brief.\n\nQ: Flood? (x)"
+    try:
+        template.render(question="Flood?")
+        assert False, "missing field accepted"
+    except KeyError:
+        pass
+    prompt = CHAT_PROMPT.render(disaster_name='Flood', conversation='', question="Is tap water safe?")
+    assert prompt.startswith("Emergency Context: Flood") and "expert" not in prompt
+    print("✓ Templates render only the per-call part; instructions are static")
+
+    usage.reset()
+    gemini = FakeGemini(tokens=(1200, 300, 1000))
+    call_llm(gemini, CHAT_PROMPT, prompt, caller='chat_answer')
+    assert gemini.prompts == [(CHAT_PROMPT.instructions, prompt)]
+    call_llm(FakeGemini(), WEATHER_PROMPT, "Current Weather: rain")  # no token counts - estimated
+    try:
+        call_llm(FakeGemini(error=TimeoutError("slow")), WEATHER_PROMPT, "Current Weather: rain")
+    except TimeoutError:
+        pass
+
+    report = usage.report()
+    chat, weather = report['call_sites']
+    assert (chat['caller'], chat['route'], chat['backend']) == ('chat_answer', 'background', 'gemini')
+    assert (chat['prompt_tokens'], chat['response_tokens'], chat['cached_tokens']) == (1200, 300, 1000)
+    assert chat['cost_usd'] == round(gemini.cost(1200, 300, 1000), 6) > 0
+    assert weather['calls'] == 2 and weather['errors'] == 1 and weather['prompt_tokens'] > 0
+    assert report['totals']['calls'] == 3
+    print(f"✓ Tokens, cached tokens, errors and cost per call site: {report['totals']}")
+
+    app = Flask(__name__)
+    app.add_url_rule('/weather', 'weather', lambda: '')
+    service = WeatherAlertService(llm_backend=FakeGemini("☂️ Take an umbrella."))
+    weather_data = {'success': True, 'condition': 'Rainy', 'description': 'light rain', 'temperature': 60,
+                    'feels_like': 58, 'humidity': 80, 'wind_speed': 5, 'location': 'Boston'}
+    usage.reset()
+    with app.test_request_context('/weather'):
+        assert service.get_weather_recommendation(weather_data) == "☂️ Take an umbrella."
+    assert "Condition: rainy" in service.llm.prompts[0][1] and "Boston" not in service.llm.prompts[0][1]
+    [row] = usage.report()['call_sites']
+    assert (row['caller'], row['route']) == ('weather_recommendation', 'weather')
+    print("✓ Calls are attributed to the route that made them")
+
+    ledger = UsageLedger()
+    ledger.record('cheap', 'a', 'gemini', 10, 10, 0, 0.0001, 0.1)
+    ledger.record('costly', 'b', 'stub', 10000, 2000, 0, 0.0018, 2.0)
+    assert [row['caller'] for row in ledger.report()['call_sites']] == ['costly', 'cheap']
+    print("✓ Costliest call sites are listed first")
+
+    print("\n✓ All LLM usage tests passed!")
+
+
+if __name__ == "__main__":
+    test_llm_usage()
@@ -0,0 +1,66 @@
+"""
+Test near-duplicate collapsing in the learned responses store
+Runs offline against a temporary store file
+"""
+
+import os
+import tempfile
+from learned_store import LearnedResponseStore
+from near_duplicates import tokenize
+
+
+def test_near_duplicates():
+    print("\n" + "="*70)
+    print("🧪 TESTING NEAR-DUPLICATE LEARNED RESPONSES")
+    print("="*70 + "\n")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LearnedResponseStore(os.path.join(tmp, 'learned.json'))
+        
+        key, merged = store.add("What to do in a flood?", "Move to higher ground.", 'flood')
+        assert not merged
+        
+        # Rephrasings collapse into the first entry
+        for question in ["what to do in a flood", "what do I do in a flood??"]:
+            canonical, merged = store.add(question, "Another Gemini answer.", 'flood')
+            assert merged and canonical == key, question
+            print(f"✓ Merged: {question}")
+        
+        # Same shape, different disaster - must stay separate
+        _, merged = store.add("What to do in a fire?", "Get out, stay out.", 'fire')
+        assert not merged
+        _, merged = store.add("What to do after a 9.5 magnitude earthquake?", "Expect aftershocks.", 'earthquake')
+        assert not merged
+        _, merged = store.add("What to do after a 7.0 magnitude earthquake?", "Drop, cover, hold on.", 'earthquake')
+        assert not merged
+        print("✓ Different questions kept separate")
+        
+        assert len(store) == 4
+        assert store.responses[key]['aliases'] == ["what to do in a flood", "what do I do in a flood??"]
+        
+        entry, score = store.find_similar("What do I do in a FLOOD?!")
+        assert entry['answer'] == "Move to higher ground." and score >= 0.8
+        print(f"✓ Lookup found canonical entry (similarity {score:.0%})")
+        
+        # Reloading keeps aliases searchable
+        reloaded = LearnedResponseStore(store.path)
+        assert reloaded.match("what do i do in a flood??")[0] == key
+        
+        # Batch pass over a store written before near-duplicate detection
+        reloaded.responses["flood what to do"] = {
+            'question': "Flood - what to do?", 'answer': "Old duplicate.",
+            'disaster_type': 'flood', 'timestamp': '2099-01-01T00:00:00', 'usage_count': 3
+        }
+        reloaded.save()
+        legacy = LearnedResponseStore(store.path)
+        result = legacy.dedupe()
+        assert result == {'before': 5, 'after': 4, 'merged': 1}
+        assert legacy.responses[key]['usage_count'] == 5
+        print(f"✓ Batch dedupe: {result}")
+    
+    assert tokenize("What should I do in a flood??") == {'flood'}
+    print("\n✓ All near-duplicate tests passed!")
+
+
+if __name__ == "__main__":
+    test_near_duplicates()
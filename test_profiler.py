@@ -0,0 +1,105 @@
+"""
+Test the sampling profiler and /admin/profile
+Runs offline - Gemini is replaced by a slow fake
+"""
+
+import contextvars
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from chatbot import DisasterChatbot
+from llm_backends import LLMBackend, LLMResponse
+from profiler import SamplingProfiler, folded, profiler
+
+
+class SlowGemini(LLMBackend):
+    name = 'gemini'
+
+    def generate(self, prompt, system=None, timeout=None):
+        time.sleep(0.15)
+        return LLMResponse("Move to higher ground and keep your pets leashed and close to you.")
+
+
+def hot_spot(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def offloaded_work():
+    time.sleep(0.1)
+
+
+def fake_request(profiler, route, path, executor=None):
+    profiler.start_request(route)
+    profiler.set_path(path)
+    hot_spot(0.1)
+    if executor:
+        executor.submit(contextvars.copy_context().run, profiler.traced(offloaded_work)).result()
+    profiler.end_request()
+
+
+def test_profiler():
+    print("\n" + "="*70)
+    print("🧪 TESTING SAMPLING PROFILER")
+    print("="*70 + "\n")
+
+    sampling = SamplingProfiler(sample_rate=1.0, interval=0.002)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        worker = threading.Thread(target=fake_request, args=(sampling, 'chat', 'gemini', executor))
+        worker.start()
+        worker.join()
+    profile = sampling.snapshot()
+    stacks = folded(profile).splitlines()
+    assert all(line.startswith("chat;gemini;") for line in stacks), stacks
+    hot = sum(count for stack, count in profile.items() if stack.endswith("test_profiler.hot_spot"))
+    offloaded = sum(count for stack, count in profile.items() if "test_profiler.offloaded_work" in stack)
+    assert hot >= 10 and offloaded >= 10, (hot, offloaded)
+    assert stacks[0].rsplit(' ', 1)[1].isdigit()
+    print(f"✓ Samples are folded under route and path, including executor work ({hot} + {offloaded} samples)")
+
+    idle = SamplingProfiler(sample_rate=0, interval=0.002)
+    fake_request(idle, 'chat', 'cheap')
+    assert not idle.threads and not idle.snapshot()
+    captured = {}
+    capture = threading.Thread(target=lambda: captured.update(idle.capture(0.3)))
+    capture.start()
+    time.sleep(0.05)
+    fake_request(idle, 'weather', 'other')
+    capture.join()
+    assert captured and all(stack.startswith("weather;other;") for stack in captured)
+    assert not idle.snapshot() and not idle.captures
+    print("✓ Off by default; a capture traces every request while it runs")
+
+    import app as app_module
+    tmp = tempfile.TemporaryDirectory()
+    bot = DisasterChatbot(learned_responses_file=os.path.join(tmp.name, 'learned.json'),
+                          warm_responses_file=os.path.join(tmp.name, 'warm.json'), llm_backend=SlowGemini())
+    bot.model_loaded = False
+    app_module.user_sessions['profiled'] = bot
+    client = app_module.app.test_client()
+    profiler.sample_rate, profiler.interval = 1.0, 0.002
+    try:
+        client.get('/admin/profile?seconds=0&reset=1')
+        client.post('/chat', json={'message': "How do I keep my dog calm in a flood?", 'session_id': 'profiled'})
+        client.post('/chat', json={'message': "Flood safety tips", 'session_id': 'profiled'})
+        response = client.get('/admin/profile?seconds=0')
+    finally:
+        profiler.sample_rate = 0
+    text = response.data.decode('utf-8')
+    assert response.mimetype == 'text/plain' and '.folded' in response.headers['Content-Disposition']
+    assert int(response.headers['X-Profile-Samples']) > 0
+    gemini = [line for line in text.splitlines() if line.startswith("chat;gemini;")]
+    assert any("chatbot.DisasterChatbot.generate_response" in line and "chatbot.DisasterChatbot.ask_gemini" in line
+               for line in gemini), text[:2000]
+    assert client.get('/admin/profile?seconds=30').status_code == 400  # past gunicorn's worker timeout
+    tmp.cleanup()
+    print(f"✓ /admin/profile returns folded stacks ({len(text.splitlines())} distinct) with ask_gemini visible")
+
+    print("\n✓ All profiler tests passed!")
+
+
+if __name__ == "__main__":
+    test_profiler()
@@ -0,0 +1,102 @@
+"""
+Test hashed static asset URLs, precompressed variants, cache headers
+and image format negotiation
+Runs offline against a temporary build directory
+"""
+
+import gzip
+import os
+import tempfile
+import image_derivatives
+from static_assets import (AssetRegistry, IMMUTABLE_CACHE, REVALIDATE_CACHE, BROTLI_AVAILABLE,
+                           build_assets, discover_sources)
+
+
+def test_static_assets():
+    print("\n" + "="*70)
+    print("🧪 TESTING STATIC ASSETS")
+    print("="*70 + "\n")
+
+    import app as app_module
+    client = app_module.app.test_client()
+    saved = app_module.assets
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        manifest = build_assets({'widget.js': discover_sources()['widget.js']}, tmp.name)
+        registry = app_module.assets = AssetRegistry(build_dir=tmp.name)
+        entry = manifest['assets']['widget.js']
+        url = registry.url('widget.js')
+        assert url == f"/assets/{entry['hash']}/widget.js"
+        with open(discover_sources()['widget.js'], 'rb') as f:
+            source = f.read()
+
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate, br'})
+        expected = 'br' if BROTLI_AVAILABLE else 'gzip'
+        assert response.headers['Content-Encoding'] == expected
+        assert response.headers['Cache-Control'] == IMMUTABLE_CACHE
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.headers['ETag'] == f'"{entry["hash"]}-{expected}"'
+        assert len(response.data) == entry['encodings'][expected]['bytes'] < len(source)
+
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip' and gzip.decompress(response.data) == source
+        response = client.get(url, headers={'Accept-Encoding': 'br;q=0, gzip;q=0'})
+        assert 'Content-Encoding' not in response.headers and response.data == source
+        response = client.get(url)
+        assert 'Content-Encoding' not in response.headers and response.data == source
+        assert response.headers['ETag'] == f'"{entry["hash"]}"'
+        print(f"✓ {expected} or gzip when accepted, identity otherwise (q=0 refuses an encoding)")
+
+        etag = client.get(url, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        response = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert response.status_code == 304 and not response.data
+        assert response.headers['Cache-Control'] == IMMUTABLE_CACHE
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200  # a different representation
+        assert client.get(f"/assets/{'0' * 12}/widget.js").status_code == 404
+        response = client.get('/widget.js')
+        assert response.headers['Cache-Control'] == REVALIDATE_CACHE and response.data == source
+        print("✓ Strong ETags per encoding revalidate with 304; stale hashes 404; /widget.js revalidates")
+    finally:
+        app_module.assets = saved
+        tmp.cleanup()
+
+    html = client.get('/configurator').data.decode('utf-8')
+    hashed = saved.url('widget.js')
+    assert hashed in html
+    response = client.get(hashed)
+    assert response.status_code == 200 and response.headers['Cache-Control'] == IMMUTABLE_CACHE
+    print(f"✓ The configurator preview loads the widget from its hashed URL ({hashed})")
+
+    if image_derivatives.PIL_AVAILABLE:
+        formats = [fmt[0] for fmt in image_derivatives.supported_formats()]
+        tmp = tempfile.TemporaryDirectory()
+        try:
+            build_assets({'images/Rainy.jpg': discover_sources()['images/Rainy.jpg']}, tmp.name)
+            app_module.assets = AssetRegistry(build_dir=tmp.name)
+
+            def negotiate(accept, width=400):
+                response = client.get(f'/images/Rainy.jpg?w={width}', headers={'Accept': accept})
+                assert response.status_code == 200
+                assert set(response.vary) == {'Accept', 'Accept-Encoding'}, response.headers['Vary']
+                return response.mimetype, response
+
+            browser = 'image/avif,image/webp,image/apng,*/*;q=0.8'
+            expected = 'image/avif' if 'avif' in formats else 'image/webp'
+            assert negotiate(browser)[0] == expected
+            assert negotiate('image/webp,*/*')[0] == 'image/webp'
+            assert negotiate('*/*')[0] == 'image/jpeg'
+            assert negotiate('image/avif;q=0, image/webp;q=0, image/*')[0] == 'image/jpeg'
+            small, large = negotiate(browser, 400)[1], negotiate(browser, 1200)[1]
+            assert len(small.data) < len(large.data)
+            print(f"✓ Images negotiate {expected.split('/')[1].upper()}, WebP or JPEG from Accept (q=0 refuses), "
+                  f"{len(small.data) / 1024:.0f} KB at 400w")
+        finally:
+            app_module.assets = saved
+            tmp.cleanup()
+
+    print("\n✓ All static asset tests passed!")
+
+
+if __name__ == "__main__":
+    test_static_assets()
@@ -0,0 +1,83 @@
+"""
+Test exporting learned responses as training shards and reading them back,
+and picking the responses an incremental training run collects
+Runs offline against a temporary store file
+"""
+
+import os
+import random
+import tempfile
+from learned_store import iter_learned_responses, write_learned_responses
+from manage_learned_responses import LearnedResponsesManager, iter_training_records, main as manage_main
+from training_shards import MANIFEST_FILE, iter_training_shards, load_manifest
+
+
+def shard_files(output_dir):
+    return sorted(os.path.relpath(os.path.join(root, name), output_dir).replace(os.sep, '/')
+                  for root, _, names in os.walk(output_dir) for name in names if name != MANIFEST_FILE)
+
+
+def test_training_shards():
+    print("\n" + "="*70)
+    print("🧪 TESTING TRAINING DATA SHARDS")
+    print("="*70 + "\n")
+
+    rng = random.Random(3)
+    types = ['flood', 'wildfire', 'earthquake']
+    entries = [(f"question {i}", {
+        'question': f"How do I stay safe, case {i}?",
+        'answer': f"Answer {i}: move to safety ✓",
+        'disaster_type': rng.choice(types),
+        'timestamp': f"2025-0{1 + i % 9}-01T00:00:00",
+        'usage_count': i % 4
+    }) for i in range(250)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'learned.json')
+        output_dir = os.path.join(tmp, 'shards')
+        write_learned_responses(path, entries)
+        expected = list(iter_training_records(path))
+
+        for compression in ['gzip', 'none']:
+            manage_main(['--file', path, 'export', '--output-dir', output_dir,
+                         '--shard-size', '40', '--compression', compression])
+            manifest = load_manifest(output_dir)
+            records = list(iter_training_shards(output_dir, verify=True))
+            key = lambda record: record['input']
+            assert sorted(records, key=key) == sorted(expected, key=key)
+            assert manifest['total_records'] == len(expected)
+            assert shard_files(output_dir) == sorted(shard['path'] for shard in manifest['shards'])
+            assert all(shard['records'] <= 40 for shard in manifest['shards'])
+        print(f"✓ {len(expected)} records round-trip through gzip and plain shards with verified checksums")
+
+        flood = list(iter_training_shards(output_dir, partitions=['flood']))
+        assert flood and all(record['disaster_type'] == 'flood' for record in flood)
+        assert len(flood) == sum(1 for _, data in iter_learned_responses(path) if data['disaster_type'] == 'flood')
+        print(f"✓ Partitions read back on their own ({len(flood)} flood records)")
+
+        # A smaller re-export replaces the earlier shards instead of leaving them behind
+        manage_main(['--file', path, 'export', '--output-dir', output_dir, '--type', 'wildfire', '--no-partition'])
+        manifest = load_manifest(output_dir)
+        assert shard_files(output_dir) == [shard['path'] for shard in manifest['shards']] == ['part-00000.jsonl.gz']
+        assert sorted(os.listdir(output_dir)) == [MANIFEST_FILE, 'part-00000.jsonl.gz']
+        records = list(iter_training_shards(output_dir, verify=True))
+        assert records and all(record['disaster_type'] == 'wildfire' for record in records)
+        print("✓ Re-exporting removes the previous export's shards and empty partitions")
+
+        dated = lambda name, timestamp: (name, {'question': f"{name}?", 'answer': f"{name}.",
+                                                'disaster_type': 'flood', 'timestamp': timestamp})
+        write_learned_responses(path, [dated('old', "2025-01-01T00:00:00"), dated('new', "2025-06-01T00:00:00"),
+                                       dated('null', None), dated('garbled', "last tuesday"),
+                                       ('missing', {'question': "missing?", 'answer': "missing."})])
+        manager = LearnedResponsesManager(path)
+        selected = lambda since: sorted(sample['output'] for sample in manager.iter_training_samples(since=since))
+        assert selected(None) == ['garbled.', 'missing.', 'new.', 'null.', 'old.']
+        assert selected("2025-03-01T00:00:00") == ['new.']
+        assert selected("2025-06-01T00:00:00") == []
+        print("✓ Incremental runs collect responses after the watermark; undated ones only on the first run")
+
+    print("\n✓ All training shard tests passed!")
+
+
+if __name__ == "__main__":
+    test_training_shards()
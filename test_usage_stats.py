@@ -0,0 +1,107 @@
+"""
+Test the running usage statistics of the learned responses store
+Runs offline against a temporary store file
+"""
+
+import os
+import random
+import tempfile
+from learned_store import LearnedResponseStore
+from manage_learned_responses import main as manage_main
+from usage_stats import UsageStats
+
+
+def full_recount(responses, top):
+    """The statistics show_statistics used to compute from scratch"""
+    stats = UsageStats.from_entries(responses.items(), top_k=len(responses) or 1)
+    return stats.snapshot(top)
+
+
+def same_stats(a, b):
+    # Ties in usage may be ordered differently, so compare top-K by usage
+    return (
+        {k: a[k] for k in ('total', 'total_usage', 'by_type', 'usage_by_type')} ==
+        {k: b[k] for k in ('total', 'total_usage', 'by_type', 'usage_by_type')} and
+        [item['usage_count'] for item in a['top']] == [item['usage_count'] for item in b['top']]
+    )
+
+
+def test_usage_stats():
+    print("\n" + "="*70)
+    print("🧪 TESTING INCREMENTAL USAGE STATISTICS")
+    print("="*70 + "\n")
+
+    rng = random.Random(7)
+    types = ['flood', 'fire', 'earthquake', 'hurricane']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'learned.json')
+        store = LearnedResponseStore(path)
+        store.stats.top_k = 5
+
+        questions = []
+        for i in range(60):
+            question = f"question {i} about supply number {i * 7919 % 1000}"
+            store.add(question, f"answer {i}", rng.choice(types))
+            questions.append(question)
+        for _ in range(400):
+            store.find_similar(rng.choice(questions[:20]) if rng.random() < 0.7 else rng.choice(questions))
+        for key in rng.sample(sorted(store.responses), 10):
+            store.delete(key)
+
+        assert same_stats(store.usage_stats(5), full_recount(store.responses, 5))
+        print(f"✓ Running totals match a full recount after adds, reuses and deletes")
+
+        # Restart: the store rebuilds its aggregates, the sidecar matches the file
+        reloaded = LearnedResponseStore(path)
+        assert same_stats(reloaded.usage_stats(5), full_recount(reloaded.responses, 5))
+        sidecar = UsageStats.load(path)
+        assert sidecar is not None and same_stats(sidecar.snapshot(5), reloaded.usage_stats(5))
+        print("✓ Consistent after restart (sidecar is current)")
+
+        # Compaction: dedupe merges counts into canonical entries
+        reloaded.responses["question 3 about supply number"] = dict(
+            reloaded.responses[next(iter(reloaded.responses))], usage_count=50,
+            question="question 3 about supply number", timestamp='2099-01-01T00:00:00'
+        )
+        reloaded.save()
+        compacted = LearnedResponseStore(path)
+        compacted.dedupe()
+        assert same_stats(compacted.usage_stats(5), full_recount(compacted.responses, 5))
+        print("✓ Consistent after dedupe")
+
+        # CLI rewrites refresh the sidecar; other writers make it stale
+        manage_main(['--file', path, 'prune', '--max-usage', '1'])
+        after_prune = LearnedResponseStore(path)
+        assert same_stats(UsageStats.load(path).snapshot(5), full_recount(after_prune.responses, 5))
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('\n')
+        assert UsageStats.load(path) is None
+        print("✓ Sidecar refreshed by prune, ignored when the store changes behind it")
+
+        # A running server's next save keeps what the CLI deleted deleted
+        server = LearnedResponseStore(path)
+        server.add("where is the nearest shelter", "Check the county shelter map.", 'flood')
+        doomed = next(key for key in server.responses if key != "where is the nearest shelter")
+        manage_main(['--file', path, 'delete', doomed])
+        assert server.find_similar("where is the nearest shelter")[0] is not None
+        server.add("how do i purify water", "Boil it for one minute.", 'flood')
+        on_disk = LearnedResponseStore(path).responses
+        assert doomed not in on_disk and doomed not in server.responses
+        assert {"where is the nearest shelter", "how do i purify water"} <= set(on_disk)
+        print("✓ CLI deletes survive the running server's next save")
+
+    # Without a token, only direct local requests reach the admin endpoints
+    import app as app_module
+    client = app_module.app.test_client()
+    assert client.get('/admin/learned-stats').status_code == 200
+    for headers in [{'X-Forwarded-For': '203.0.113.9'}, {'X-Real-IP': '203.0.113.9'}]:
+        assert client.get('/admin/learned-stats', headers=headers).status_code == 403
+    assert client.get('/admin/learned-stats', environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 403
+    print("✓ Admin stats refused through a proxy or from elsewhere without a token")
+
+    print("\n✓ All usage statistics tests passed!")
+
+
+if __name__ == "__main__":
+    test_usage_stats()
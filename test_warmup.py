@@ -0,0 +1,92 @@
+"""
+Test the startup warm-up of common question answers
+Runs offline - answer generation is replaced by a canned generator
+"""
+
+import os
+import tempfile
+import time
+from admission import PriorityGate
+from chatbot import DisasterChatbot
+from learned_store import LearnedResponseStore
+from metrics import metrics
+from warmup import QUESTION_TEMPLATES, Warmup, warmup_questions
+
+
+def test_warmup():
+    print("\n" + "="*70)
+    print("🧪 TESTING STARTUP WARM-UP")
+    print("="*70 + "\n")
+
+    tmp = tempfile.TemporaryDirectory()
+    bot = DisasterChatbot(learned_responses_file=os.path.join(tmp.name, 'learned.json'),
+                          warm_responses_file=os.path.join(tmp.name, 'warm.json'))
+    bot.learned_store.add("How do I purify water after a flood?", "Boil it for a minute.", 'flood')
+
+    generated = []
+
+    def fake_generate(question, disaster_type, use_gemini, knowledge_response, learn=True, context=None):
+        assert not learn
+        generated.append(question)
+        return f"Pre-generated answer for: {question}"
+
+    bot._generate_expensive_response = fake_generate
+    bot.model_loaded = True
+
+    questions = warmup_questions(bot.knowledge, bot.learned_store, top_n=5)
+    assert len(questions) == len(bot.knowledge) * len(QUESTION_TEMPLATES) + 1
+    assert ("What should I do during a winter storm?", 'winter_storm', 'template') in questions
+    assert questions[-1] == ("How do I purify water after a flood?", 'flood', 'history')
+    print(f"✓ {len(questions)} questions: templates for every disaster type plus history")
+
+    # Live traffic holds every slot - the warm-up waits instead of queueing
+    gate = PriorityGate(1)
+    warmup = Warmup(bot, top_n=5, interval=0, gate=gate)
+    with gate.slot():
+        warmup.start()
+        time.sleep(0.3)
+        assert not generated and gate.queued == 0
+    warmup.thread.join(timeout=10)
+    assert warmup.state == 'done'
+    report = warmup.report()
+    assert report['counts']['generated'] == len(questions) - 1
+    assert report['counts']['learned'] == 1  # already answered by the learned store
+    assert report['cold_start_ms']['count'] == len(generated)
+    print(f"✓ Waited for live traffic, then pre-generated: {report['counts']}")
+
+    metrics.reset()
+    response = bot.chat("Tornado: what to do during it")
+    assert response == "Pre-generated answer for: What should I do during a tornado?"
+    assert metrics.snapshot()['counters']['warm_cache_hits'] == 1
+    # Exact template questions still get the curated knowledge base answer
+    assert bot.chat("What should I do during a tornado?").startswith("🆘")
+    print("✓ Near variants are answered from the warm cache")
+
+    # A second run (another restart) finds everything warm
+    before = len(generated)
+    again = Warmup(bot, top_n=5, interval=0, gate=gate)
+    again.run()
+    assert len(generated) == before and again.counts['fresh'] == len(questions) - 1
+    print("✓ Fresh answers are not regenerated")
+
+    # Stale answers are ignored and replaced
+    key, _ = bot.warm_store.match("What should I do during a tornado?")
+    bot.warm_store.responses[key]['timestamp'] = '2000-01-01T00:00:00'
+    assert bot.find_warm_entry("Tornado: what to do during it") is None
+    assert again.warm("What should I do during a tornado?", 'tornado') == 'generated'
+    assert bot.find_warm_entry("Tornado: what to do during it") is not None
+    print("✓ Stale answers are regenerated")
+
+    # Another worker rewriting the file is picked up
+    other_worker = LearnedResponseStore(bot.warm_store.path)
+    other_worker.add("What should I do during a drought?", "Save water.", 'general_disaster')
+    assert bot.warm_store.reload_if_changed()
+    assert bot.find_warm_entry("What should I do during a drought?")['answer'] == "Save water."
+    print("✓ Answers written by another worker are reloaded")
+
+    tmp.cleanup()
+    print("\n✓ All warm-up tests passed!")
+
+
+if __name__ == "__main__":
+    test_warmup()
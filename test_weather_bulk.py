@@ -0,0 +1,147 @@
+"""
+Test bulk weather alerts: concurrent lookups, caching and shared recommendations
+Runs offline - the weather API and Gemini are replaced by fakes
+"""
+
+import json
+import threading
+import time
+from flask import Flask
+from gazetteer import Gazetteer
+from llm_backends import LLMBackend, LLMResponse
+from weather_service import TTLCache, WeatherAlertService
+
+# Two groups of locations with identical conditions, plus one of its own
+CONDITIONS = {
+    'Miami': ('Rainy', 'light rain', 78), 'Tampa': ('Rainy', 'light rain', 78),
+    'Orlando': ('Rainy', 'light rain', 78), 'Denver': ('Snowy', 'light snow', 28),
+    'Boulder': ('Snowy', 'light snow', 28), 'Phoenix': ('Sunny', 'clear sky', 104),
+}
+
+
+class FakeWeatherAPI:
+    """Stands in for WeatherAPI.com with a fixed delay; counts lookups"""
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.lookups = []
+        self.lock = threading.Lock()
+
+    def __call__(self, location):
+        with self.lock:
+            self.lookups.append(location)
+        time.sleep(self.delay)
+        if location not in CONDITIONS:
+            return {'success': False, 'error': f"No matching location found: {location}"}
+        condition, description, temperature = CONDITIONS[location]
+        return {'success': True, 'location': location, 'country': 'US', 'temperature': temperature,
+                'feels_like': temperature, 'condition': condition, 'description': description,
+                'humidity': 70, 'wind_speed': 8, 'timestamp': '2026-10-19T12:00:00', 'is_mock': False}
+
+
+class CountingGemini(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.prompts = []
+
+    def generate(self, prompt, system=None, timeout=None):
+        self.prompts.append(prompt)
+        time.sleep(self.delay)
+        condition = prompt.split('Condition: ')[1].split(' ')[0]
+        return LLMResponse(f"🌂 Tips for {condition} weather.")
+
+
+class FlakyGemini(LLMBackend):
+    """Fails its first call, then answers"""
+    name = 'gemini'
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, system=None, timeout=None):
+        self.calls += 1
+        if self.calls == 1:
+            raise TimeoutError("Gemini timed out")
+        return LLMResponse("🌂 Tips from Gemini.")
+
+
+def test_weather_bulk():
+    print("\n" + "="*70)
+    print("🧪 TESTING BULK WEATHER ALERTS")
+    print("="*70 + "\n")
+
+    now = [0.0]
+    cache = TTLCache(ttl=60, max_entries=2, clock=lambda: now[0])
+    assert cache.get_or_compute('a', lambda: 1) == (1, 'miss')
+    assert cache.get_or_compute('a', lambda: 2) == (1, 'hit')
+    cache.get_or_compute('b', lambda: 2)
+    cache.get_or_compute('c', lambda: 3)
+    assert cache.get_or_compute('a', lambda: 4) == (4, 'miss')  # evicted as least recently used
+    now[0] = 61
+    assert cache.get_or_compute('a', lambda: 5) == (5, 'miss')  # expired
+    assert cache.get_or_compute('x', lambda: None, cacheable=lambda value: value) == (None, 'miss')
+    assert cache.get_or_compute('x', lambda: 6) == (6, 'miss')
+    print("✓ Cache entries expire, are evicted by age of use, and failures aren't kept")
+
+    api = FakeWeatherAPI()
+    gemini = CountingGemini()
+    # Without a gazetteer the fake API sees the names as typed
+    service = WeatherAlertService(llm_backend=gemini, gazetteer=Gazetteer())
+    service._fetch_weather = api
+    app = Flask(__name__)
+    app.add_url_rule('/weather/bulk', 'weather_bulk', lambda: '')
+
+    locations = list(CONDITIONS) + ['Miami', 'Atlantis']
+    start = time.perf_counter()
+    with app.test_request_context('/weather/bulk'):
+        alerts = service.get_weather_alerts(locations)
+    elapsed = time.perf_counter() - start
+    assert [alert['success'] for alert in alerts] == [True] * 7 + [False]
+    assert [alert['weather']['location'] for alert in alerts[:7]] == locations[:7]
+    assert alerts[1]['recommendations'] == alerts[0]['recommendations'] == "🌂 Tips for rainy weather."
+    assert "Tampa" in alerts[1]['message']
+    assert len(gemini.prompts) == 3, gemini.prompts
+    # Shared recommendations are written without the first location's name
+    assert not any(location in prompt for prompt in gemini.prompts for location in locations)
+    assert sorted(api.lookups) == sorted(set(locations))
+    # Sequentially: 8 lookups + 7 recommendations at 0.1 s each
+    assert elapsed < 0.8, elapsed
+    print(f"✓ 8 locations in {elapsed:.2f} s; 3 recommendations for 3 sets of conditions")
+
+    with app.test_request_context('/weather/bulk'):
+        streamed = dict(service.iter_weather_alerts(['Phoenix', 'Atlantis', 'Denver']))
+    assert sorted(streamed) == [0, 1, 2] and streamed[2]['weather']['location'] == 'Denver'
+    assert len(gemini.prompts) == 3 and api.lookups.count('Phoenix') == 1 and api.lookups.count('Atlantis') == 2
+    print("✓ Repeat lookups come from the cache (failed ones are retried)")
+
+    single = service.get_weather_alert('Orlando')
+    assert single['recommendations'] == alerts[0]['recommendations'] and len(gemini.prompts) == 3
+    print("✓ Single-location alerts share the same caches")
+
+    flaky = WeatherAlertService(llm_backend=FlakyGemini(), gazetteer=Gazetteer())
+    rainy = api('Miami')
+    first = flaky.get_weather_recommendation(rainy)
+    assert first != "🌂 Tips from Gemini." and first == flaky._get_rule_based_recommendation(rainy)
+    assert flaky.get_weather_recommendation(dict(rainy, location='Tampa')) == "🌂 Tips from Gemini."
+    assert flaky.get_weather_recommendation(rainy) == "🌂 Tips from Gemini." and flaky.llm.calls == 2
+    print("✓ A failed LLM call's rule-based stand-in isn't cached for other places")
+
+    # Streamed responses are NDJSON lines tagged with their index
+    import app as app_module
+    app_module.weather_service = service
+    client = app_module.app.test_client()
+    response = client.post('/weather/bulk', json={'locations': ['Denver', 'Boulder'], 'stream': True})
+    lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+    assert response.mimetype == 'application/x-ndjson' and sorted(line['index'] for line in lines) == [0, 1]
+    payload = client.post('/weather/bulk', json={'locations': ['Miami', 'Atlantis']}).get_json()
+    assert [result['success'] for result in payload['results']] == [True, False]
+    assert client.post('/weather/bulk', json={'locations': ['Miami'] * 101}).status_code == 413
+    assert client.post('/weather/bulk', json={'locations': []}).status_code == 400
+    print("✓ /weather/bulk returns one payload or streams NDJSON")
+
+    print("\n✓ All bulk weather tests passed!")
+
+
+if __name__ == "__main__":
+    test_weather_bulk()
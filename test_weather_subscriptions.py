@@ -0,0 +1,121 @@
+"""
+Test weather subscriptions: one poller per location pushing changes
+Runs offline - the weather API and Gemini are replaced by fakes
+"""
+
+import json
+import threading
+import time
+from gazetteer import Gazetteer
+from llm_backends import LLMBackend, LLMResponse
+from weather_service import WeatherAlertService
+from weather_subscriptions import SubscriptionLimitError, WeatherSubscriptions
+
+
+class ChangingWeatherAPI:
+    """Stands in for WeatherAPI.com; the temperature is whatever the test sets"""
+    def __init__(self):
+        self.temperature = {'miami': 80, 'denver': 30}
+        self.lookups = []
+        self.lock = threading.Lock()
+
+    def __call__(self, location):
+        with self.lock:
+            self.lookups.append(location.lower())
+        temperature = self.temperature[location.lower()]
+        return {'success': True, 'location': location.title(), 'country': 'US', 'temperature': temperature,
+                'feels_like': temperature, 'condition': 'Cloudy', 'description': 'overcast clouds',
+                'humidity': 60, 'wind_speed': 5, 'timestamp': '2026-10-19T12:00:00', 'is_mock': False}
+
+
+class EchoGemini(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, system=None, timeout=None):
+        self.calls += 1
+        return LLMResponse("🧥 " + prompt.split('Temperature: ')[1].split('\n')[0])
+
+
+def test_weather_subscriptions():
+    print("\n" + "="*70)
+    print("🧪 TESTING WEATHER SUBSCRIPTIONS")
+    print("="*70 + "\n")
+
+    api = ChangingWeatherAPI()
+    gemini = EchoGemini()
+    # Without a gazetteer the fake API sees the names as typed
+    service = WeatherAlertService(llm_backend=gemini, gazetteer=Gazetteer())
+    service._fetch_weather = api
+    subscriptions = WeatherSubscriptions(service, poll_seconds=0.05)
+
+    viewers = [subscriptions.subscribe(location) for location in ('Miami', ' miami', 'MIAMI', 'Denver')]
+    assert subscriptions.poller_count() == 2 and subscriptions.subscriber_count() == 4
+    first = [viewer.next_event(timeout=2) for viewer in viewers]
+    assert all(event.version == 1 for event in first) and first[0] is first[2]
+    assert first[0].alert['weather']['temperature'] == 80 and first[3].alert['weather']['temperature'] == 30
+    print("✓ Four viewers of two places share two pollers")
+
+    time.sleep(0.2)
+    assert viewers[0].next_event(timeout=0) is None, "unchanged weather was pushed again"
+    polls = api.lookups.count('miami')
+    assert polls >= 3 and gemini.calls == 2
+    print(f"✓ {polls} polls of unchanged weather pushed nothing and reused the recommendation")
+
+    api.temperature['miami'] = 95
+    updates = [viewer.next_event(timeout=2) for viewer in viewers[:3]]
+    assert all(event.version == 2 and event.alert['weather']['temperature'] == 95 for event in updates)
+    assert updates[0].alert['recommendations'].startswith("🧥 95°F")
+    late = subscriptions.subscribe('Miami')
+    assert late.next_event(timeout=0).version == 2
+    print("✓ A change is pushed to every viewer; late subscribers get the latest alert at once")
+
+    pollers = [viewers[0].channel.thread, viewers[3].channel.thread]
+    for viewer in viewers + [late]:
+        subscriptions.unsubscribe(viewer)
+    for thread in pollers:
+        thread.join(timeout=2)
+    assert subscriptions.poller_count() == 0 and not any(thread.is_alive() for thread in pollers)
+    lookups = len(api.lookups)
+    time.sleep(0.2)
+    assert len(api.lookups) == lookups
+    print("✓ Polling stops when a location has no subscribers")
+
+    capped = WeatherSubscriptions(service, poll_seconds=60, max_subscribers=2, max_locations=1)
+    viewers = [capped.subscribe('Miami'), capped.subscribe('miami')]
+    for location in ('Denver', 'Miami'):
+        try:
+            capped.subscribe(location)
+            assert False, f"subscribed to {location} past the cap"
+        except SubscriptionLimitError:
+            pass
+    for viewer in viewers:
+        capped.unsubscribe(viewer)
+    assert capped.subscribe('Denver') and capped.poller_count() == 1
+    print("✓ Subscribers and polled locations are capped per worker")
+
+    import app as app_module
+    app_module.weather_subscriptions = WeatherSubscriptions(service, poll_seconds=60)
+    client = app_module.app.test_client()
+    response = client.get('/weather/subscribe?location=Denver', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunk = next(iter(response.response)).decode('utf-8')
+    assert chunk.startswith("id: 1\nevent: weather\ndata: ")
+    payload = json.loads(chunk.split('data: ', 1)[1])
+    assert payload['success'] and payload['weather']['temperature'] == 30
+    response.close()
+    assert app_module.weather_subscriptions.poller_count() == 0
+    print("✓ /weather/subscribe streams Server-Sent Events and unsubscribes on disconnect")
+
+    app_module.weather_subscriptions = capped
+    response = client.get('/weather/subscribe?location=Boston')
+    assert response.status_code == 503 and not response.get_json()['success']
+    print("✓ Past the cap /weather/subscribe answers 503 (the widget asks /weather-alert instead)")
+
+    print("\n✓ All weather subscription tests passed!")
+
+
+if __name__ == "__main__":
+    test_weather_subscriptions()
@@ -0,0 +1,96 @@
+"""
+Test the widget config store
+Runs offline against a temporary file
+"""
+
+import os
+import tempfile
+import threading
+from widget_configs import ConfigLimitError, WidgetConfigStore
+
+
+def test_widget_configs():
+    print("\n" + "="*70)
+    print("🧪 TESTING WIDGET CONFIG STORE")
+    print("="*70 + "\n")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'widget_configs.json')
+        store = WidgetConfigStore(path)
+        
+        created = store.publish({'primaryColor': '#331013', 'position': 'bottom-left', 'unknown': 'x'})
+        entry = store.get(created['config_id'])
+        assert entry['config'] == {'primaryColor': '#331013', 'position': 'bottom-left'}
+        assert entry['version'] == created['version']
+        print(f"✓ Published config {created['config_id']} (version {created['version']})")
+        
+        for bad in [{'position': 'top'}, {'primaryColor': 'red;}'}, {'buttonSize': 5000}, None]:
+            try:
+                store.publish(bad)
+                assert False, bad
+            except ValueError:
+                pass
+        print("✓ Invalid configs rejected")
+        
+        try:
+            store.publish({'primaryColor': '#000000'}, created['config_id'], 'wrong-token')
+            assert False
+        except PermissionError:
+            pass
+        
+        # Another worker sees the update without a restart
+        other_worker = WidgetConfigStore(path)
+        updated = store.publish({'primaryColor': '#000000'}, created['config_id'], created['edit_token'])
+        assert updated['version'] != created['version']
+        assert other_worker.get(created['config_id'])['config'] == {'primaryColor': '#000000'}
+        print("✓ Updates need the edit token and reach other workers")
+        
+        assert store.get('missing') is None
+        
+        # Workers publishing at once don't lose each other's configs
+        workers = [WidgetConfigStore(path) for _ in range(4)]
+        created_ids = []
+        def publish_many(worker):
+            for _ in range(10):
+                created_ids.append(worker.publish({'position': 'bottom-right'})['config_id'])
+        threads = [threading.Thread(target=publish_many, args=(worker,)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(WidgetConfigStore(path).get(config_id) for config_id in created_ids)
+        print(f"✓ {len(created_ids)} concurrent publishes from 4 workers all kept")
+        
+        capped = WidgetConfigStore(os.path.join(tmp, 'capped.json'), max_configs=2)
+        first = capped.publish({'position': 'bottom-left'})
+        capped.publish({'position': 'bottom-left'})
+        try:
+            capped.publish({'position': 'bottom-left'})
+            assert False, "cap not enforced"
+        except ConfigLimitError:
+            pass
+        assert capped.publish({'position': 'bottom-right'}, first['config_id'], first['edit_token'])
+        print("✓ New configs refused at the cap; existing ones can still be updated")
+    
+    import app as app_module
+    client = app_module.app.test_client()
+    saved = app_module.widget_configs
+    with tempfile.TemporaryDirectory() as tmp:
+        app_module.widget_configs = WidgetConfigStore(os.path.join(tmp, 'widget_configs.json'))
+        try:
+            statuses = [client.post('/widget-config', json={'config': {'position': 'bottom-left'}},
+                                    environ_base={'REMOTE_ADDR': '198.51.100.7'}).status_code
+                        for _ in range(int(app_module.widget_publishers.capacity) + 3)]
+            other = client.post('/widget-config', json={'config': {'position': 'bottom-left'}},
+                                environ_base={'REMOTE_ADDR': '198.51.100.8'})
+        finally:
+            app_module.widget_configs = saved
+    assert statuses.count(200) == app_module.widget_publishers.capacity and statuses[-1] == 429
+    assert other.status_code == 200
+    print(f"✓ Publishing is rate limited per client IP ({statuses.count(429)} of {len(statuses)} refused)")
+    
+    print("\n✓ All widget config tests passed!")
+
+
+if __name__ == "__main__":
+    test_widget_configs()
@@ -4,9 +4,13 @@ This script trains a model on disaster response messages
 """
 
 import pandas as pd
+import numpy as np
 import json
+import time
 import torch
-from datasets import Dataset, load_dataset
+from itertools import islice
+from datasets import Dataset, concatenate_datasets, load_dataset, load_from_disk
+from datasets.fingerprint import Hasher
 from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
@@ -14,36 +18,127 @@ from transformers import (
     TrainingArguments,
     Trainer,
     DataCollatorForSeq2Seq,
+    TrainerCallback,
     T5ForConditionalGeneration,
     T5Tokenizer
 )
-from sklearn.model_selection import train_test_split
 import os
+import shutil
+import argparse
+from datetime import datetime
+from manage_learned_responses import LearnedResponsesManager, parse_timestamp
+from training_shards import load_manifest, read_shard
+from model_versions import (
+    load_watermark,
+    new_version_path,
+    publish_version,
+    resolve_model_path,
+    save_watermark
+)
+
+# Columns of the disaster response dataset that are not category labels
+NON_CATEGORY_COLUMNS = ['message', 'id', 'original', 'genre', 'split']
+
+# Tokenized train/validation shards, keyed by input fingerprint
+TOKENIZED_CACHE_DIR = './.training_cache'
+
+class PaddingStatsCollator:
+    """
+    Wraps a data collator and counts real vs padded tokens in every batch
+    """
+    
+    def __init__(self, collator):
+        self.collator = collator
+        self.reset()
+    
+    def reset(self):
+        self.real_tokens = 0
+        self.total_tokens = 0
+    
+    def __call__(self, features):
+        batch = self.collator(features)
+        
+        self.total_tokens += batch['input_ids'].numel()
+        self.real_tokens += int(batch['attention_mask'].sum())
+        if 'labels' in batch:
+            labels = batch['labels']
+            pad_token_id = getattr(getattr(self.collator, 'tokenizer', None), 'pad_token_id', None)
+            real_labels = labels != -100
+            if pad_token_id is not None:
+                real_labels &= labels != pad_token_id  # statically padded labels
+            self.total_tokens += labels.numel()
+            self.real_tokens += int(real_labels.sum())
+        
+        return batch
+    
+    @property
+    def padding_fraction(self):
+        if not self.total_tokens:
+            return 0.0
+        return 1 - self.real_tokens / self.total_tokens
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Reports tokens per second and the padding fraction at the end of training
+    Counts cover every batch built during train() (including evaluation)
+    """
+    
+    def __init__(self, stats_collator):
+        self.stats_collator = stats_collator
+        self.start_time = None
+        self.stats = {}
+    
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.stats_collator.reset()
+        self.start_time = time.perf_counter()
+    
+    def on_train_end(self, args, state, control, **kwargs):
+        elapsed = time.perf_counter() - self.start_time
+        collator = self.stats_collator
+        self.stats = {
+            'elapsed_seconds': elapsed,
+            'real_tokens': collator.real_tokens,
+            'total_tokens': collator.total_tokens,
+            'tokens_per_second': collator.real_tokens / elapsed if elapsed else 0.0,
+            'padded_tokens_per_second': collator.total_tokens / elapsed if elapsed else 0.0,
+            'padding_fraction': collator.padding_fraction,
+        }
+        print(f"\n📈 Throughput: {self.stats['tokens_per_second']:,.0f} tokens/s "
+              f"({self.stats['padded_tokens_per_second']:,.0f} incl. padding), "
+              f"padding fraction {self.stats['padding_fraction']:.1%}")
+
 
 class DisasterChatbotTrainer:
-    def __init__(self, model_name="google/flan-t5-base"):
+    def __init__(self, model_name="google/flan-t5-base", load_model=True):
         """
         Initialize the trainer with a pre-trained model
         Args:
             model_name: HuggingFace model identifier
+            load_model: Set to False to only prepare data (tokenizer is still loaded)
         """
         self.model_name = model_name
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name) if load_model else None
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         print(f"Using device: {self.device}")
         
-    def load_disaster_dataset(self, dataset_path="disaster_response_messages"):
-        """Load the disaster response dataset"""
+    def load_disaster_dataset(self, dataset_path="disaster_response_messages", streaming=False):
+        """
+        Load the disaster response dataset
+        Args:
+            dataset_path: Local dataset directory or HuggingFace identifier
+            streaming: Stream examples instead of materializing the dataset
+        """
         try:
             # Try loading from local directory
             print(f"Loading dataset from {dataset_path}...")
-            dataset = load_dataset(dataset_path)
+            dataset = load_dataset(dataset_path, streaming=streaming)
             return dataset
         except Exception as e:
             print(f"Error loading dataset: {e}")
             print("Attempting to load from HuggingFace Hub...")
-            dataset = load_dataset("community-datasets/disaster_response_messages")
+            dataset = load_dataset("community-datasets/disaster_response_messages", streaming=streaming)
             return dataset
     
     def load_knowledge_base(self, knowledge_file="disaster_knowledge.json"):
@@ -52,122 +147,387 @@ class DisasterChatbotTrainer:
             knowledge = json.load(f)
         return knowledge
     
-    def create_training_data(self, dataset, knowledge):
-        """Create training data combining dataset and knowledge base"""
-        training_samples = []
+    def _iter_batches(self, split, batch_size):
+        """
+        Iterate over a dataset split in column-oriented batches
+        Works for both on-disk (memory-mapped) and streaming splits
+        """
+        if isinstance(split, Dataset):
+            yield from split.iter(batch_size=batch_size)
+            return
         
-        # Process disaster response messages
-        if 'train' in dataset:
-            df = pd.DataFrame(dataset['train'])
-            
-            # Create Q&A pairs from the disaster messages
-            for idx, row in df.iterrows():
-                if idx > 5000:  # Limit for training efficiency
-                    break
-                    
-                message = str(row.get('message', ''))
-                if len(message) < 10:
-                    continue
-                
-                # Extract categories if available
-                categories = []
-                for col in df.columns:
-                    if col not in ['message', 'id', 'original', 'genre', 'split']:
-                        if row.get(col) == 1:
-                            categories.append(col.replace('_', ' '))
-                
-                # Create instruction-response pairs
-                if categories:
-                    category_text = ', '.join(categories[:3])
-                    input_text = f"A person needs help with: {category_text}. Message: {message[:200]}"
-                    output_text = f"This is a {category_text} situation. I understand you need assistance. "
-                    
-                    # Add relevant advice from knowledge base
-                    for cat_key, cat_data in knowledge.items():
-                        if any(cat in cat_key for cat in categories):
-                            output_text += f"Important do's: {', '.join(cat_data['dos'][:3])}. "
-                            output_text += f"Critical don'ts: {', '.join(cat_data['donts'][:3])}."
-                            break
-                    
-                    training_samples.append({
-                        'input': input_text,
-                        'output': output_text[:512]  # Limit output length
-                    })
-        
-        # Add knowledge base as direct Q&A pairs
+        iterator = iter(split)
+        while True:
+            rows = list(islice(iterator, batch_size))
+            if not rows:
+                return
+            yield {col: [row.get(col) for row in rows] for col in rows[0]}
+    
+    @staticmethod
+    def _message_batch_to_samples(batch, knowledge):
+        """
+        Turn one batch of disaster messages into instruction-response pairs
+        Category extraction runs as column operations over the whole label matrix
+        (static so datasets can fingerprint it without hashing the model)
+        Returns:
+            dict: {'input': [...], 'output': [...]} for the rows that qualify
+        """
+        messages = pd.Series(batch.get('message', []), dtype='object').fillna('').astype(str)
+        if messages.empty:
+            return {'input': [], 'output': []}
+        
+        # Label matrix: one boolean column per numeric category
+        category_columns = []
+        label_columns = []
+        for col, values in batch.items():
+            if col in NON_CATEGORY_COLUMNS:
+                continue
+            values = np.asarray(values)
+            if values.dtype.kind not in 'biuf':
+                continue
+            category_columns.append(col.replace('_', ' '))
+            label_columns.append(values == 1)
+        
+        if not label_columns:
+            return {'input': [], 'output': []}
+        
+        labels = np.column_stack(label_columns)
+        category_names = np.array(category_columns, dtype=object)
+        
+        keep = (messages.str.len().to_numpy() >= 10) & labels.any(axis=1)
+        rows = np.flatnonzero(keep)
+        if rows.size == 0:
+            return {'input': [], 'output': []}
+        labels = labels[rows]
+        messages = messages.to_numpy()[rows]
+        
+        # First three categories per row, in column order
+        first_three = np.argsort(~labels, axis=1, kind='stable')[:, :3]
+        category_counts = np.minimum(labels.sum(axis=1), 3)
+        
+        # Knowledge base advice: first knowledge entry matching any row category
+        knowledge_keys = list(knowledge.keys())
+        advice = [
+            f"Important do's: {', '.join(knowledge[key]['dos'][:3])}. "
+            f"Critical don'ts: {', '.join(knowledge[key]['donts'][:3])}."
+            for key in knowledge_keys
+        ]
+        key_matches = np.array(
+            [[name in key for key in knowledge_keys] for name in category_columns],
+            dtype=np.int32
+        ).reshape(len(category_columns), len(knowledge_keys))
+        row_matches = (labels.astype(np.int32) @ key_matches) > 0
+        has_advice = row_matches.any(axis=1)
+        advice_index = row_matches.argmax(axis=1) if knowledge_keys else np.zeros(len(rows), dtype=int)
+        
+        inputs, outputs = [], []
+        for i in range(len(rows)):
+            category_text = ', '.join(category_names[first_three[i, :category_counts[i]]])
+            inputs.append(f"A person needs help with: {category_text}. Message: {messages[i][:200]}")
+            output_text = f"This is a {category_text} situation. I understand you need assistance. "
+            if has_advice[i]:
+                output_text += advice[advice_index[i]]
+            outputs.append(output_text[:512])  # Limit output length
+        
+        return {'input': inputs, 'output': outputs}
+    
+    @staticmethod
+    def _knowledge_samples(knowledge):
+        """Yield the knowledge base as direct Q&A pairs"""
         for disaster_type, info in knowledge.items():
             # What to do questions
-            training_samples.append({
+            yield {
                 'input': f"What should I do during a {disaster_type.replace('_', ' ')}?",
                 'output': f"During a {disaster_type.replace('_', ' ')}, here's what you should do: " + "; ".join(info['dos'][:5])
-            })
+            }
             
             # What not to do questions
-            training_samples.append({
+            yield {
                 'input': f"What should I avoid during a {disaster_type.replace('_', ' ')}?",
                 'output': f"During a {disaster_type.replace('_', ' ')}, avoid these actions: " + "; ".join(info['donts'][:5])
-            })
+            }
             
             # Safety tips
-            training_samples.append({
+            yield {
                 'input': f"Give me safety tips for {disaster_type.replace('_', ' ')}",
                 'output': f"Safety tips for {disaster_type.replace('_', ' ')}: DO: " + ", ".join(info['dos'][:3]) + ". DON'T: " + ", ".join(info['donts'][:3])
-            })
+            }
             
             # Help request
-            training_samples.append({
+            yield {
                 'input': f"I'm experiencing a {disaster_type.replace('_', ' ')}, what should I do?",
                 'output': f"Stay calm. For {disaster_type.replace('_', ' ')}: First, " + info['dos'][0] + " " + info['dos'][1] + " Remember: " + info['donts'][0]
-            })
+            }
+    
+    def iter_training_samples(self, dataset, knowledge, batch_size=1000):
+        """
+        Lazily yield training samples from the dataset and knowledge base
+        Only one batch of messages is held in memory at a time, so the full
+        corpus can be used (including streaming datasets)
+        """
+        if 'train' in dataset:
+            for batch in self._iter_batches(dataset['train'], batch_size):
+                samples = self._message_batch_to_samples(batch, knowledge)
+                for input_text, output_text in zip(samples['input'], samples['output']):
+                    yield {'input': input_text, 'output': output_text}
+        
+        yield from self._knowledge_samples(knowledge)
+    
+    def build_training_dataset(self, dataset, knowledge, batch_size=1000):
+        """
+        Build the training samples as a datasets pipeline
+        Messages are transformed batch by batch with a batched map, so the
+        result stays memory-mapped on disk instead of living in a Python list
+        """
+        knowledge_dataset = Dataset.from_list(list(self._knowledge_samples(knowledge)))
+        if 'train' not in dataset:
+            return knowledge_dataset
+        
+        message_dataset = self.build_message_dataset(dataset['train'], knowledge, batch_size)
+        if not isinstance(message_dataset, Dataset):
+            knowledge_dataset = knowledge_dataset.to_iterable_dataset()
         
+        return concatenate_datasets([message_dataset, knowledge_dataset])
+    
+    def build_message_dataset(self, split, knowledge, batch_size=1000):
+        """Transform one split of disaster messages into samples with a batched map"""
+        return split.map(
+            self._message_batch_to_samples,
+            batched=True,
+            batch_size=batch_size,
+            remove_columns=split.column_names,
+            fn_kwargs={'knowledge': knowledge},
+        )
+    
+    def create_training_data(self, dataset, knowledge):
+        """Create training data combining dataset and knowledge base"""
+        training_samples = list(self.iter_training_samples(dataset, knowledge))
         print(f"Created {len(training_samples)} training samples")
         return training_samples
     
-    def prepare_dataset(self, training_samples):
-        """Prepare dataset for training"""
+    def prepare_dataset(self, training_samples, num_proc=None, pad_to_max_length=False):
+        """
+        Prepare dataset for training
+        Args:
+            training_samples: A datasets.Dataset of samples, or a list of sample dicts
+            num_proc: Worker processes for tokenization (default: up to 4 CPUs)
+            pad_to_max_length: Pad everything to 256 tokens (the old static padding,
+                kept only for throughput comparisons)
+        """
+        if not isinstance(training_samples, Dataset):
+            training_samples = Dataset.from_list(list(training_samples))
+        
+        if num_proc is None:
+            num_proc = min(4, os.cpu_count() or 1)
+        
         # Split into train and validation
-        train_samples, val_samples = train_test_split(
-            training_samples, 
-            test_size=0.1, 
-            random_state=42
-        )
+        splits = training_samples.train_test_split(test_size=0.1, seed=42)
+        train_dataset = splits['train']
+        val_dataset = splits['test']
         
-        # Create datasets
-        train_dataset = Dataset.from_list(train_samples)
-        val_dataset = Dataset.from_list(val_samples)
+        # Tokenize without padding - batches are padded dynamically by the collator.
+        # Only the tokenizer is captured so worker processes don't receive the model.
+        tokenizer = self.tokenizer
+        padding = 'max_length' if pad_to_max_length else False
         
-        # Tokenize
         def tokenize_function(examples):
-            model_inputs = self.tokenizer(
+            model_inputs = tokenizer(
                 examples['input'],
                 max_length=256,
                 truncation=True,
-                padding='max_length'
+                padding=padding
             )
             
-            labels = self.tokenizer(
-                examples['output'],
+            labels = tokenizer(
+                text_target=examples['output'],
                 max_length=256,
                 truncation=True,
-                padding='max_length'
+                padding=padding
             )
             
             model_inputs['labels'] = labels['input_ids']
+            # Source + target length, used to group similar-length samples into batches
+            model_inputs['length'] = [
+                len(source) + len(target)
+                for source, target in zip(model_inputs['input_ids'], labels['input_ids'])
+            ]
             return model_inputs
         
-        train_dataset = train_dataset.map(tokenize_function, batched=True)
-        val_dataset = val_dataset.map(tokenize_function, batched=True)
+        train_dataset = train_dataset.map(
+            tokenize_function,
+            batched=True,
+            num_proc=num_proc if len(train_dataset) >= 1000 else None,
+            remove_columns=train_dataset.column_names
+        )
+        val_dataset = val_dataset.map(
+            tokenize_function,
+            batched=True,
+            num_proc=num_proc if len(val_dataset) >= 1000 else None,
+            remove_columns=val_dataset.column_names
+        )
         
         return train_dataset, val_dataset
     
-    def train(self, train_dataset, val_dataset, output_dir="./disaster_chatbot_model"):
-        """Train the model"""
+    def _cache_fingerprint(self, part, source, pad_to_max_length):
+        """Fingerprint of one cached part: its inputs, the tokenizer and preprocessing"""
+        return Hasher.hash({
+            'part': part,
+            'source': source,
+            'tokenizer': self.tokenizer,
+            'sample_builder': {
+                'messages': self._message_batch_to_samples,
+                'knowledge': self._knowledge_samples,
+                'learned': self._shard_samples,
+            }[part],
+            'max_length': 256,
+            'pad_to_max_length': pad_to_max_length,
+            'test_size': 0.1,
+            'seed': 42,
+        })
+    
+    @staticmethod
+    def _shard_samples(base_dir, compression, shards):
+        """Generator over exported learned-response shards"""
+        for shard in shards:
+            for record in read_shard(base_dir, shard, compression):
+                yield {'input': record['input'], 'output': record['output']}
+    
+    def build_learned_dataset(self, learned_shards):
+        """
+        Build a Dataset from learned responses exported as shards
+        Shards are read lazily, one record at a time, and written straight
+        to Arrow, so the export never has to fit in memory
+        Args:
+            learned_shards: Export directory written by manage_learned_responses.py export
+        """
+        manifest = load_manifest(learned_shards)
+        return Dataset.from_generator(
+            self._shard_samples,
+            gen_kwargs={
+                'base_dir': os.path.abspath(learned_shards),
+                'compression': manifest['compression'],
+                # Shard entries carry their checksums, which key the generator cache
+                'shards': manifest['shards']
+            }
+        )
+    
+    def prepare_cached_datasets(self, dataset, knowledge, cache_dir=TOKENIZED_CACHE_DIR,
+                                pad_to_max_length=False, learned_shards=None):
+        """
+        Build tokenized train/validation splits, reusing Arrow shards on disk
+        
+        The data is cached in two parts - disaster messages and knowledge base
+        Q&A pairs - each keyed by a fingerprint of its inputs, the tokenizer and
+        the preprocessing parameters. Messages only depend on the first three
+        do's/don'ts of each knowledge entry, so most knowledge base edits only
+        rebuild the (small) knowledge part. Exported learned responses, if
+        given, form a third part keyed by the shard checksums in their manifest.
+        
+        Returns:
+            tuple: (train_dataset, val_dataset)
+        """
+        parts = {
+            'knowledge': (
+                json.dumps(knowledge, sort_keys=True),
+                lambda: Dataset.from_list(list(self._knowledge_samples(knowledge)))
+            )
+        }
+        split = dataset['train'] if 'train' in dataset else None
+        if split is not None:
+            advice = [(key, info['dos'][:3], info['donts'][:3]) for key, info in knowledge.items()]
+            parts['messages'] = (
+                [getattr(split, '_fingerprint', None), advice],
+                lambda: self.build_message_dataset(split, knowledge)
+            )
+        if learned_shards:
+            manifest = load_manifest(learned_shards)
+            if manifest['total_records']:
+                parts['learned'] = (
+                    [shard['sha256'] for shard in manifest['shards']],
+                    lambda: self.build_learned_dataset(learned_shards)
+                )
+        
+        train_parts, val_parts = [], []
+        self.cache_report = {}
+        for part, (source, build) in parts.items():
+            fingerprint = self._cache_fingerprint(part, source, pad_to_max_length)
+            part_dir = os.path.join(cache_dir, f"{part}-{fingerprint}")
+            cacheable = not (part == 'messages' and source[0] is None)
+            
+            start = time.perf_counter()
+            if cacheable and os.path.exists(os.path.join(part_dir, 'meta.json')):
+                with open(os.path.join(part_dir, 'meta.json'), 'r') as f:
+                    meta = json.load(f)
+                train_part = load_from_disk(os.path.join(part_dir, 'train'))
+                val_part = load_from_disk(os.path.join(part_dir, 'validation'))
+                load_seconds = time.perf_counter() - start
+                saved = max(0.0, meta['build_seconds'] - load_seconds)
+                print(f"✓ Cache hit  [{part}] {len(train_part)}+{len(val_part)} rows "
+                      f"loaded in {load_seconds:.2f}s (saved ~{saved:.1f}s)")
+                self.cache_report[part] = {'hit': True, 'seconds': load_seconds, 'saved_seconds': saved}
+            else:
+                print(f"✗ Cache miss [{part}] building and tokenizing...")
+                train_part, val_part = self.prepare_dataset(build(), pad_to_max_length=pad_to_max_length)
+                build_seconds = time.perf_counter() - start
+                if cacheable:
+                    train_part, val_part = self._save_cached_part(
+                        cache_dir, part, part_dir, train_part, val_part, build_seconds
+                    )
+                print(f"  [{part}] {len(train_part)}+{len(val_part)} rows built in {build_seconds:.1f}s")
+                self.cache_report[part] = {'hit': False, 'seconds': build_seconds, 'saved_seconds': 0.0}
+            
+            train_parts.append(train_part)
+            val_parts.append(val_part)
+        
+        total_saved = sum(r['saved_seconds'] for r in self.cache_report.values())
+        hits = sum(r['hit'] for r in self.cache_report.values())
+        print(f"Tokenized cache: {hits}/{len(self.cache_report)} parts reused, ~{total_saved:.1f}s saved")
+        
+        return concatenate_datasets(train_parts), concatenate_datasets(val_parts)
+    
+    def _save_cached_part(self, cache_dir, part, part_dir, train_part, val_part, build_seconds):
+        """Persist one tokenized part and drop superseded versions of it"""
+        for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+            if name.startswith(f"{part}-") and os.path.join(cache_dir, name) != part_dir:
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        
+        train_part.save_to_disk(os.path.join(part_dir, 'train'))
+        val_part.save_to_disk(os.path.join(part_dir, 'validation'))
+        # meta.json is written last: its presence marks the part as complete
+        with open(os.path.join(part_dir, 'meta.json'), 'w') as f:
+            json.dump({
+                'part': part,
+                'build_seconds': build_seconds,
+                'train_rows': len(train_part),
+                'validation_rows': len(val_part),
+                'created_at': datetime.now().isoformat()
+            }, f, indent=2)
+        
+        # Reload memory-mapped from the cache rather than keeping the in-memory copy
+        return load_from_disk(os.path.join(part_dir, 'train')), load_from_disk(os.path.join(part_dir, 'validation'))
+    
+    def train(self, train_dataset, val_dataset, output_dir="./disaster_chatbot_model",
+              batch_size=4, effective_batch_size=16, training_overrides=None):
+        """
+        Train the model
+        Args:
+            batch_size: Samples per forward pass
+            effective_batch_size: Samples per optimizer step, reached with gradient accumulation
+            training_overrides: Extra TrainingArguments values (e.g. max_steps)
+        """
+        gradient_accumulation_steps = max(1, -(-effective_batch_size // batch_size))
+        print(f"Batch size {batch_size} x {gradient_accumulation_steps} accumulation steps "
+              f"= effective batch size {batch_size * gradient_accumulation_steps}")
+        
         # Training arguments
-        training_args = TrainingArguments(
+        training_kwargs = dict(
             output_dir=output_dir,
             num_train_epochs=3,
-            per_device_train_batch_size=4,
-            per_device_eval_batch_size=4,
+            per_device_train_batch_size=batch_size,
+            per_device_eval_batch_size=batch_size,
+            gradient_accumulation_steps=gradient_accumulation_steps,
+            group_by_length=True,  # Length-grouped batches keep dynamic padding small
+            length_column_name='length',
             warmup_steps=500,
             weight_decay=0.01,
             logging_dir='./logs',
@@ -182,13 +542,17 @@ class DisasterChatbotTrainer:
             report_to="none",
             fp16=torch.cuda.is_available(),  # Use mixed precision if GPU available
         )
+        training_kwargs.update(training_overrides or {})
+        training_args = TrainingArguments(**training_kwargs)
         
-        # Data collator
-        data_collator = DataCollatorForSeq2Seq(
+        # Data collator - pads each batch to its own longest sample
+        data_collator = PaddingStatsCollator(DataCollatorForSeq2Seq(
             self.tokenizer,
             model=self.model,
             padding=True
-        )
+        ))
+        
+        throughput = ThroughputCallback(data_collator)
         
         # Trainer
         trainer = Trainer(
@@ -197,11 +561,13 @@ class DisasterChatbotTrainer:
             train_dataset=train_dataset,
             eval_dataset=val_dataset,
             data_collator=data_collator,
+            callbacks=[throughput],
         )
         
         # Train
         print("Starting training...")
         trainer.train()
+        self.throughput_stats = throughput.stats
         
         # Save model
         print(f"Saving model to {output_dir}")
@@ -210,8 +576,12 @@ class DisasterChatbotTrainer:
         
         return trainer
     
-    def run_full_training(self):
-        """Execute the full training pipeline"""
+    def run_full_training(self, learned_shards=None):
+        """
+        Execute the full training pipeline
+        Args:
+            learned_shards: Optional directory of exported learned responses to train on too
+        """
         print("=" * 50)
         print("DISASTER RESPONSE CHATBOT TRAINING")
         print("=" * 50)
@@ -223,13 +593,12 @@ class DisasterChatbotTrainer:
         print("\n2. Loading knowledge base...")
         knowledge = self.load_knowledge_base()
         
-        print("\n3. Creating training data...")
-        training_samples = self.create_training_data(dataset, knowledge)
-        
-        print("\n4. Preparing datasets...")
-        train_dataset, val_dataset = self.prepare_dataset(training_samples)
+        print("\n3. Creating and tokenizing training data (cached)...")
+        train_dataset, val_dataset = self.prepare_cached_datasets(
+            dataset, knowledge, learned_shards=learned_shards
+        )
         
-        print("\n5. Training model...")
+        print("\n4. Training model...")
         trainer = self.train(train_dataset, val_dataset)
         
         print("\n" + "=" * 50)
@@ -237,8 +606,179 @@ class DisasterChatbotTrainer:
         print("=" * 50)
         print("\nModel saved to: ./disaster_chatbot_model")
         print("You can now use the chatbot with the trained model.")
+    
+    def run_incremental_training(self, learned_file="learned_responses.json",
+                                 model_dir="./disaster_chatbot_model",
+                                 replay_ratio=2, max_steps=200):
+        """
+        Fine-tune on learned responses added since the last checkpoint
+        Args:
+            learned_file: Learned responses store written by the chatbot
+            model_dir: Model directory holding the watermark and versions
+            replay_ratio: Original samples mixed in per new learned response
+            max_steps: Upper bound on optimizer steps
+        Returns:
+            str: Path of the new model version, or None if nothing was new
+        """
+        print("=" * 50)
+        print("INCREMENTAL FINE-TUNING")
+        print("=" * 50)
+        
+        watermark = load_watermark(model_dir)
+        since = watermark.get('last_timestamp')
+        collected_at = datetime.now().isoformat()
+        print(f"\n1. Collecting learned responses since {since or 'the beginning'}...")
+        manager = LearnedResponsesManager(learned_file)
+        new_samples = list(manager.iter_training_samples(since=since))
+        if not new_samples:
+            print("No new learned responses - nothing to do.")
+            return None
+        print(f"Found {len(new_samples)} new learned responses")
+        
+        print("\n2. Sampling replay data from the original training set...")
+        knowledge = self.load_knowledge_base()
+        replay_samples = list(self._knowledge_samples(knowledge))
+        replay_size = max(0, replay_ratio * len(new_samples) - len(replay_samples))
+        if replay_size:
+            try:
+                dataset = self.load_disaster_dataset()
+                messages = self.build_message_dataset(dataset['train'], knowledge)
+                messages = messages.shuffle(seed=42).select(range(min(replay_size, len(messages))))
+                replay_samples.extend(messages)
+            except Exception as e:
+                print(f"Note: Replaying knowledge base only ({e})")
+        print(f"Replaying {len(replay_samples)} original samples")
+        
+        samples = [{'input': s['input'], 'output': s['output']} for s in new_samples + replay_samples]
+        train_dataset, val_dataset = self.prepare_dataset(samples)
+        
+        print(f"\n3. Fine-tuning for at most {max_steps} steps...")
+        version_path = new_version_path(model_dir)
+        self.train(train_dataset, val_dataset, output_dir=version_path, training_overrides={
+            'max_steps': max_steps,
+            'warmup_steps': max_steps // 10,
+            'learning_rate': 1e-5,
+            'eval_steps': max_steps,
+            'save_steps': max_steps,
+            'save_total_limit': 1,
+            'logging_dir': os.path.join(version_path, 'logs'),
+        })
+        
+        # Entries without a valid timestamp are only collected by the first
+        # run and can't move the watermark; if none had one, everything
+        # collected so far is covered
+        dated = [s['timestamp'] for s in new_samples if parse_timestamp(s.get('timestamp'))]
+        watermark = {
+            'last_timestamp': max(dated, key=parse_timestamp) if dated else collected_at,
+            'learned_count': watermark.get('learned_count', 0) + len(new_samples),
+            'version': os.path.basename(version_path),
+            'base_model': self.model_name,
+            'updated_at': datetime.now().isoformat()
+        }
+        save_watermark(version_path, watermark)
+        publish_version(model_dir, version_path)
+        save_watermark(model_dir, watermark)
+        
+        print("\n" + "=" * 50)
+        print("INCREMENTAL FINE-TUNING COMPLETE!")
+        print("=" * 50)
+        print(f"\nNew model version: {version_path}")
+        print("Running servers pick it up on the next model request.")
+        return version_path
+
+    def _teacher_outputs(self, batch, batch_size=16):
+        """Replace the reference outputs of a batch with this model's greedy answers"""
+        outputs = []
+        self.model.to(self.device)
+        self.model.eval()
+        for i in range(0, len(batch['input']), batch_size):
+            inputs = self.tokenizer(
+                batch['input'][i:i + batch_size],
+                return_tensors="pt",
+                max_length=256,
+                truncation=True,
+                padding=True
+            ).to(self.device)
+            with torch.no_grad():
+                generated = self.model.generate(**inputs, max_length=256, num_beams=1, do_sample=False)
+            outputs.extend(self.tokenizer.batch_decode(generated, skip_special_tokens=True))
+        return {'input': batch['input'], 'output': outputs}
+    
+    def run_draft_training(self, draft_model_name="google/flan-t5-small",
+                           output_dir="./disaster_chatbot_draft_model",
+                           distill=True, max_samples=5000):
+        """
+        Train the small draft model used for assisted decoding
+        
+        With distill=True the draft learns this (trained) model's own greedy
+        answers, which maximizes how many draft tokens the main model accepts.
+        Otherwise it is fine-tuned on the same data as the main model.
+        The draft must share the main model's tokenizer (any FLAN-T5 size does).
+        """
+        print("=" * 50)
+        print(f"DRAFT MODEL TRAINING ({'distillation' if distill else 'fine-tuning'})")
+        print("=" * 50)
+        
+        print("\n1. Building training samples...")
+        dataset = self.load_disaster_dataset()
+        knowledge = self.load_knowledge_base()
+        samples = self.build_training_dataset(dataset, knowledge)
+        
+        if distill:
+            samples = samples.shuffle(seed=42).select(range(min(max_samples, len(samples))))
+            print(f"\n2. Generating teacher answers for {len(samples)} samples with {self.model_name}...")
+            samples = samples.map(
+                self._teacher_outputs,
+                batched=True,
+                batch_size=64,
+                # Fingerprint by teacher name so the model itself is never hashed
+                new_fingerprint=Hasher.hash([samples._fingerprint, self.model_name, 'teacher-outputs'])
+            )
+        
+        print(f"\n3. Training draft model {draft_model_name}...")
+        draft = DisasterChatbotTrainer(model_name=draft_model_name)
+        train_dataset, val_dataset = draft.prepare_dataset(samples)
+        draft.train(train_dataset, val_dataset, output_dir=output_dir, batch_size=16, effective_batch_size=32)
+        
+        print("\n" + "=" * 50)
+        print("DRAFT MODEL TRAINING COMPLETE!")
+        print("=" * 50)
+        print(f"\nDraft model saved to: {output_dir}")
+        print(f"Enable assisted decoding with LIFELINK_DRAFT_MODEL={output_dir}")
+        return output_dir
 
 if __name__ == "__main__":
-    # Initialize and run training
-    trainer = DisasterChatbotTrainer(model_name="google/flan-t5-base")
-    trainer.run_full_training()
+    parser = argparse.ArgumentParser(description="Train the LifeLink disaster response model")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Fine-tune only on learned responses added since the last checkpoint")
+    parser.add_argument('--learned-file', default='learned_responses.json')
+    parser.add_argument('--model-dir', default='./disaster_chatbot_model')
+    parser.add_argument('--max-steps', type=int, default=200)
+    parser.add_argument('--draft', action='store_true',
+                        help="Train the draft model used for assisted decoding")
+    parser.add_argument('--draft-model', default='google/flan-t5-small')
+    parser.add_argument('--no-distill', action='store_true',
+                        help="Fine-tune the draft on the dataset instead of distilling the trained model")
+    parser.add_argument('--learned-shards',
+                        help="Directory of learned responses exported with manage_learned_responses.py export")
+    args = parser.parse_args()
+    
+    if args.draft:
+        # The trained model is the teacher
+        trainer = DisasterChatbotTrainer(model_name=resolve_model_path(args.model_dir))
+        trainer.run_draft_training(
+            draft_model_name=args.draft_model,
+            distill=not args.no_distill
+        )
+    elif args.incremental:
+        # Continue from the currently published model
+        trainer = DisasterChatbotTrainer(model_name=resolve_model_path(args.model_dir))
+        trainer.run_incremental_training(
+            learned_file=args.learned_file,
+            model_dir=args.model_dir,
+            max_steps=args.max_steps
+        )
+    else:
+        # Initialize and run training
+        trainer = DisasterChatbotTrainer(model_name="google/flan-t5-base")
+        trainer.run_full_training(learned_shards=args.learned_shards)
@@ -0,0 +1,238 @@
+"""
+Training Data Shards
+Streaming writer and lazy reader for sharded JSONL training data,
+optionally gzip or zstd compressed, described by a manifest file
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# Optional: zstandard for faster, smaller shards
+try:
+    import zstandard  # type: ignore
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+    zstandard = None  # type: ignore
+
+MANIFEST_FILE = 'manifest.json'
+EXTENSIONS = {None: '.jsonl', 'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+
+class _HashingWriter:
+    """File wrapper that checksums and counts the (compressed) bytes written"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+    def close(self):
+        pass  # the raw file is closed by the shard
+
+
+class _Shard:
+    """One open output shard"""
+
+    def __init__(self, output_dir, partition, number, compression):
+        name = f"part-{number:05d}{EXTENSIONS[compression]}"
+        self.relative_path = os.path.join(partition, name) if partition else name
+        path = os.path.join(output_dir, self.relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.raw = open(path, 'wb')
+        self.hashing = _HashingWriter(self.raw)
+        if compression == 'gzip':
+            self.stream = gzip.GzipFile(fileobj=self.hashing, mode='wb', mtime=0)
+        elif compression == 'zstd':
+            self.stream = zstandard.ZstdCompressor(level=3).stream_writer(self.hashing)
+        else:
+            self.stream = self.hashing
+        self.partition = partition
+        self.records = 0
+
+    def write(self, record):
+        self.stream.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.records += 1
+
+    def close(self):
+        if self.stream is not self.hashing:
+            self.stream.close()
+        self.raw.close()
+        return {
+            'path': self.relative_path.replace(os.sep, '/'),
+            'partition': self.partition,
+            'records': self.records,
+            'bytes': self.hashing.bytes,
+            'sha256': self.hashing.sha256.hexdigest()
+        }
+
+
+def write_training_shards(records, output_dir, shard_size=10000, compression='gzip',
+                          partition_by='disaster_type', source=None):
+    """
+    Stream training records into JSONL shards and write a manifest
+    Args:
+        records: Iterable of training dicts ('input', 'output', ...)
+        output_dir: Directory for shards and manifest.json
+        shard_size: Maximum records per shard
+        compression: None, 'gzip' or 'zstd'
+        partition_by: Record field to partition shards by (None for no partitioning)
+        source: Description of where the records came from, for the manifest
+    Returns:
+        dict: The manifest
+    """
+    if compression not in EXTENSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == 'zstd' and not ZSTD_AVAILABLE:
+        raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    previous = _manifest_shard_paths(output_dir)
+    open_shards = {}
+    shard_counts = {}
+    finished = []
+
+    try:
+        for record in records:
+            partition = str(record.get(partition_by) or 'unknown') if partition_by else ''
+            shard = open_shards.get(partition)
+            if shard is None:
+                number = shard_counts.get(partition, 0)
+                shard_counts[partition] = number + 1
+                shard = open_shards[partition] = _Shard(output_dir, partition, number, compression)
+            shard.write(record)
+            if shard.records >= shard_size:
+                finished.append(open_shards.pop(partition).close())
+    finally:
+        for shard in open_shards.values():
+            finished.append(shard.close())
+
+    finished.sort(key=lambda s: s['path'])
+    partitions = {}
+    for shard in finished:
+        summary = partitions.setdefault(shard['partition'] or 'all', {'records': 0, 'shards': 0})
+        summary['records'] += shard['records']
+        summary['shards'] += 1
+
+    manifest = {
+        'format': 'lifelink-training-shards',
+        'version': 1,
+        'created_at': datetime.now().isoformat(),
+        'source': source,
+        'compression': compression,
+        'shard_size': shard_size,
+        'partition_by': partition_by,
+        'total_records': sum(s['records'] for s in finished),
+        'total_bytes': sum(s['bytes'] for s in finished),
+        'partitions': partitions,
+        'shards': finished
+    }
+    tmp_path = os.path.join(output_dir, MANIFEST_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_FILE))
+    _remove_shards(output_dir, previous - {s['path'] for s in finished})
+    return manifest
+
+
+def _manifest_shard_paths(output_dir):
+    """Shard paths listed by the manifest already in output_dir (empty if none)"""
+    try:
+        return {shard['path'] for shard in load_manifest(output_dir)['shards']}
+    except (OSError, ValueError, KeyError, TypeError):
+        return set()
+
+
+def _remove_shards(output_dir, paths):
+    """Delete shards of an earlier export, and partition directories left empty"""
+    for relative_path in paths:
+        parts = relative_path.split('/')
+        if os.path.isabs(relative_path) or '..' in parts:
+            continue  # never outside the export
+        path = os.path.join(output_dir, *parts)
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        directory = os.path.dirname(path)
+        if os.path.normpath(directory) != os.path.normpath(output_dir) and not os.listdir(directory):
+            os.rmdir(directory)
+
+
+def load_manifest(path):
+    """Load a shard manifest from its file or its directory"""
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_FILE)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _open_shard(path, compression):
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise ValueError("Reading zstd shards needs the zstandard package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def _verify_shard(path, expected_sha256):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(chunk)
+    if sha256.hexdigest() != expected_sha256:
+        raise ValueError(f"Checksum mismatch for shard {path}")
+
+
+def iter_training_shards(path, partitions=None, verify=False):
+    """
+    Lazily yield training records from a sharded export
+    Shards are opened one at a time and read line by line.
+    Args:
+        path: Manifest file or export directory
+        partitions: Only read these partitions (e.g. disaster types)
+        verify: Check each shard's checksum before reading it
+    """
+    base_dir = path if os.path.isdir(path) else os.path.dirname(path)
+    manifest = load_manifest(path)
+
+    for shard in manifest['shards']:
+        if partitions and shard['partition'] not in partitions:
+            continue
+        yield from read_shard(base_dir, shard, manifest['compression'], verify)
+
+
+def read_shard(base_dir, shard, compression, verify=False):
+    """Yield the records of one manifest shard entry"""
+    shard_path = os.path.join(base_dir, shard['path'])
+    if verify:
+        _verify_shard(shard_path, shard['sha256'])
+    with _open_shard(shard_path, compression) as f:
+        for line in _iter_lines(f):
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_lines(stream, chunk_size=1 << 16):
+    """Split a binary stream into lines (zstd readers have no readline)"""
+    pending = b''
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        yield from lines
+    if pending:
+        yield pending
@@ -0,0 +1,56 @@
+"""
+Urgency Scoring
+A cheap keyword score computed when a message arrives, so life-threatening
+messages get Gemini/model capacity before general questions
+"""
+
+import re
+
+PRIORITIES = ('critical', 'high', 'normal')
+
+# (weight, cues) - each group counts once however many of its cues match
+_CUE_GROUPS = [
+    # Immediate threat to life
+    (5, ['trapped', 'stuck under', 'pinned', 'buried', 'bleeding', 'blood', 'unconscious',
+         'not breathing', "can't breathe", 'cant breathe', 'drowning', 'heart attack',
+         'seizure', 'dying', 'choking', 'overdose']),
+    # Injury
+    (3, ['injured', 'injury', 'hurt', 'broken bone', 'broken leg', 'broken arm', 'burned',
+         'burns', 'wound', 'fainted', 'collapsed']),
+    # Hazard closing in
+    (4, ['fire spreading', 'fire is spreading', 'smoke in', 'flames', 'on fire',
+         'water rising', 'water is rising', 'swept away', 'on the roof', 'gas leak',
+         'smell gas', 'building collapsed', 'roof collapsed']),
+    # Vulnerable people involved
+    (2, ['child', 'children', 'baby', 'kid', 'kids', 'toddler', 'elderly', 'pregnant',
+         'disabled', 'wheelchair']),
+    # Asking for help right now
+    (1, ['help', 'sos', 'emergency', 'urgent', 'hurry', 'right now', 'please']),
+]
+_PATTERNS = [
+    (weight, re.compile(r'\b(?:' + '|'.join(re.escape(cue) for cue in cues) + r')\b'))
+    for weight, cues in _CUE_GROUPS
+]
+# Happening to the writer rather than a general question
+_FIRST_PERSON = re.compile(r"\b(?:i am|i'm|im|we are|we're|my|our|me|us)\b")
+
+CRITICAL_SCORE = 6
+HIGH_SCORE = 3
+
+
+def urgency_score(message):
+    """Urgency of a message (0 for general questions, higher is more urgent)"""
+    text = message.lower()
+    score = sum(weight for weight, pattern in _PATTERNS if pattern.search(text))
+    if score and _FIRST_PERSON.search(text):
+        score += 1
+    return score
+
+
+def priority_for(score):
+    """Map an urgency score to 'critical', 'high' or 'normal'"""
+    if score >= CRITICAL_SCORE:
+        return 'critical'
+    if score >= HIGH_SCORE:
+        return 'high'
+    return 'normal'
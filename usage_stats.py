@@ -0,0 +1,204 @@
+"""
+Learned Responses Usage Statistics
+Running aggregates (per-type counts, total reuse, top-K most used answers)
+kept up to date as entries are added, reused and removed, plus a sidecar
+file so tools can read them without scanning the whole store
+"""
+
+import heapq
+import json
+import os
+from collections import defaultdict
+
+# How many of the most used answers are tracked
+TOP_K = 50
+
+
+def stats_path(store_path):
+    """Sidecar stats file for a learned responses file"""
+    root, _ = os.path.splitext(store_path)
+    return root + '.stats.json'
+
+
+def file_signature(path):
+    """(size, mtime) of a file - changes whenever the store is rewritten"""
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+class UsageStats:
+    def __init__(self, top_k=TOP_K):
+        """
+        Empty aggregates
+        Args:
+            top_k: Number of most used answers to track
+        """
+        self.top_k = top_k
+        self.total = 0
+        self.total_usage = 0
+        self.by_type = defaultdict(int)
+        self.usage_by_type = defaultdict(int)
+        self.top = {}    # key -> (usage_count, question, disaster_type)
+        self._heap = []  # min-heap of (usage_count, key); entries not matching self.top are stale
+
+    @classmethod
+    def from_entries(cls, items, top_k=TOP_K):
+        """Build aggregates from (key, entry) pairs in one pass"""
+        stats = cls(top_k)
+        for key, entry in items:
+            stats.add(key, entry)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+
+    def add(self, key, entry):
+        """Count a new entry"""
+        disaster_type = entry.get('disaster_type', 'general')
+        usage = entry.get('usage_count', 0)
+        self.total += 1
+        self.total_usage += usage
+        self.by_type[disaster_type] += 1
+        self.usage_by_type[disaster_type] += usage
+        self._offer(key, entry)
+
+    def record_use(self, key, entry, uses=1):
+        """Count reuses of an entry whose usage_count was already bumped"""
+        disaster_type = entry.get('disaster_type', 'general')
+        self.total_usage += uses
+        self.usage_by_type[disaster_type] += uses
+        self._offer(key, entry)
+
+    def remove(self, key, entry):
+        """
+        Uncount a removed entry
+        Returns:
+            bool: True if it was in the top-K, which then needs rebuild_top()
+        """
+        disaster_type = entry.get('disaster_type', 'general')
+        usage = entry.get('usage_count', 0)
+        self.total -= 1
+        self.total_usage -= usage
+        self.by_type[disaster_type] -= 1
+        self.usage_by_type[disaster_type] -= usage
+        if self.by_type[disaster_type] <= 0:
+            del self.by_type[disaster_type]
+            del self.usage_by_type[disaster_type]
+        return self.top.pop(key, None) is not None
+
+    def rebuild_top(self, items):
+        """Recompute the top-K from all (key, entry) pairs"""
+        self.top = {}
+        self._heap = []
+        for key, entry in items:
+            self._offer(key, entry)
+
+    def _offer(self, key, entry):
+        # Usage counts only grow, so an entry outside the top-K can only
+        # enter it by beating the current minimum
+        usage = entry.get('usage_count', 0)
+        item = (usage, entry.get('question', key), entry.get('disaster_type', 'general'))
+        if key in self.top or len(self.top) < self.top_k:
+            self.top[key] = item
+            self._push(usage, key)
+            return
+
+        min_usage, min_key = self._min()
+        if usage > min_usage:
+            del self.top[min_key]
+            heapq.heappop(self._heap)
+            self.top[key] = item
+            self._push(usage, key)
+
+    def _push(self, usage, key):
+        heapq.heappush(self._heap, (usage, key))
+        if len(self._heap) > 4 * self.top_k:
+            # Drop stale entries left behind by updates
+            self._heap = [(item[0], k) for k, item in self.top.items()]
+            heapq.heapify(self._heap)
+
+    def _min(self):
+        while True:
+            usage, key = self._heap[0]
+            item = self.top.get(key)
+            if item is not None and item[0] == usage:
+                return usage, key
+            heapq.heappop(self._heap)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def snapshot(self, top=10):
+        """
+        Current statistics - O(K), no scan of the store
+        Args:
+            top: How many of the most used answers to include (at most top_k)
+        """
+        ranked = sorted(self.top.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+        return {
+            'total': self.total,
+            'total_usage': self.total_usage,
+            'by_type': dict(sorted(self.by_type.items(), key=lambda x: x[1], reverse=True)),
+            'usage_by_type': dict(sorted(self.usage_by_type.items(), key=lambda x: x[1], reverse=True)),
+            'top': [
+                {'key': key, 'question': question, 'disaster_type': disaster_type, 'usage_count': usage}
+                for key, (usage, question, disaster_type) in ranked
+            ]
+        }
+
+    # ------------------------------------------------------------------
+    # Sidecar file
+    # ------------------------------------------------------------------
+
+    def save(self, store_path):
+        """Write the aggregates next to the store, tagged with the store's signature"""
+        data = self.snapshot(self.top_k)
+        data['top_k'] = self.top_k
+        data['store_signature'] = file_signature(store_path)
+        path = stats_path(store_path)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, store_path):
+        """Load the sidecar, or None if it is missing or older than the store"""
+        try:
+            with open(stats_path(store_path), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('store_signature') != file_signature(store_path):
+            return None
+
+        stats = cls(data['top_k'])
+        stats.total = data['total']
+        stats.total_usage = data['total_usage']
+        stats.by_type.update(data['by_type'])
+        stats.usage_by_type.update(data['usage_by_type'])
+        for item in data['top']:
+            stats.top[item['key']] = (item['usage_count'], item['question'], item['disaster_type'])
+            stats._push(item['usage_count'], item['key'])
+        return stats
+
+    @classmethod
+    def for_file(cls, store_path, top_k=TOP_K):
+        """
+        Statistics for a store file: the sidecar if it is current,
+        otherwise one streaming pass over the store (which refreshes it)
+        """
+        from learned_store import iter_learned_responses
+
+        stats = cls.load(store_path)
+        if stats is not None and stats.top_k >= top_k:
+            return stats
+        stats = cls.from_entries(iter_learned_responses(store_path), top_k)
+        if os.path.exists(store_path):
+            stats.save(store_path)
+        return stats
@@ -0,0 +1,191 @@
+"""
+Startup Warm-up
+Pre-generates answers for the common question shapes of every disaster type
+(and the most asked historical questions) in a background thread, so the
+first user to ask a near variant doesn't pay a full Gemini/model round trip.
+
+The warm-up only runs while no live request is using or waiting for an
+expensive slot, takes one slot at a time without queueing, and pauses
+between questions. With several workers, one of them runs it and the
+others pick the answers up from warm_responses.json.
+"""
+
+import os
+import threading
+import time
+from admission import expensive_calls
+from metrics import metrics
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# The question shapes train_model.py teaches for each disaster type
+QUESTION_TEMPLATES = [
+    "What should I do during a {name}?",
+    "What should I avoid during a {name}?",
+    "Give me safety tips for {name}",
+    "I'm experiencing a {name}, what should I do?",
+]
+
+# Most asked historical questions (from learned response usage) to include
+WARMUP_TOP_N = int(os.environ.get('LIFELINK_WARMUP_TOP_N', 20))
+
+# Pause between pre-generated answers, and between checks while traffic is live
+WARMUP_INTERVAL = float(os.environ.get('LIFELINK_WARMUP_INTERVAL', 1.0))
+IDLE_POLL_SECONDS = 0.5
+
+
+def warmup_questions(knowledge, learned_store, top_n=WARMUP_TOP_N):
+    """
+    Questions to pre-generate answers for
+    Args:
+        knowledge: Knowledge base dict (one template set per disaster type)
+        learned_store: LearnedResponseStore whose most used questions are added
+        top_n: Number of historical questions
+    Returns:
+        list: (question, disaster_type, source) tuples, templates first
+    """
+    questions = []
+    for disaster_type in knowledge:
+        name = disaster_type.replace('_', ' ')
+        for template in QUESTION_TEMPLATES:
+            questions.append((template.format(name=name), disaster_type, 'template'))
+
+    if top_n:
+        for item in learned_store.usage_stats(top_n)['top']:
+            questions.append((item['question'], item['disaster_type'], 'history'))
+    return questions
+
+
+class Warmup:
+    def __init__(self, chatbot, top_n=WARMUP_TOP_N, interval=WARMUP_INTERVAL, gate=expensive_calls):
+        """
+        Args:
+            chatbot: DisasterChatbot whose Gemini/model answers are pre-generated
+            top_n: Historical questions to include
+            interval: Seconds to pause between questions
+            gate: PriorityGate shared with live traffic
+        """
+        self.chatbot = chatbot
+        self.top_n = top_n
+        self.interval = interval
+        self.gate = gate
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.state = 'idle'
+        self.counts = {'generated': 0, 'fresh': 0, 'learned': 0, 'failed': 0}
+        self.cold_seconds = []  # time each pre-generated answer took
+
+    def start(self):
+        """Run the warm-up in a daemon thread. Returns the thread."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+            self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        """Pre-generate every missing or stale answer, yielding to live traffic"""
+        if not self.chatbot.can_pregenerate:
+            self.state = 'unavailable'
+            print("ℹ️  Warm-up skipped: no Gemini key or trained model to pre-generate with")
+            return
+
+        lock = self._acquire_leader_lock()
+        if lock is False:
+            self.state = 'follower'
+            print("ℹ️  Warm-up running in another worker")
+            return
+
+        try:
+            self.state = 'running'
+            questions = warmup_questions(self.chatbot.knowledge, self.chatbot.learned_store, self.top_n)
+            print(f"🔥 Warming up answers for {len(questions)} common questions...")
+            started = time.perf_counter()
+            for question, disaster_type, _ in questions:
+                if self.stop_event.is_set():
+                    self.state = 'stopped'
+                    return
+                outcome = self.warm(question, disaster_type)
+                self.counts[outcome] += 1
+                if outcome == 'generated':
+                    self.stop_event.wait(self.interval)
+            self.state = 'done'
+            print(f"✓ Warm-up finished in {time.perf_counter() - started:.0f}s: {self.counts}")
+        finally:
+            if lock:
+                lock.close()
+
+    def warm(self, question, disaster_type):
+        """
+        Pre-generate one answer once no live request needs an expensive slot
+        Returns:
+            str: 'generated', 'fresh' (already warm), 'learned' (the learned
+                store already answers it) or 'failed'
+        """
+        if self.chatbot.learned_store.match(question)[0] is not None:
+            return 'learned'
+        if self.chatbot.find_warm_entry(question) is not None:
+            return 'fresh'
+
+        while not self.stop_event.is_set():
+            self._wait_for_idle()
+            # Never queue: if live traffic took the slots meanwhile, wait again
+            with self.gate.slot('normal', max_wait=0) as granted:
+                if not granted:
+                    continue
+                start = time.perf_counter()
+                try:
+                    self.chatbot.pregenerate_answer(question, disaster_type)
+                except Exception as e:
+                    print(f"Warm-up failed for '{question[:50]}': {e}")
+                    metrics.increment('warmup_answers', outcome='failed')
+                    return 'failed'
+                elapsed = time.perf_counter() - start
+                self.cold_seconds.append(elapsed)
+                metrics.observe('warmup_generation', elapsed)
+                metrics.increment('warmup_answers', outcome='generated')
+                return 'generated'
+        return 'failed'
+
+    def _wait_for_idle(self):
+        """Block while live requests hold or wait for expensive slots"""
+        while (self.gate.in_flight or self.gate.queued) and not self.stop_event.is_set():
+            self.stop_event.wait(IDLE_POLL_SECONDS)
+
+    def _acquire_leader_lock(self):
+        """
+        Let one worker process run the warm-up
+        Returns:
+            The open lock file if this process won, None if locking is
+            unsupported (every process warms up), False if another process holds it
+        """
+        if not FCNTL_AVAILABLE:
+            return None
+        lock = open(self.chatbot.warm_store.path + '.lock', 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock
+        except OSError:
+            lock.close()
+            return False
+
+    def report(self):
+        """Progress and the cold-start latency the warm-up absorbed"""
+        cold = sorted(self.cold_seconds)
+        return {
+            'state': self.state,
+            'counts': dict(self.counts),
+            'cold_start_ms': {
+                'count': len(cold),
+                'mean': round(1000 * sum(cold) / len(cold), 1) if cold else None,
+                'p50': round(1000 * cold[len(cold) // 2], 1) if cold else None,
+                'max': round(1000 * cold[-1], 1) if cold else None,
+            },
+            'warm_hits': metrics.snapshot()['counters'].get('warm_cache_hits', 0),
+        }
@@ -3,54 +3,200 @@ Weather Alert Service for LifeLink Chatbot
 Provides weather information with AI-powered recommendations
 """
 
+import contextvars
 import os
+import threading
+import time
 import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from dotenv import load_dotenv
-
-# Optional: Google Gemini AI for enhanced recommendations
-try:
-    import google.generativeai as genai  # type: ignore
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    genai = None  # type: ignore
+from gazetteer import Gazetteer
+from llm_backends import create_backend
+from llm_usage import call_llm
+from metrics import metrics
+from profiler import profiler
+from prompt_templates import WEATHER_PROMPT
 
 load_dotenv()
 
-class WeatherAlertService:
+# Recommendations fall back to the rule-based ones if Gemini is slower than this
+GEMINI_TIMEOUT_SECONDS = 10
+
+# Weather and recommendations are reused for this long (0 disables caching)
+WEATHER_CACHE_SECONDS = float(os.getenv('LIFELINK_WEATHER_CACHE_SECONDS', 600))
+
+# Concurrent lookups for bulk requests, and locations allowed per request
+WEATHER_WORKERS = int(os.getenv('LIFELINK_WEATHER_WORKERS', 8))
+MAX_BULK_LOCATIONS = 100
+
+# Entries kept per cache (least recently used are dropped first)
+MAX_CACHE_ENTRIES = 5000
+
+
+class _Flight:
     def __init__(self):
-        """Initialize weather service with API keys"""
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    def __init__(self, ttl, max_entries=MAX_CACHE_ENTRIES, clock=time.monotonic):
+        """
+        Thread-safe cache with expiring entries; concurrent misses for the
+        same key share one computation
+        Args:
+            ttl: Seconds an entry is reused (0 disables caching, not sharing)
+            max_entries: Entries kept before the least recently used are dropped
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (value, expires)
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """
+        Cached value for key, computing it on a miss
+        Args:
+            compute: Called with no arguments to produce the value
+            cacheable: Whether a computed value may be stored
+        Returns:
+            tuple: (value, 'hit', 'miss' or 'shared')
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > self.clock():
+                self.entries.move_to_end(key)
+                return entry[0], 'hit'
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = _Flight()
+
+        if not leader:
+            # Same key already being computed - wait for that result
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value, 'shared'
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                if flight.error is None and self.ttl > 0 and cacheable(flight.value):
+                    self.entries[key] = (flight.value, self.clock() + self.ttl)
+                    self.entries.move_to_end(key)
+                    if len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+            flight.done.set()
+        return flight.value, 'miss'
+    
+    def discard(self, key):
+        """Drop a cached entry (a computation in flight is still shared)"""
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+def conditions_key(weather_data):
+    """Weather fields recommendations depend on - locations with equal keys share one"""
+    return tuple(weather_data[field] for field in
+                 ('condition', 'description', 'temperature', 'feels_like', 'humidity', 'wind_speed'))
+
+
+# Bulk lookups run here; most of their time is spent waiting on the network
+_executor = ThreadPoolExecutor(max_workers=WEATHER_WORKERS, thread_name_prefix='weather')
+
+class WeatherAlertService:
+    def __init__(self, llm_backend=None, cache_seconds=WEATHER_CACHE_SECONDS, gazetteer=None):
+        """
+        Initialize weather service with API keys
+        
+        Args:
+            llm_backend: LLMBackend for recommendations (default: from
+                configuration, see llm_backends.py)
+            cache_seconds: How long weather and recommendations are reused
+            gazetteer: Gazetteer for canonical locations (default: gazetteer.json)
+        """
         # WeatherAPI.com (free tier available)
         self.weather_api_key = os.getenv('WEATHERAPI_KEY', 'cf1c17e3399549eb9a5111316250411')
         self.weather_api_url = "http://api.weatherapi.com/v1/current.json"
         
-        # Initialize Gemini for AI recommendations (if available)
-        self.gemini_available = False
-        if GEMINI_AVAILABLE:
-            self.gemini_api_key = os.getenv('GEMINI_API_KEY')
-            if self.gemini_api_key:
-                try:
-                    genai.configure(api_key=self.gemini_api_key)  # type: ignore
-                    self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')  # type: ignore
-                    self.gemini_available = True
-                    print("✓ Weather AI recommendations enabled (Gemini)")
-                except Exception as e:
-                    print(f"Warning: Gemini for weather recommendations unavailable: {e}")
-                    self.gemini_available = False
+        # AI recommendations from Gemini, or the backend LIFELINK_LLM_BACKEND selects
+        self.gemini_api_key = os.getenv('GEMINI_API_KEY')
+        try:
+            self.llm = llm_backend or create_backend(api_key=self.gemini_api_key)
+        except Exception as e:
+            print(f"Warning: LLM for weather recommendations unavailable: {e}")
+            self.llm = None
+        self.gemini_available = self.llm is not None
+        if self.llm:
+            print(f"✓ Weather AI recommendations enabled ({self.llm.label})")
         else:
-            print("ℹ Google Gemini not installed. Using rule-based recommendations.")
+            print("ℹ No LLM configured. Using rule-based recommendations.")
+        
+        # "NYC", "new york" and "New York, NY" are one place and one cache entry
+        self.gazetteer = gazetteer if gazetteer is not None else Gazetteer.load()
+        
+        # Per location, and per set of conditions for recommendations
+        self.weather_cache = TTLCache(cache_seconds)
+        self.recommendation_cache = TTLCache(cache_seconds)
+    
+    def canonical_location(self, location):
+        """
+        Cache key and WeatherAPI query for a free-form location
+        
+        Returns:
+            tuple: (key, query, Place or None) - unresolved names are
+                keyed by their lowercased text and sent as typed
+        """
+        place = self.gazetteer.resolve(location)
+        if place:
+            return place.id, place.query, place
+        return location.strip().lower(), location.strip(), None
     
-    def get_weather(self, location="New York"):
+    def location_key(self, location):
+        """Cache key of a location"""
+        return self.canonical_location(location)[0]
+    
+    def get_weather(self, location="New York", refresh=False):
         """
-        Get current weather for a location
+        Get current weather for a location (cached for cache_seconds)
         
         Args:
             location: City name or coordinates
+            refresh: Fetch again even if cached
         
         Returns:
             dict: Weather data with conditions and temperature
         """
+        key, query, place = self.canonical_location(location)
+        if refresh:
+            self.weather_cache.discard(key)
+        weather_data, result = self.weather_cache.get_or_compute(
+            key, lambda: self._fetch_place_weather(query, place),
+            cacheable=lambda data: data.get('success') and not data.get('is_mock'))
+        metrics.increment('weather_cache', result=result)
+        return weather_data
+    
+    def _fetch_place_weather(self, query, place):
+        """Weather for a query, named after its place (mock data has no name of its own)"""
+        weather_data = self._fetch_weather(query)
+        if place and weather_data.get('is_mock'):
+            weather_data['location'] = place.name
+            weather_data['country'] = place.country
+        return weather_data
+    
+    def _fetch_weather(self, location):
+        """Current weather from WeatherAPI.com (mock data if unavailable)"""
         try:
             if not self.weather_api_key:
                 return self._get_mock_weather(location)
@@ -117,6 +263,7 @@ class WeatherAlertService:
     def get_weather_recommendation(self, weather_data):
         """
         Generate AI-powered recommendations based on weather
+        Locations with identical conditions share one recommendation
         
         Args:
             weather_data: Weather information dict
@@ -127,6 +274,21 @@ class WeatherAlertService:
         if not weather_data.get('success'):
             return "Unable to generate recommendations due to weather data error."
         
+        # A rule-based stand-in for a failed LLM call isn't cached, so the
+        # next request for these conditions tries the LLM again
+        (recommendation, _), result = self.recommendation_cache.get_or_compute(
+            conditions_key(weather_data), lambda: self._generate_recommendation(weather_data),
+            cacheable=lambda value: value[1])
+        metrics.increment('weather_recommendations', result=result)
+        return recommendation
+    
+    def _generate_recommendation(self, weather_data):
+        """
+        Recommendations from the LLM, or the rule-based ones
+        Returns:
+            tuple: (text, cacheable) - cacheable is False for the rule-based
+                fallback after an LLM error
+        """
         condition = weather_data['condition'].lower()
         temp = weather_data['temperature']
         description = weather_data['description']
@@ -136,38 +298,25 @@ class WeatherAlertService:
         # If Gemini is available, get AI recommendations
         if self.gemini_available:
             try:
-                prompt = f"""You are a helpful weather assistant. Based on the current weather conditions, provide personalized safety recommendations and tips.
-
-Current Weather:
-- Condition: {condition} ({description})
-- Temperature: {temp}°F (feels like {weather_data['feels_like']}°F)
-- Humidity: {humidity}%
-- Wind Speed: {wind_speed} mph
-- Location: {weather_data['location']}
-
-Generate 3-4 practical, caring recommendations. Format:
-- Start with an emoji
-- Be conversational and friendly
-- Include specific safety tips
-- Mention appropriate clothing/gear
-- Keep each tip to 1-2 sentences
-
-Example:
-☂️ Don't forget to bring an umbrella! The rain might catch you off guard.
-🧥 Wear a waterproof jacket to stay dry and comfortable.
-🚗 Drive carefully - roads may be slippery.
-
-Your recommendations:"""
+                prompt = WEATHER_PROMPT.render(
+                    condition=condition,
+                    description=description,
+                    temperature=temp,
+                    feels_like=weather_data['feels_like'],
+                    humidity=humidity,
+                    wind_speed=wind_speed
+                )
                 
-                response = self.gemini_model.generate_content(prompt)
-                return response.text.strip()
+                response = call_llm(self.llm, WEATHER_PROMPT, prompt, timeout=GEMINI_TIMEOUT_SECONDS)
+                return response.text.strip(), True
             
             except Exception as e:
                 print(f"Gemini recommendation error: {e}")
-                return self._get_rule_based_recommendation(weather_data)
+                metrics.increment('weather_recommendation_errors')
+                return self._get_rule_based_recommendation(weather_data), False
         
         else:
-            return self._get_rule_based_recommendation(weather_data)
+            return self._get_rule_based_recommendation(weather_data), True
     
     def _get_rule_based_recommendation(self, weather_data):
         """Fallback rule-based recommendations"""
@@ -207,17 +356,18 @@ Your recommendations:"""
         
         return '\n'.join(recommendations) if recommendations else "Have a great day! Stay safe."
     
-    def get_weather_alert(self, location="New York"):
+    def get_weather_alert(self, location="New York", refresh=False):
         """
         Get complete weather alert with AI recommendations
         
         Args:
             location: City name
+            refresh: Fetch the weather again even if cached
         
         Returns:
             dict: Complete weather alert package
         """
-        weather_data = self.get_weather(location)
+        weather_data = self.get_weather(location, refresh=refresh)
         
         if not weather_data.get('success'):
             return {
@@ -225,8 +375,47 @@ Your recommendations:"""
                 'error': weather_data.get('error', 'Unable to fetch weather')
             }
         
-        recommendations = self.get_weather_recommendation(weather_data)
+        return self._format_alert(weather_data, self.get_weather_recommendation(weather_data))
+    
+    def iter_weather_alerts(self, locations, executor=None):
+        """
+        Weather alerts for many locations, looked up concurrently on a
+        bounded pool (cached entries are reused, and locations with the
+        same conditions share one recommendation)
+        
+        Args:
+            locations: City names
+            executor: Pool for the lookups (default: WEATHER_WORKERS threads)
+        
+        Yields:
+            tuple: (index in locations, alert dict) as each one completes
+        """
+        executor = executor or _executor
+        # Lookups still count against (and are profiled with) the route that asked for them
+        futures = {executor.submit(contextvars.copy_context().run, profiler.traced(self.get_weather_alert), location): index
+                   for index, location in enumerate(locations)}
+        for future in as_completed(futures):
+            try:
+                alert = future.result()
+            except Exception as e:
+                print(f"Weather alert error: {e}")
+                alert = {'success': False, 'error': str(e)}
+            yield futures[future], alert
+    
+    def get_weather_alerts(self, locations, executor=None):
+        """
+        Weather alerts for many locations (see iter_weather_alerts)
         
+        Returns:
+            list: Alert dicts in the order of locations
+        """
+        alerts = [None] * len(locations)
+        for index, alert in self.iter_weather_alerts(locations, executor):
+            alerts[index] = alert
+        return alerts
+    
+    def _format_alert(self, weather_data, recommendations):
+        """Alert package for weather data and its recommendations"""
         # Format the alert message
         alert_message = f"""🌤️ **Weather Alert for {weather_data['location']}, {weather_data['country']}**
 
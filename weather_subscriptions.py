@@ -0,0 +1,187 @@
+"""
+Weather Subscriptions
+Widgets subscribe to a location (GET /weather/subscribe, Server-Sent
+Events) instead of each polling /weather-alert. One background poller per
+distinct location refreshes the weather on a schedule and pushes the alert
+to every subscriber when it changes; a poller stops once its location has
+no subscribers left.
+
+Subscriptions are per worker process. Each one holds a worker thread for
+as long as the widget stays open, so the server must run threaded workers
+(the Dockerfile uses gunicorn's gthread), and subscribers and distinct
+locations are capped per worker; past either cap widgets fall back to
+/weather-alert.
+"""
+
+import os
+import queue
+import threading
+import time
+from metrics import metrics
+from weather_service import conditions_key
+
+# Seconds between refreshes of a subscribed location
+POLL_SECONDS = float(os.getenv('LIFELINK_WEATHER_POLL_SECONDS', 300))
+
+# Updates a slow subscriber may fall behind by before it misses some
+SUBSCRIBER_BACKLOG = 4
+
+# Open subscriptions and polled locations per worker. Keep subscribers below
+# the worker's thread count so chat requests still get a thread
+MAX_SUBSCRIBERS = int(os.getenv('LIFELINK_WEATHER_MAX_SUBSCRIBERS', 24))
+MAX_LOCATIONS = int(os.getenv('LIFELINK_WEATHER_MAX_LOCATIONS', 50))
+
+
+class SubscriptionLimitError(Exception):
+    """The worker already has its maximum subscribers or locations"""
+
+
+class WeatherEvent:
+    def __init__(self, alert, version):
+        """An alert pushed to subscribers, numbered per location"""
+        self.alert = alert
+        self.version = version
+        self.published = time.monotonic()
+
+
+class Subscription:
+    def __init__(self, channel):
+        """One subscriber's queue of weather events"""
+        self.channel = channel
+        self.events = queue.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        self.closed = False
+
+    @property
+    def location(self):
+        return self.channel.location
+
+    def push(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            metrics.increment('weather_push_dropped')
+
+    def next_event(self, timeout=None):
+        """
+        Next weather event for this subscriber
+        Returns:
+            WeatherEvent, or None if nothing arrived within timeout
+        """
+        try:
+            event = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        metrics.observe('weather_push_latency', time.monotonic() - event.published)
+        return event
+
+
+class _Channel:
+    def __init__(self, key, location):
+        """Subscribers of one location and its poller"""
+        self.key = key
+        self.location = location
+        self.subscribers = set()
+        self.latest = None
+        self.signature = None
+        self.stop = threading.Event()
+        self.thread = None
+
+
+class WeatherSubscriptions:
+    def __init__(self, weather_service, poll_seconds=POLL_SECONDS,
+                 max_subscribers=MAX_SUBSCRIBERS, max_locations=MAX_LOCATIONS):
+        """
+        Args:
+            weather_service: WeatherAlertService the pollers refresh
+            poll_seconds: Seconds between refreshes of a location
+            max_subscribers: Open subscriptions allowed
+            max_locations: Distinct locations polled at once
+        """
+        self.weather_service = weather_service
+        self.poll_seconds = poll_seconds
+        self.max_subscribers = max_subscribers
+        self.max_locations = max_locations
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, location):
+        """
+        Subscribe to a location's weather alerts, starting its poller if needed
+        The latest alert, if there is one yet, is queued right away
+        Returns:
+            Subscription
+        Raises:
+            SubscriptionLimitError: Too many subscribers or locations
+        """
+        key = self.weather_service.location_key(location)
+        with self.lock:
+            channel = self.channels.get(key)
+            if (sum(len(c.subscribers) for c in self.channels.values()) >= self.max_subscribers
+                    or (channel is None and len(self.channels) >= self.max_locations)):
+                metrics.increment('weather_subscriptions_refused')
+                raise SubscriptionLimitError("Too many weather subscriptions; use /weather-alert")
+            if channel is None:
+                channel = self.channels[key] = _Channel(key, location.strip())
+                channel.thread = threading.Thread(target=self._poll, args=(channel,),
+                                                  name=f'weather-poll-{key}', daemon=True)
+                channel.thread.start()
+            subscription = Subscription(channel)
+            channel.subscribers.add(subscription)
+            latest = channel.latest
+        if latest:
+            subscription.push(latest)
+        metrics.increment('weather_subscriptions')
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscriber; the location's poller stops with its last one"""
+        with self.lock:
+            if subscription.closed:
+                return
+            subscription.closed = True
+            channel = subscription.channel
+            channel.subscribers.discard(subscription)
+            if not channel.subscribers:
+                channel.stop.set()
+                del self.channels[channel.key]
+
+    def subscriber_count(self):
+        with self.lock:
+            return sum(len(channel.subscribers) for channel in self.channels.values())
+
+    def poller_count(self):
+        with self.lock:
+            return len(self.channels)
+
+    def _poll(self, channel):
+        """Refresh one location until it has no subscribers, pushing changes"""
+        refresh = False  # the first alert may come from the cache
+        while not channel.stop.is_set():
+            try:
+                alert = self.weather_service.get_weather_alert(channel.location, refresh=refresh)
+            except Exception as e:
+                print(f"Weather poll error for {channel.location}: {e}")
+                alert = {'success': False, 'error': str(e)}
+            self._publish(channel, alert)
+            refresh = True
+            channel.stop.wait(self.poll_seconds)
+
+    def _publish(self, channel, alert):
+        """Push an alert to the channel's subscribers unless the weather is unchanged"""
+        if alert['success']:
+            signature = (conditions_key(alert['weather']), alert['recommendations'])
+        else:
+            signature = ('error', alert.get('error'))
+        with self.lock:
+            if signature == channel.signature:
+                metrics.increment('weather_polls', changed='no')
+                return
+            version = channel.latest.version + 1 if channel.latest else 1
+            event = channel.latest = WeatherEvent(alert, version)
+            channel.signature = signature
+            subscribers = list(channel.subscribers)
+        metrics.increment('weather_polls', changed='yes')
+        start = time.perf_counter()
+        for subscription in subscribers:
+            subscription.push(event)
+        metrics.observe('weather_fanout', time.perf_counter() - start)
@@ -63,14 +63,33 @@
     const scriptTag = document.currentScript;
     if (scriptTag && scriptTag.dataset.chatbotConfig) {
         const configId = scriptTag.dataset.chatbotConfig;
-        // Fetch config from server
-        fetch(`${config.apiUrl}/widget-config/${configId}`)
-            .then(res => res.json())
+        const configUrl = `${config.apiUrl}/widget-config/${encodeURIComponent(configId)}`;
+        const cacheKey = 'lifelink-config-' + configId;
+
+        // Start immediately with the config saved on a previous visit,
+        // or the defaults - never wait on the network
+        try {
+            const saved = JSON.parse(localStorage.getItem(cacheKey) || 'null');
+            if (saved && saved.config) {
+                Object.assign(config, saved.config);
+            }
+        } catch (e) {
+            // Storage blocked (private mode, third-party restrictions)
+        }
+        initWidget();
+
+        // Refresh in the background (revalidated by ETag); used from the next page view
+        fetch(configUrl)
+            .then(res => res.ok ? res.json() : null)
             .then(data => {
-                Object.assign(config, data.config);
-                initWidget();
+                if (data && data.config) {
+                    localStorage.setItem(cacheKey, JSON.stringify({
+                        version: data.version,
+                        config: data.config
+                    }));
+                }
             })
-            .catch(() => initWidget());
+            .catch(() => { });
     } else {
         initWidget();
     }
@@ -452,6 +471,15 @@
                 font-size: 13px;
             }
 
+            .lifelink-weather-image {
+                display: block;
+                width: 100%;
+                max-height: 140px;
+                object-fit: cover;
+                border-radius: 10px;
+                margin-bottom: 8px;
+            }
+
             .lifelink-message.user .lifelink-message-bubble {
                 background: ${config.primaryColor};
                 color: white;
@@ -630,16 +658,65 @@
         const sessionId = 'session_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
         let isProcessing = false;
 
+        // Compact responses for slow connections: footers come as short codes
+        // and fixed answers by id, from a catalog kept across visits
+        const COMPACT_TYPE = 'application/vnd.lifelink.compact+json';
+        const FOOTER_SEPARATOR = '━━━━━━━━━━━━━━━━━━━━━━━━';
+        const FOOTER_LINES = {
+            E: '⚠️ For emergencies, call 911 first!',
+            K: '📚 *Response from learned knowledge base*',
+            S: '💾 *This response has been saved for future learning*',
+            D: '⏳ *High demand right now - showing standard safety guidance.*'
+        };
+        const catalogKey = 'lifelink-answers';
+        let answerCatalog = null;
+        try {
+            answerCatalog = JSON.parse(localStorage.getItem(catalogKey) || 'null');
+        } catch (e) {
+            // Storage blocked (private mode, third-party restrictions)
+        }
+
+        function refreshAnswerCatalog() {
+            // Revalidated by ETag, so an unchanged catalog costs a 304
+            fetch(`${config.apiUrl}/answers`)
+                .then(res => res.ok ? res.json() : null)
+                .then(data => {
+                    if (data && data.v) {
+                        answerCatalog = data;
+                        try {
+                            localStorage.setItem(catalogKey, JSON.stringify(data));
+                        } catch (e) { }
+                    }
+                })
+                .catch(() => { });
+        }
+
+        function expandCompact(data) {
+            let text = data.x || (answerCatalog && answerCatalog.a[data.i]) || '';
+            if (data.i && data.x) {
+                // Answer from a catalog we don't have yet
+                refreshAnswerCatalog();
+            }
+            if (data.f) {
+                const lines = data.f.split('').map(code => code === 'A' ? `🤖 *Powered by ${data.m}*` : FOOTER_LINES[code]);
+                text += '\n\n' + FOOTER_SEPARATOR + '\n' + lines.join('\n');
+            }
+            return text;
+        }
+
         // Toggle chat window
         chatButton.addEventListener('click', () => {
             chatWindow.classList.toggle('open');
             if (chatWindow.classList.contains('open')) {
                 userInput.focus();
+            } else {
+                stopWeatherUpdates();
             }
         });
 
         closeButton.addEventListener('click', () => {
             chatWindow.classList.remove('open');
+            stopWeatherUpdates();
         });
 
         // Quick action buttons
@@ -687,11 +764,16 @@
             scrollToBottom();
 
             // Send to API
+            const headers = {
+                'Content-Type': 'application/json',
+                'Accept': COMPACT_TYPE
+            };
+            if (answerCatalog) {
+                headers['X-LifeLink-Catalog'] = answerCatalog.v;
+            }
             fetch(`${config.apiUrl}/chat`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
+                headers: headers,
                 body: JSON.stringify({
                     message: message,
                     session_id: sessionId
@@ -700,7 +782,9 @@
                 .then(res => res.json())
                 .then(data => {
                     typingIndicator.classList.remove('active');
-                    if (data.success) {
+                    if (data.ok === 1) {
+                        addMessage(expandCompact(data), 'bot');
+                    } else if (data.success) {
                         addMessage(data.response, 'bot');
                     } else {
                         addMessage('Sorry, I encountered an error. Please try again.', 'bot');
@@ -785,6 +869,38 @@
             chatMessages.scrollTop = chatMessages.scrollHeight;
         }
 
+        let weatherSource = null;
+
+        // Background image for a weather condition; the server sends the
+        // smallest AVIF, WebP or JPEG variant this browser accepts at ?w=
+        function weatherImageUrl(condition, width) {
+            const text = (condition || '').toLowerCase();
+            let name = null;
+            if (/snow|sleet|blizzard|ice/.test(text)) {
+                name = 'Snowy';
+            } else if (/rain|drizzle|shower|storm|thunder/.test(text)) {
+                name = 'Rainy';
+            } else if (/sun|clear/.test(text)) {
+                name = 'Sunny';
+            }
+            return name ? `${config.apiUrl}/images/${name}.jpg?w=${width}` : null;
+        }
+
+        function addWeatherMessage(data) {
+            addMessage(data.alert, 'bot');
+            const condition = data.weather && data.weather.condition;
+            const imageUrl = weatherImageUrl(condition, 400);
+            if (!imageUrl) return;
+            const bubble = chatMessages.lastElementChild.querySelector('.lifelink-message-bubble');
+            const image = document.createElement('img');
+            image.className = 'lifelink-weather-image';
+            image.src = imageUrl;
+            image.srcset = `${imageUrl} 1x, ${weatherImageUrl(condition, 800)} 2x`;
+            image.alt = condition;
+            image.loading = 'lazy';
+            bubble.insertBefore(image, bubble.firstChild);
+        }
+
         function getWeatherAlert() {
             if (isProcessing) return;
 
@@ -816,6 +932,55 @@
         }
 
         function fetchWeather(location) {
+            if (window.EventSource) {
+                subscribeWeather(location);
+            } else {
+                requestWeather(location);
+            }
+        }
+
+        // The server polls each location once for all subscribed widgets and
+        // pushes the alert now and whenever the weather changes
+        function subscribeWeather(location) {
+            if (weatherSource) {
+                weatherSource.close();
+            }
+            let waiting = true;
+            weatherSource = new EventSource(
+                `${config.apiUrl}/weather/subscribe?location=${encodeURIComponent(location)}`);
+            weatherSource.addEventListener('weather', (event) => {
+                const data = JSON.parse(event.data);
+                if (waiting) {
+                    waiting = false;
+                    typingIndicator.classList.remove('active');
+                    isProcessing = false;
+                    weatherButton.disabled = false;
+                }
+                if (data.success) {
+                    addWeatherMessage(data);
+                } else {
+                    addMessage('Sorry, I could not fetch the weather alert. Please try again.', 'bot');
+                }
+            });
+            weatherSource.onerror = () => {
+                if (waiting) {
+                    // Couldn't subscribe - ask once instead
+                    weatherSource.close();
+                    weatherSource = null;
+                    requestWeather(location);
+                }
+            };
+        }
+
+        // A subscription holds a server thread, so it ends with the chat window
+        function stopWeatherUpdates() {
+            if (weatherSource) {
+                weatherSource.close();
+                weatherSource = null;
+            }
+        }
+
+        function requestWeather(location) {
             fetch(`${config.apiUrl}/weather-alert`, {
                 method: 'POST',
                 headers: {
@@ -829,7 +994,7 @@
                 .then(data => {
                     typingIndicator.classList.remove('active');
                     if (data.success) {
-                        addMessage(data.alert, 'bot');
+                        addWeatherMessage(data);
                     } else {
                         addMessage('Sorry, I could not fetch the weather alert. Please try again.', 'bot');
                     }
@@ -0,0 +1,170 @@
+"""
+Widget Config Store
+Per-site widget configurations published from the configurator and
+fetched by widget.js via data-chatbot-config. Persisted to a JSON file
+and cached in memory; reloaded when another worker publishes. Publishing
+is rate limited per client IP (app.py) and the number of configs is capped.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+from datetime import datetime
+from learned_store import store_write_lock
+
+# Settings a site may override, with a validator for each
+_COLOR = re.compile(r'^#[0-9a-fA-F]{3,8}$')
+CONFIG_FIELDS = {
+    'primaryColor': lambda v: isinstance(v, str) and bool(_COLOR.match(v)),
+    'buttonColor': lambda v: isinstance(v, str) and bool(_COLOR.match(v)),
+    'textColor': lambda v: isinstance(v, str) and bool(_COLOR.match(v)),
+    'position': lambda v: v in ('bottom-right', 'bottom-left'),
+    'buttonSize': lambda v: isinstance(v, int) and 32 <= v <= 120,
+    'windowWidth': lambda v: isinstance(v, int) and 280 <= v <= 800,
+    'windowHeight': lambda v: isinstance(v, int) and 320 <= v <= 1000,
+    'fontFamily': lambda v: isinstance(v, str) and 0 < len(v) <= 100,
+    'brandName': lambda v: isinstance(v, str) and 0 < len(v) <= 60,
+}
+_CONFIG_ID = re.compile(r'^[A-Za-z0-9_-]{4,64}$')
+
+# Publishes per client IP (sustained per second, and burst), and configs kept
+PUBLISH_RATE = float(os.environ.get('LIFELINK_WIDGET_PUBLISH_RATE', 0.1))
+PUBLISH_BURST = float(os.environ.get('LIFELINK_WIDGET_PUBLISH_BURST', 10))
+MAX_CONFIGS = int(os.environ.get('LIFELINK_MAX_WIDGET_CONFIGS', 10000))
+
+
+class ConfigLimitError(Exception):
+    """The store already holds its maximum number of configs"""
+
+
+def config_version(config):
+    """Content hash of a config, used as its ETag"""
+    data = json.dumps(config, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def validate_config(config):
+    """
+    Check a submitted config
+    Returns:
+        dict: The config with only known fields
+    Raises:
+        ValueError: If the config is not an object or a field is invalid
+    """
+    if not isinstance(config, dict):
+        raise ValueError("config must be an object")
+    cleaned = {}
+    for field, value in config.items():
+        check = CONFIG_FIELDS.get(field)
+        if check is None:
+            continue
+        if not check(value):
+            raise ValueError(f"Invalid value for {field}")
+        cleaned[field] = value
+    return cleaned
+
+
+class WidgetConfigStore:
+    def __init__(self, path="widget_configs.json", max_configs=MAX_CONFIGS):
+        """
+        Load published widget configs
+        Args:
+            path: JSON file mapping config ids to their entries
+            max_configs: Most configs kept; creating more is refused
+        """
+        self.path = path
+        self.max_configs = max_configs
+        self.lock = threading.Lock()
+        self.configs = {}
+        self._signature = None
+        self._reload()
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _reload(self):
+        """Reload from disk if the file changed (e.g. published by another worker)"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.configs = json.load(f)
+        except FileNotFoundError:
+            self.configs = {}
+        except Exception as e:
+            print(f"Note: Could not load widget configs: {e}")
+            return
+        self._signature = signature
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.configs, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._signature = self._file_signature()
+
+    def get(self, config_id):
+        """
+        Look up a published config
+        Returns:
+            dict: {'config', 'version', 'updated_at'} or None
+        """
+        with self.lock:
+            self._reload()
+            entry = self.configs.get(config_id)
+            if entry is None:
+                return None
+            return {key: entry[key] for key in ('config', 'version', 'updated_at')}
+
+    def publish(self, config, config_id=None, edit_token=None):
+        """
+        Create a config, or update one given its edit token
+        Args:
+            config: Widget settings (validated against CONFIG_FIELDS)
+            config_id: Existing config to update (None to create a new one)
+            edit_token: Token returned when the config was created
+        Returns:
+            dict: {'config_id', 'version', 'edit_token' (new configs only)}
+        Raises:
+            ValueError: Invalid config
+            PermissionError: Unknown config id or wrong edit token
+            ConfigLimitError: No room for a new config
+        """
+        config = validate_config(config)
+        # The file lock keeps workers from overwriting each other's publishes
+        with self.lock, store_write_lock(self.path):
+            self._reload()
+            result = {}
+            if config_id is None:
+                if len(self.configs) >= self.max_configs:
+                    raise ConfigLimitError("Too many widget configs; try again later")
+                config_id = secrets.token_urlsafe(9)
+                edit_token = secrets.token_urlsafe(24)
+                token_hash = hashlib.sha256(edit_token.encode('utf-8')).hexdigest()
+                result['edit_token'] = edit_token
+            else:
+                entry = self.configs.get(config_id) if _CONFIG_ID.match(config_id) else None
+                given = hashlib.sha256((edit_token or '').encode('utf-8')).hexdigest()
+                if entry is None or not hmac.compare_digest(given, entry['token_hash']):
+                    raise PermissionError("Unknown config or wrong edit token")
+                token_hash = entry['token_hash']
+
+            version = config_version(config)
+            self.configs[config_id] = {
+                'config': config,
+                'version': version,
+                'updated_at': datetime.now().isoformat(),
+                'token_hash': token_hash
+            }
+            self._save()
+            result.update({'config_id': config_id, 'version': version})
+            return result